@@ -2373,6 +2373,7 @@ class Daemon(metaclass=JSONRPCServerType):
                          [--any_locations=<any_locations>...] [--all_locations=<all_locations>...]
                          [--not_locations=<not_locations>...]
                          [--order_by=<order_by>...] [--page=<page>] [--page_size=<page_size>]
+                         [--continuation=<continuation>] [--estimate_totals]
                          [--wallet_id=<wallet_id>] [--include_purchase_receipt] [--include_is_my_output]
                          [--new_sdk_server=<new_sdk_server>]
 
@@ -2475,8 +2476,17 @@ class Daemon(metaclass=JSONRPCServerType):
                                                     'publish_time', 'amount', 'effective_amount',
                                                     'support_amount', 'trending_group', 'trending_mixed',
                                                     'trending_local', 'trending_global', 'activation_height'
+            --continuation=<continuation>   : (str) continue right after the last item of a previous page,
+                                                    pass an empty string to get the first page and the
+                                                    continuation for the next one, --page is ignored,
+                                                    much faster than deep pages when ordering by fields
+                                                    which always have a value
             --no_totals                     : (bool) do not calculate the total number of pages and items in result set
                                                      (significant performance boost)
+            --estimate_totals               : (bool) estimate the total number of pages and items in result set
+                                                     from the number of claims per claim type, stream type and
+                                                     tag when only filtering by those (performance boost),
+                                                     'total_estimated' is set in the result when estimated
             --wallet_id=<wallet_id>         : (str) wallet to check for claim purchase reciepts
             --include_purchase_receipt      : (bool) lookup and include a receipt if this wallet
                                                      has purchased the claim
@@ -2494,17 +2504,24 @@ class Daemon(metaclass=JSONRPCServerType):
         if kwargs.pop('invalid_channel_signature', False):
             kwargs['signature_valid'] = 0
         page_num, page_size = abs(kwargs.pop('page', 1)), min(abs(kwargs.pop('page_size', DEFAULT_PAGE_SIZE)), 50)
+        if kwargs.get('continuation') is not None:
+            page_num = 1
         kwargs.update({'offset': page_size * (page_num - 1), 'limit': page_size})
-        txos, blocked, _, total = await self.ledger.claim_search(wallet.accounts, **kwargs)
+        search_result = await self.ledger.claim_search(wallet.accounts, **kwargs)
+        txos, blocked, _, total = search_result
         result = {
             "items": txos,
             "blocked": blocked,
             "page": page_num,
             "page_size": page_size
         }
+        if search_result.continuation:
+            result['continuation'] = search_result.continuation
         if not kwargs.pop('no_totals', False):
             result['total_pages'] = int((total + (page_size - 1)) / page_size)
             result['total_items'] = total
+            if search_result.total_estimated:
+                result['total_estimated'] = True
         return result
 
     CHANNEL_DOC = """
@@ -1,8 +1,9 @@
 import base64
 import struct
-from typing import List
+from typing import List, Dict, Optional
 from binascii import hexlify
 from itertools import chain
+from operator import itemgetter
 
 from lbry.error import ResolveCensoredError
 from lbry.schema.types.v2.result_pb2 import Outputs as OutputsMessage
@@ -12,6 +13,72 @@ INVALID = ErrorMessage.Code.Name(ErrorMessage.INVALID)
 NOT_FOUND = ErrorMessage.Code.Name(ErrorMessage.NOT_FOUND)
 BLOCKED = ErrorMessage.Code.Name(ErrorMessage.BLOCKED)
 
+# columns read by the encoder, in the order they are unpacked by `Outputs.encode_claim`
+ENCODED_COLUMNS = (
+    'txo_hash', 'height', 'short_url', 'canonical_url', 'is_controlling', 'last_take_over_height',
+    'creation_height', 'activation_height', 'expiration_height', 'claims_in_channel', 'reposted',
+    'effective_amount', 'support_amount', 'trending_group', 'trending_mixed', 'trending_local',
+    'trending_global', 'channel_hash', 'reposted_claim_hash',
+)
+_encoded_columns_getter = itemgetter(*ENCODED_COLUMNS)
+
+_SMALL_VARINTS = tuple(bytes((i,)) for i in range(0x80))
+_pack_float = struct.Struct('<f').pack
+_unpack_nout = struct.Struct('<I').unpack
+
+
+def encode_varint(value: int) -> bytes:
+    if 0 <= value < 0x80:
+        return _SMALL_VARINTS[value]
+    if value < 0:
+        raise ValueError(f'cannot encode negative value {value} as a varint')
+    # unrolled for the common sizes of heights and amounts
+    if value < 0x4000:
+        return bytes((value & 0x7f | 0x80, value >> 7))
+    if value < 0x200000:
+        return bytes((value & 0x7f | 0x80, (value >> 7) & 0x7f | 0x80, value >> 14))
+    if value < 0x10000000:
+        return bytes((value & 0x7f | 0x80, (value >> 7) & 0x7f | 0x80, (value >> 14) & 0x7f | 0x80, value >> 21))
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def encode_length_delimited(tag: bytes, data: bytes) -> bytes:
+    return tag + encode_varint(len(data)) + data
+
+
+def _tag(field_number: int, wire_type: int) -> bytes:
+    return encode_varint(field_number << 3 | wire_type)
+
+
+_VARINT, _FIXED32, _LENGTH_DELIMITED = 0, 5, 2
+# Outputs
+_TXOS, _EXTRA_TXOS = _tag(1, _LENGTH_DELIMITED), _tag(2, _LENGTH_DELIMITED)
+_TOTAL, _OFFSET = _tag(3, _VARINT), _tag(4, _VARINT)
+_BLOCKED, _BLOCKED_TOTAL = _tag(5, _LENGTH_DELIMITED), _tag(6, _VARINT)
+_CONTINUATION, _TOTAL_ESTIMATED = _tag(7, _LENGTH_DELIMITED), _tag(8, _VARINT)
+# Output
+_TX_HASH, _NOUT, _HEIGHT = _tag(1, _LENGTH_DELIMITED), _tag(2, _VARINT), _tag(3, _VARINT)
+_CLAIM, _ERROR = _tag(7, _LENGTH_DELIMITED), _tag(15, _LENGTH_DELIMITED)
+# ClaimMeta
+_CHANNEL, _REPOST = _tag(1, _LENGTH_DELIMITED), _tag(2, _LENGTH_DELIMITED)
+_SHORT_URL, _CANONICAL_URL = _tag(3, _LENGTH_DELIMITED), _tag(4, _LENGTH_DELIMITED)
+_IS_CONTROLLING_TRUE = _tag(5, _VARINT) + encode_varint(1)
+_TAKE_OVER_HEIGHT, _CREATION_HEIGHT = _tag(6, _VARINT), _tag(7, _VARINT)
+_ACTIVATION_HEIGHT, _EXPIRATION_HEIGHT = _tag(8, _VARINT), _tag(9, _VARINT)
+_CLAIMS_IN_CHANNEL, _REPOSTED = _tag(10, _VARINT), _tag(11, _VARINT)
+_EFFECTIVE_AMOUNT, _SUPPORT_AMOUNT = _tag(20, _VARINT), _tag(21, _VARINT)
+_TRENDING_GROUP, _TRENDING_MIXED = _tag(22, _VARINT), _tag(23, _FIXED32)
+_TRENDING_LOCAL, _TRENDING_GLOBAL = _tag(24, _FIXED32), _tag(25, _FIXED32)
+# Error
+_ERROR_CODE, _ERROR_TEXT, _ERROR_BLOCKED = _tag(1, _VARINT), _tag(2, _LENGTH_DELIMITED), _tag(3, _LENGTH_DELIMITED)
+# Blocked
+_BLOCKED_COUNT, _BLOCKED_CHANNEL = _tag(1, _VARINT), _tag(2, _LENGTH_DELIMITED)
+
 
 def set_reference(reference, claim_hash, rows):
     if claim_hash:
@@ -65,13 +132,29 @@ class Censor:
             blocked.count = count
             set_reference(blocked.channel, censoring_channel_hash, extra_txo_rows)
 
+    def to_bytes(self, references: Dict[bytes, bytes]) -> bytes:
+        encoded = []
+        for censoring_channel_hash, count in self.censored.items():
+            blocked = _BLOCKED_COUNT + encode_varint(count) if count else b''
+            reference = references.get(censoring_channel_hash)
+            if reference is not None:
+                blocked += _BLOCKED_CHANNEL + reference
+            encoded.append(encode_length_delimited(_BLOCKED, blocked))
+        if self.total:
+            encoded.append(_BLOCKED_TOTAL + encode_varint(self.total))
+        return b''.join(encoded)
+
 
 class Outputs:
 
-    __slots__ = 'txos', 'extra_txos', 'txs', 'offset', 'total', 'blocked', 'blocked_total'
+    __slots__ = (
+        'txos', 'extra_txos', 'txs', 'offset', 'total', 'blocked', 'blocked_total', 'continuation',
+        'total_estimated'
+    )
 
     def __init__(self, txos: List, extra_txos: List, txs: set,
-                 offset: int, total: int, blocked: List, blocked_total: int):
+                 offset: int, total: int, blocked: List, blocked_total: int, continuation: bytes = b'',
+                 total_estimated: bool = False):
         self.txos = txos
         self.txs = txs
         self.extra_txos = extra_txos
@@ -79,6 +162,8 @@ class Outputs:
         self.total = total
         self.blocked = blocked
         self.blocked_total = blocked_total
+        self.continuation = continuation
+        self.total_estimated = total_estimated
 
     def inflate(self, txs):
         tx_map = {tx.hash: tx for tx in txs}
@@ -159,26 +244,156 @@ class Outputs:
         return cls(
             outputs.txos, outputs.extra_txos, txs,
             outputs.offset, outputs.total,
-            outputs.blocked, outputs.blocked_total
+            outputs.blocked, outputs.blocked_total, outputs.continuation, outputs.total_estimated
         )
 
     @classmethod
-    def to_base64(cls, txo_rows, extra_txo_rows, offset=0, total=None, blocked=None) -> str:
-        return base64.b64encode(cls.to_bytes(txo_rows, extra_txo_rows, offset, total, blocked)).decode()
+    def to_base64(cls, txo_rows, extra_txo_rows, offset=0, total=None, blocked=None, continuation=None,
+                  total_estimated=False) -> str:
+        return base64.b64encode(
+            cls.to_bytes(txo_rows, extra_txo_rows, offset, total, blocked, continuation, total_estimated)
+        ).decode()
+
+    @classmethod
+    def to_bytes(cls, txo_rows, extra_txo_rows, offset=0, total=None, blocked: Censor = None,
+                 continuation: Optional[bytes] = None, total_estimated: bool = False) -> bytes:
+        """
+        Serialize a page of claim rows directly into the `Outputs` protobuf wire format,
+        producing the same bytes as `to_message(...).SerializeToString()`.
+
+        Rows are either mappings or tuples exposing a `columns` map of column name to
+        index, the latter are read with one `itemgetter` call per row. Channel and repost
+        references are looked up in an index of `extra_txo_rows` built once per page.
+        """
+        references = cls.encode_references(extra_txo_rows)
+        getters = {}
+        encoded = []
+        for tag, rows in ((_TXOS, txo_rows), (_EXTRA_TXOS, extra_txo_rows)):
+            for row in rows:
+                if isinstance(row, Exception):
+                    output = cls.encode_error(row, references)
+                else:
+                    output = cls.encode_claim(cls._get_encoded_columns(row, getters), references)
+                encoded.append(encode_length_delimited(tag, output))
+        if total:
+            encoded.append(_TOTAL + encode_varint(total))
+        if offset:
+            encoded.append(_OFFSET + encode_varint(offset))
+        if blocked is not None:
+            encoded.append(blocked.to_bytes(references))
+        if continuation:
+            encoded.append(encode_length_delimited(_CONTINUATION, continuation))
+        if total_estimated:
+            encoded.append(_TOTAL_ESTIMATED + b'\x01')
+        return b''.join(encoded)
+
+    @staticmethod
+    def _get_encoded_columns(row, getters: Dict) -> tuple:
+        columns = getattr(row, 'columns', None)
+        if columns is None:
+            return _encoded_columns_getter(row)
+        getter = getters.get(row.__class__)
+        if getter is None:
+            getter = getters[row.__class__] = itemgetter(*(columns[name] for name in ENCODED_COLUMNS))
+        return getter(tuple(row))
+
+    @staticmethod
+    def encode_output_location(txo_hash: bytes, height: int) -> bytes:
+        nout, = _unpack_nout(txo_hash[32:])
+        encoded = encode_length_delimited(_TX_HASH, txo_hash[:32])
+        if nout:
+            encoded += _NOUT + encode_varint(nout)
+        if height:
+            encoded += _HEIGHT + encode_varint(height)
+        return encoded
+
+    @classmethod
+    def encode_references(cls, extra_txo_rows) -> Dict[bytes, bytes]:
+        """ Length prefixed reference `Output` messages by claim hash, first row wins. """
+        references = {}
+        for txo in extra_txo_rows:
+            claim_hash = txo['claim_hash']
+            if claim_hash not in references:
+                reference = cls.encode_output_location(txo['txo_hash'], txo['height'])
+                references[claim_hash] = encode_varint(len(reference)) + reference
+        return references
+
+    @staticmethod
+    def encode_error(error: Exception, references: Dict[bytes, bytes]) -> bytes:
+        code = None
+        if isinstance(error, ValueError):
+            code = ErrorMessage.INVALID
+        elif isinstance(error, LookupError):
+            code = ErrorMessage.NOT_FOUND
+        elif isinstance(error, ResolveCensoredError):
+            code = ErrorMessage.BLOCKED
+        encoded = _ERROR_CODE + encode_varint(code) if code else b''
+        text = error.args[0]
+        if text:
+            encoded += encode_length_delimited(_ERROR_TEXT, text.encode())
+        if code == ErrorMessage.BLOCKED:
+            reference = references.get(error.censor_hash) if error.censor_hash else None
+            if reference is not None:
+                encoded += encode_length_delimited(_ERROR_BLOCKED, _BLOCKED_CHANNEL + reference)
+        return encode_length_delimited(_ERROR, encoded)
+
+    @classmethod
+    def encode_claim(cls, columns: tuple, references: Dict[bytes, bytes]) -> bytes:
+        (txo_hash, height, short_url, canonical_url, is_controlling, last_take_over_height,
+         creation_height, activation_height, expiration_height, claims_in_channel, reposted,
+         effective_amount, support_amount, trending_group, trending_mixed, trending_local,
+         trending_global, channel_hash, reposted_claim_hash) = columns
+        claim = []
+        if channel_hash:
+            reference = references.get(channel_hash)
+            if reference is not None:
+                claim.append(_CHANNEL + reference)
+        if reposted_claim_hash:
+            reference = references.get(reposted_claim_hash)
+            if reference is not None:
+                claim.append(_REPOST + reference)
+        if short_url:
+            claim.append(encode_length_delimited(_SHORT_URL, short_url.encode()))
+        if canonical_url:
+            claim.append(encode_length_delimited(_CANONICAL_URL, canonical_url.encode()))
+        if is_controlling:
+            claim.append(_IS_CONTROLLING_TRUE)
+        for tag, value in (
+                (_TAKE_OVER_HEIGHT, last_take_over_height), (_CREATION_HEIGHT, creation_height),
+                (_ACTIVATION_HEIGHT, activation_height), (_EXPIRATION_HEIGHT, expiration_height),
+                (_CLAIMS_IN_CHANNEL, claims_in_channel), (_REPOSTED, reposted),
+                (_EFFECTIVE_AMOUNT, effective_amount), (_SUPPORT_AMOUNT, support_amount),
+                (_TRENDING_GROUP, trending_group)):
+            if value:
+                claim.append(tag + encode_varint(value))
+        for tag, value in (
+                (_TRENDING_MIXED, trending_mixed), (_TRENDING_LOCAL, trending_local),
+                (_TRENDING_GLOBAL, trending_global)):
+            if value:
+                claim.append(tag + _pack_float(value))
+        return (
+            cls.encode_output_location(txo_hash, height) +
+            encode_length_delimited(_CLAIM, b''.join(claim))
+        )
 
     @classmethod
-    def to_bytes(cls, txo_rows, extra_txo_rows, offset=0, total=None, blocked: Censor = None) -> bytes:
+    def to_message(cls, txo_rows, extra_txo_rows, offset=0, total=None, blocked: Censor = None,
+                   continuation: Optional[bytes] = None, total_estimated: bool = False) -> OutputsMessage:
         page = OutputsMessage()
         page.offset = offset
         if total is not None:
             page.total = total
+        if continuation:
+            page.continuation = continuation
+        if total_estimated:
+            page.total_estimated = True
         if blocked is not None:
             blocked.to_message(page, extra_txo_rows)
         for row in txo_rows:
             cls.row_to_message(row, page.txos.add(), extra_txo_rows)
         for row in extra_txo_rows:
             cls.row_to_message(row, page.extra_txos.add(), extra_txo_rows)
-        return page.SerializeToString()
+        return page
 
     @classmethod
     def row_to_message(cls, txo, txo_message, extra_txo_rows):
@@ -67,6 +67,20 @@ class BlockHeightEvent(NamedTuple):
     change: int
 
 
+class SearchResult(tuple):
+    """
+    The (txos, blocked, offset, total) of a page of search results, with the keyset
+    paging continuation and whether the total is an estimate as attributes.
+    """
+
+    def __new__(cls, txos: List[Output], blocked: dict, offset: int, total: int,
+                continuation: Optional[str] = None, total_estimated: bool = False):
+        result = super().__new__(cls, (txos, blocked, offset, total))
+        result.continuation = continuation
+        result.total_estimated = total_estimated
+        return result
+
+
 class TransactionCacheItem:
     __slots__ = '_tx', 'lock', 'has_tx', 'pending_verifications'
 
@@ -756,7 +770,7 @@ class Ledger(metaclass=LedgerRegistry):
             include_is_my_output=False,
             include_sent_supports=False,
             include_sent_tips=False,
-            include_received_tips=False) -> Tuple[List[Output], dict, int, int]:
+            include_received_tips=False) -> SearchResult:
         encoded_outputs = await query
         outputs = Outputs.from_base64(encoded_outputs or b'')  # TODO: why is the server returning None?
         txs: List[Transaction] = []
@@ -832,7 +846,10 @@ class Ledger(metaclass=LedgerRegistry):
                             accounts=accounts
                         )
                         txo.received_tips = tips
-        return txos, blocked, outputs.offset, outputs.total
+        continuation = outputs.continuation.hex() if outputs.continuation else None
+        return SearchResult(
+            txos, blocked, outputs.offset, outputs.total, continuation, outputs.total_estimated
+        )
 
     async def resolve(self, accounts, urls, new_sdk_server=None, **kwargs):
         txos = []
@@ -866,7 +883,7 @@ class Ledger(metaclass=LedgerRegistry):
 
     async def claim_search(
             self, accounts, include_purchase_receipt=False, include_is_my_output=False,
-            new_sdk_server=None, **kwargs) -> Tuple[List[Output], dict, int, int]:
+            new_sdk_server=None, **kwargs) -> SearchResult:
         if new_sdk_server:
             claim_search = partial(self.network.new_claim_search, new_sdk_server)
         else:
@@ -922,7 +939,7 @@ class Ledger(metaclass=LedgerRegistry):
         if resolve:
             claim_ids = [p.purchased_claim_id for p in purchases]
             try:
-                resolved, _, _, _ = await self.claim_search([], claim_ids=claim_ids)
+                resolved, _, _, _, _, _ = await self.claim_search([], claim_ids=claim_ids)
             except Exception as err:
                 if isinstance(err, asyncio.CancelledError):  # TODO: remove when updated to 3.8
                     raise
@@ -982,7 +999,7 @@ class Ledger(metaclass=LedgerRegistry):
     async def resolve_collection(self, collection, offset=0, page_size=1):
         claim_ids = collection.claim.collection.claims.ids[offset:page_size + offset]
         try:
-            resolve_results, _, _, _ = await self.claim_search([], claim_ids=claim_ids)
+            resolve_results, _, _, _, _, _ = await self.claim_search([], claim_ids=claim_ids)
         except Exception as err:
             if isinstance(err, asyncio.CancelledError):  # TODO: remove when updated to 3.8
                 raise
@@ -285,6 +285,9 @@ class Network:
     def get_history(self, address):
         return self.rpc('blockchain.address.get_history', [address], True)
 
+    def get_history_page(self, address, from_height=0, to_height=-1, offset=0, limit=1000):
+        return self.rpc('blockchain.address.get_history_page', [address, from_height, to_height, offset, limit], True)
+
     def broadcast(self, raw_transaction):
         return self.rpc('blockchain.transaction.broadcast', [raw_transaction], True)
 
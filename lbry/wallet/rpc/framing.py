@@ -30,7 +30,7 @@ __all__ = ('FramerBase', 'NewlineFramer', 'BinaryFramer', 'BitcoinFramer',
 
 from hashlib import sha256 as _sha256
 from struct import Struct
-from asyncio import Queue
+from asyncio import Queue, Event
 
 
 class FramerBase:
@@ -55,7 +55,12 @@ class FramerBase:
 
 
 class NewlineFramer(FramerBase):
-    """A framer for a protocol where messages are separated by newlines."""
+    """A framer for a protocol where messages are separated by newlines.
+
+    Incoming bytes are appended to a single buffer that is only scanned
+    from where the last scan stopped, so a message arriving in many
+    parts is neither rescanned nor joined from a list of parts.
+    """
 
     # The default max_size value is motivated by JSONRPC, where a
     # normal request will be 250 bytes or less, and a reasonable
@@ -67,41 +72,46 @@ class NewlineFramer(FramerBase):
         newline character to re-synchronize the stream.
         """
         self.max_size = max_size
-        self.queue = Queue()
-        self.received_bytes = self.queue.put_nowait
+        self.buffer = bytearray()
+        # bytes at the start of the buffer known to hold no newline
+        self.scanned = 0
+        self.received = Event()
         self.synchronizing = False
-        self.residual = b''
 
     def frame(self, message):
         return message + b'\n'
 
+    def received_bytes(self, data):
+        self.buffer += data
+        self.received.set()
+
     async def receive_message(self):
-        parts = []
-        buffer_size = 0
+        buffer = self.buffer
         while True:
-            part = self.residual
-            self.residual = b''
-            if not part:
-                part = await self.queue.get()
-
-            npos = part.find(b'\n')
+            npos = buffer.find(b'\n', self.scanned)
             if npos == -1:
-                parts.append(part)
-                buffer_size += len(part)
+                self.scanned = len(buffer)
                 # Ignore over-sized messages; re-synchronize
-                if buffer_size <= self.max_size:
-                    continue
-                self.synchronizing = True
-                raise MemoryError(f'dropping message over {self.max_size:,d} '
-                                  f'bytes and re-synchronizing')
-
-            tail, self.residual = part[:npos], part[npos + 1:]
+                if self.scanned > self.max_size:
+                    del buffer[:]
+                    self.scanned = 0
+                    self.synchronizing = True
+                    raise MemoryError(f'dropping message over {self.max_size:,d} '
+                                      f'bytes and re-synchronizing')
+                self.received.clear()
+                await self.received.wait()
+                continue
             if self.synchronizing:
                 self.synchronizing = False
-                return await self.receive_message()
+                message = None
             else:
-                parts.append(tail)
-                return b''.join(parts)
+                with memoryview(buffer) as view:
+                    message = bytes(view[:npos])
+            # deleting from the front of a bytearray moves its start, not its bytes
+            del buffer[:npos + 1]
+            self.scanned = 0
+            if message is not None:
+                return message
 
 
 class ByteQueue:
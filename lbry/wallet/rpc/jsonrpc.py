@@ -41,6 +41,41 @@ import attr
 from asyncio import Queue, Event, CancelledError
 from .util import signature_info
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _stdlib_loads(message):
+    return json.loads(message.decode())
+
+
+def _stdlib_dumps(payload):
+    return json.dumps(payload).encode()
+
+
+def _orjson_dumps(payload):
+    try:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # integers wider than 64 bits and the like, json raises if it can't either
+        return _stdlib_dumps(payload)
+
+
+JSON_BACKENDS = {'json': (_stdlib_loads, _stdlib_dumps)}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = (orjson.loads, _orjson_dumps)
+
+json_loads, json_dumps = JSON_BACKENDS['orjson' if orjson is not None else 'json']
+
+
+def set_json_backend(name):
+    """Decode and encode JSONRPC messages with the named backend of
+    JSON_BACKENDS, orjson is used by default when it is installed."""
+    global json_loads, json_dumps
+    json_loads, json_dumps = JSON_BACKENDS[name]
+
 
 class SingleRequest:
     __slots__ = ('method', 'args')
@@ -227,7 +262,7 @@ class JSONRPC:
     def _message_to_payload(cls, message):
         """Returns a Python object or a ProtocolError."""
         try:
-            return json.loads(message.decode())
+            return json_loads(message)
         except UnicodeDecodeError:
             message = 'messages must be encoded in UTF-8'
         except json.JSONDecodeError:
@@ -334,7 +369,7 @@ class JSONRPC:
     def encode_payload(cls, payload):
         """Encode a Python object as JSON and convert it to bytes."""
         try:
-            return json.dumps(payload).encode()
+            return json_dumps(payload)
         except TypeError:
             msg = f'JSON payload encoding error: {payload}'
             raise ProtocolError(cls.INTERNAL_ERROR, msg) from None
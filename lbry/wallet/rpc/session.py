@@ -121,9 +121,13 @@ class SessionBase(asyncio.Protocol):
             self.abort()
             raise asyncio.TimeoutError(f'task timed out after {secs}s')
 
-    async def _send_message(self, message):
+    async def wait_until_writable(self):
+        """Wait while the transport is paused, aborting the connection after max_send_delay."""
         if not self._can_send.is_set():
             await self._limited_wait(self.max_send_delay)
+
+    async def _send_message(self, message):
+        await self.wait_until_writable()
         if not self.is_closing():
             framed_message = self.framer.frame(message)
             self.send_size += len(framed_message)
@@ -133,6 +137,18 @@ class SessionBase(asyncio.Protocol):
                 self.logger.debug(f'Sending framed message {framed_message}')
             self.transport.write(framed_message)
 
+    async def _send_messages(self, messages):
+        """Frame several messages and send them with a single transport write."""
+        await self.wait_until_writable()
+        if not self.is_closing():
+            framed_messages = b''.join(self.framer.frame(message) for message in messages)
+            self.send_size += len(framed_messages)
+            self.send_count += len(messages)
+            self.last_send = time.perf_counter()
+            if self.verbosity >= 4:
+                self.logger.debug(f'Sending framed messages {framed_messages}')
+            self.transport.write(framed_messages)
+
     def _bump_errors(self):
         self.errors += 1
         if self.errors >= self.max_errors:
@@ -495,6 +511,20 @@ class RPCSession(SessionBase):
             self.abort()
             return False
 
+    async def send_notifications(self, notifications) -> bool:
+        """Send several (method, args) RPC notifications in one write."""
+        messages = []
+        for method, args in notifications:
+            messages.append(self.connection.send_notification(Notification(method, args)))
+            self.NOTIFICATION_COUNT.labels(method=method, version=self.client_version).inc()
+        try:
+            await self._send_messages(messages)
+            return True
+        except asyncio.TimeoutError:
+            self.logger.info("timeout sending address notifications to %s", self.peer_address_str(for_log=True))
+            self.abort()
+            return False
+
     def send_batch(self, raise_errors=False):
         """Return a BatchRequest.  Intended to be used like so:
 
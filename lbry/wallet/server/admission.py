@@ -0,0 +1,200 @@
+import typing
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+log = logging.getLogger(__name__)
+
+# distinct query shapes whose cost is remembered, least recently seen shapes are forgotten first
+MAX_TRACKED_SHAPES = 10000
+
+# weight of the newest timing in the moving average of a shape
+TIMING_WEIGHT = 0.2
+
+# cost of the steps of an `EXPLAIN QUERY PLAN`, matched against the start of each step
+PLAN_STEP_COSTS = (
+    ('SEARCH', 1),
+    ('SCAN', 100),  # a full table scan, or a full index walk to satisfy an order by
+    ('USE TEMP B-TREE', 20),  # sorting every matching row
+)
+PLAN_STEP_MODIFIERS = (
+    ('COVERING INDEX', 0.5),
+    ('VIRTUAL TABLE', 0.2),  # full text search, cheap to walk but often joined with a sort
+)
+# plans costing this much or more are treated as expensive until their timings are known
+EXPENSIVE_PLAN_COST = 100
+# rows skipped by an offset are read and discarded, deep pages are expensive whatever the plan
+EXPENSIVE_OFFSET = 500
+
+
+class QueryRejectedError(Exception):
+    pass
+
+
+def _bucket(value: int) -> int:
+    """Round up to a power of two so that close values share a shape."""
+    return 1 << max(value - 1, 0).bit_length() if value > 0 else 0
+
+
+def query_shape(constraints: dict) -> str:
+    """
+    Key shared by searches which are likely to be planned and to perform alike: the
+    constraint names, how many values list constraints have, the comparison used by
+    integer constraints, the ordering and a bucket of the offset.
+    """
+    shape = []
+    for key in sorted(constraints):
+        value = constraints[key]
+        if key == 'limit':
+            continue
+        elif key == 'offset':
+            value = _bucket(abs(value)) if isinstance(value, int) else None
+        elif key in ('order_by', 'no_totals'):
+            value = tuple(value) if isinstance(value, list) else value
+        elif isinstance(value, (list, tuple, set)):
+            value = _bucket(len(value))
+        elif isinstance(value, str) and value[:1] in '<>=':
+            value = value[:2] if value[1:2] == '=' else value[:1]
+        else:
+            value = None
+        shape.append((key, value))
+    return repr(tuple(shape))
+
+
+def plan_cost(details: typing.Iterable[str]) -> float:
+    cost = 0
+    for detail in details:
+        for step, step_cost in PLAN_STEP_COSTS:
+            if detail.startswith(step):
+                for modifier, factor in PLAN_STEP_MODIFIERS:
+                    if modifier in detail:
+                        step_cost *= factor
+                cost += step_cost
+                break
+    return cost
+
+
+class QueryCost:
+    __slots__ = 'plan_cost', 'elapsed'
+
+    def __init__(self):
+        self.plan_cost = None
+        self.elapsed = None
+
+
+class QueryCostModel:
+    """
+    Cost of search shapes, estimated from the query plan sqlite picks for them until
+    queries of that shape ran, then from a moving average of their timings.
+    """
+
+    def __init__(self, expensive_seconds: float):
+        self.expensive_seconds = expensive_seconds
+        self._costs: typing.Dict[str, QueryCost] = OrderedDict()
+
+    def __len__(self):
+        return len(self._costs)
+
+    def _get(self, shape: str) -> QueryCost:
+        cost = self._costs.get(shape)
+        if cost is None:
+            cost = self._costs[shape] = QueryCost()
+            while len(self._costs) > MAX_TRACKED_SHAPES:
+                self._costs.popitem(last=False)
+        else:
+            self._costs.move_to_end(shape)
+        return cost
+
+    def is_known(self, shape: str) -> bool:
+        cost = self._costs.get(shape)
+        return cost is not None and (cost.elapsed is not None or cost.plan_cost is not None)
+
+    def set_plan(self, shape: str, details: typing.Iterable[str]):
+        self._get(shape).plan_cost = plan_cost(details)
+
+    def observe(self, shape: str, elapsed: float):
+        cost = self._get(shape)
+        if cost.elapsed is None:
+            cost.elapsed = elapsed
+        else:
+            cost.elapsed += TIMING_WEIGHT * (elapsed - cost.elapsed)
+
+    def is_expensive(self, shape: str, constraints: dict) -> bool:
+        offset = constraints.get('offset', 0)
+        if isinstance(offset, int) and abs(offset) >= EXPENSIVE_OFFSET:
+            return True
+        cost = self._costs.get(shape)
+        if cost is None:
+            return False
+        if cost.elapsed is not None:
+            return cost.elapsed >= self.expensive_seconds
+        return cost.plan_cost is not None and cost.plan_cost >= EXPENSIVE_PLAN_COST
+
+
+class SearchAdmission:
+    """
+    Admission control for claim searches while the reader pool is overloaded.
+
+    As long as fewer than `busy_pending` queries are pending every search goes through.
+    Past that, searches whose shape is expensive according to the cost model are
+    degraded to skip counting the total, then queued so that at most `max_expensive`
+    of them run at once. Expensive searches arriving while `max_waiting` of them are
+    already queued are rejected. Cheap searches are never held back.
+
+    A `busy_pending` of 0 disables admission control, the costs are still learned.
+    """
+
+    def __init__(self, busy_pending: int, expensive_seconds: float, max_expensive: int, max_waiting: int,
+                 actions=None):
+        self.busy_pending = busy_pending
+        self.max_waiting = max_waiting
+        self.costs = QueryCostModel(expensive_seconds)
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_expensive)
+        self._actions = actions
+
+    def _count(self, action: str):
+        if self._actions is not None:
+            self._actions.labels(action=action).inc()
+
+    def observe(self, constraints: dict, elapsed: float):
+        self.costs.observe(query_shape(constraints), elapsed)
+
+    @asynccontextmanager
+    async def admit(self, constraints: dict, pending: int,
+                    explain: typing.Callable[[dict], typing.Awaitable[typing.List[str]]]):
+        """Yield the constraints to search with, holding a slot for expensive searches."""
+        if not self.busy_pending or pending < self.busy_pending:
+            yield constraints
+            return
+        shape = query_shape(constraints)
+        if not self.costs.is_known(shape):
+            try:
+                self.costs.set_plan(shape, await explain(constraints))
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                # the search itself will report the problem
+                log.debug("failed to explain search %s: %s", constraints, err)
+                self.costs.set_plan(shape, ())
+        if not self.costs.is_expensive(shape, constraints):
+            yield constraints
+            return
+        if not constraints.get('no_totals'):
+            constraints = {**constraints, 'no_totals': True}
+            self._count('degraded')
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self._count('rejected')
+                raise QueryRejectedError()
+            self._count('queued')
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield constraints
+        finally:
+            self._semaphore.release()
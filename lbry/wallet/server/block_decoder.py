@@ -0,0 +1,96 @@
+import asyncio
+import typing
+from collections import namedtuple
+from concurrent.futures.process import ProcessPoolExecutor
+
+# a transaction reduced to what the block processor needs to update the UTXO set and the
+# history: prevouts are the (prev_hash, prev_idx) spent by inputs other than generation
+# inputs, outputs are the (idx, hashX, value) of spendable outputs, raw is for the claims db
+DecodedTx = namedtuple('DecodedTx', 'raw prevouts outputs')
+# same fields as coin.Block, with (DecodedTx, tx_hash) pairs as transactions
+DecodedBlock = namedtuple('DecodedBlock', 'raw header transactions')
+
+# raw bytes of the consecutive blocks decoded by one job of the worker processes
+DECODE_CHUNK_BYTES = 1024 * 1024
+
+
+def decode_block(coin, raw_block: bytes, height: int) -> DecodedBlock:
+    block = coin.block(raw_block, height)
+    hashX_from_script = coin.hashX_from_script
+    txs = []
+    for tx, tx_hash in block.transactions:
+        prevouts = tuple((txin.prev_hash, txin.prev_idx) for txin in tx.inputs if not txin.is_generation())
+        outputs = []
+        for idx, txout in enumerate(tx.outputs):
+            # Ignore unspendable outputs
+            hashX = hashX_from_script(txout.pk_script)
+            if hashX:
+                outputs.append((idx, hashX, txout.value))
+        txs.append((DecodedTx(tx.raw, prevouts, tuple(outputs)), tx_hash))
+    return DecodedBlock(raw_block, block.header, txs)
+
+
+def _decode_blocks(coin, raw_blocks: typing.List[bytes], first_height: int) -> typing.List[typing.Tuple]:
+    # runs in a worker process, the raw blocks are not sent back
+    return [decode_block(coin, raw_block, first_height + n)[1:] for n, raw_block in enumerate(raw_blocks)]
+
+
+def split_blocks(raw_blocks: typing.List[bytes], chunk_bytes: int) -> typing.List[typing.List[bytes]]:
+    chunks, chunk, size = [], [], 0
+    for raw_block in raw_blocks:
+        chunk.append(raw_block)
+        size += len(raw_block)
+        if size >= chunk_bytes:
+            chunks.append(chunk)
+            chunk, size = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class BlockDecoder:
+    """
+    Decodes blocks ahead of the block processor. Parsing and hashing transactions and
+    finding the hashX of their outputs does not depend on other blocks, so batches of
+    blocks are split in chunks decoded concurrently by worker processes. Chunks are
+    yielded in order, the block processor advances one while the next are decoded.
+
+    Batches fitting in a single chunk, such as new blocks once caught up, are decoded
+    in process. A decoder without workers always decodes in process.
+    """
+
+    def __init__(self, coin, workers: int, chunk_bytes: int = DECODE_CHUNK_BYTES):
+        self.coin = coin
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+        self._executor: typing.Optional[ProcessPoolExecutor] = None
+
+    async def decode(self, raw_blocks: typing.List[bytes],
+                     first_height: int) -> typing.AsyncIterator[typing.List[DecodedBlock]]:
+        chunks = split_blocks(raw_blocks, self.chunk_bytes)
+        if self.workers <= 0 or len(chunks) < 2:
+            yield [decode_block(self.coin, raw_block, first_height + n) for n, raw_block in enumerate(raw_blocks)]
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        jobs, height = [], first_height
+        for chunk in chunks:
+            jobs.append(asyncio.ensure_future(self._decode_chunk(chunk, height)))
+            height += len(chunk)
+        try:
+            for job in jobs:
+                yield await job
+        finally:
+            for job in jobs:
+                job.cancel()
+
+    async def _decode_chunk(self, raw_blocks: typing.List[bytes], first_height: int) -> typing.List[DecodedBlock]:
+        decoded = await asyncio.get_event_loop().run_in_executor(
+            self._executor, _decode_blocks, self.coin, raw_blocks, first_height
+        )
+        return [DecodedBlock(raw_block, *header_and_txs) for raw_block, header_and_txs in zip(raw_blocks, decoded)]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -2,7 +2,7 @@ import time
 import asyncio
 from struct import pack, unpack
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import Optional
+from typing import Dict, Optional
 from prometheus_client import Gauge, Histogram
 import lbry
 from lbry.schema.claim import Claim
@@ -11,6 +11,10 @@ from lbry.wallet.server.daemon import DaemonError
 from lbry.wallet.server.hash import hash_to_hex_str, HASHX_LEN
 from lbry.wallet.server.util import chunks, class_logger
 from lbry.wallet.server.leveldb import FlushData
+from lbry.wallet.server.block_decoder import BlockDecoder
+
+
+MAX_PUSHED_BLOCKS = 16
 
 
 class Prefetcher:
@@ -34,6 +38,10 @@ class Prefetcher:
         # This makes the first fetch be 10 blocks
         self.ave_size = self.min_cache_size // 10
         self.polling_delay = 5
+        # Set when the daemon pushes a new block, ends the polling delay early
+        self.wakeup = asyncio.Event()
+        # Raw blocks pushed by the daemon, by hex hash, used instead of fetching them
+        self.pushed_blocks: Dict[str, bytes] = {}
 
     async def main_loop(self, bp_height):
         """Loop forever polling for more blocks."""
@@ -42,11 +50,32 @@ class Prefetcher:
             try:
                 # Sleep a while if there is nothing to prefetch
                 await self.refill_event.wait()
+                self.wakeup.clear()
                 if not await self._prefetch_blocks():
-                    await asyncio.sleep(self.polling_delay)
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), self.polling_delay)
+                    except asyncio.TimeoutError:
+                        pass
             except DaemonError as e:
                 self.logger.info(f'ignoring daemon error: {e}')
 
+    def push_block(self, hex_hash: str, raw_block: Optional[bytes] = None):
+        """Called when the daemon pushes a new block, with its raw bytes if they were pushed too."""
+        if raw_block is not None:
+            self.pushed_blocks[hex_hash] = raw_block
+            while len(self.pushed_blocks) > MAX_PUSHED_BLOCKS:
+                self.pushed_blocks.pop(next(iter(self.pushed_blocks)))
+        self.wakeup.set()
+
+    async def _raw_blocks(self, hex_hashes):
+        """Return the raw blocks, fetching from the daemon those that were not pushed."""
+        blocks = [self.pushed_blocks.pop(hex_hash, None) for hex_hash in hex_hashes]
+        missing = [hex_hash for hex_hash, block in zip(hex_hashes, blocks) if block is None]
+        if missing:
+            fetched = iter(await self.daemon.raw_blocks(missing))
+            blocks = [block if block is not None else next(fetched) for block in blocks]
+        return blocks
+
     def get_prefetched_blocks(self):
         """Called by block processor when it is processing queued blocks."""
         blocks = self.blocks
@@ -100,7 +129,7 @@ class Prefetcher:
                 if self.caught_up:
                     self.logger.info('new block height {:,d} hash {}'
                                      .format(first + count-1, hex_hashes[-1]))
-                blocks = await daemon.raw_blocks(hex_hashes)
+                blocks = await self._raw_blocks(hex_hashes)
 
                 assert count == len(blocks)
 
@@ -151,6 +180,13 @@ class BlockProcessor:
     reorg_count_metric = Gauge(
         "reorg_count", "Number of reorgs", namespace=NAMESPACE
     )
+    flush_time_metric = Histogram(
+        "flush_time", "Time to write a flush", namespace=NAMESPACE, buckets=HISTOGRAM_BUCKETS
+    )
+    flush_overlap_time_metric = Histogram(
+        "flush_overlap_time", "Time spent advancing blocks while a flush was written",
+        namespace=NAMESPACE, buckets=HISTOGRAM_BUCKETS
+    )
 
     def __init__(self, env, db, daemon, notifications):
         self.env = env
@@ -161,13 +197,17 @@ class BlockProcessor:
         self.coin = env.coin
         self.blocks_event = asyncio.Event()
         self.prefetcher = Prefetcher(daemon, env.coin, self.blocks_event)
+        self.decoder = BlockDecoder(env.coin, env.block_decode_workers)
         self.logger = class_logger(__name__, self.__class__.__name__)
         self.executor = ThreadPoolExecutor(1)
+        self.flush_executor = ThreadPoolExecutor(1)
 
         # Meta
         self.next_cache_check = 0
         self.touched = set()
         self.reorg_count = 0
+        # perf_counter when the last blocks started being processed, for notification latency
+        self.blocks_received = time.perf_counter()
 
         # Caches of unflushed items.
         self.headers = []
@@ -179,12 +219,19 @@ class BlockProcessor:
         self.utxo_cache = {}
         self.db_deletes = []
 
+        # Background flush, and the state it is writing while its UTXOs
+        # are not committed
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flushing: Optional[FlushData] = None
+        self.flush_overlap = 0.0
+
         # If the lock is successfully acquired, in-memory chain state
         # is consistent with self.height
         self.state_lock = asyncio.Lock()
 
         self.search_cache = {}
         self.history_cache = {}
+        self.front_page = None
 
     async def run_in_thread_with_lock(self, func, *args):
         # Run in a thread to prevent blocking.  Shielded so that
@@ -204,29 +251,33 @@ class BlockProcessor:
         if not raw_blocks:
             return
         first = self.height + 1
-        blocks = [self.coin.block(raw_block, first + n)
-                  for n, raw_block in enumerate(raw_blocks)]
-        headers = [block.header for block in blocks]
+        headers = [self.coin.block_header(raw_block, first + n)
+                   for n, raw_block in enumerate(raw_blocks)]
         hprevs = [self.coin.header_prevhash(h) for h in headers]
         chain = [self.tip] + [self.coin.header_hash(h) for h in headers[:-1]]
 
         if hprevs == chain:
-            start = time.perf_counter()
-            await self.run_in_thread_with_lock(self.advance_blocks, blocks)
+            start = self.blocks_received = time.perf_counter()
+            # blocks are advanced a chunk at a time while the following chunks are decoded
+            async for blocks in self.decoder.decode(raw_blocks, first):
+                self.check_background_flush()
+                advance_start = time.perf_counter()
+                await self.run_in_thread_with_lock(self.advance_blocks, blocks)
+                if self.flush_task is not None and not self.flush_task.done():
+                    self.flush_overlap += time.perf_counter() - advance_start
+            claim_changes = self.db.sql.pop_claim_changes()
             for cache in self.search_cache.values():
-                cache.clear()
+                cache.invalidate(claim_changes)
             self.history_cache.clear()
             self.notifications.notified_mempool_txs.clear()
-            await self._maybe_flush()
+            touched, self.touched = self.touched, set()
+            await self._maybe_flush(touched)
             processed_time = time.perf_counter() - start
             self.block_count_metric.set(self.height)
             self.block_update_time_metric.observe(processed_time)
             if not self.db.first_sync:
-                s = '' if len(blocks) == 1 else 's'
-                self.logger.info('processed {:,d} block{} in {:.1f}s'.format(len(blocks), s, processed_time))
-            if self._caught_up_event.is_set():
-                await self.notifications.on_block(self.touched, self.height)
-            self.touched = set()
+                s = '' if len(raw_blocks) == 1 else 's'
+                self.logger.info('processed {:,d} block{} in {:.1f}s'.format(len(raw_blocks), s, processed_time))
         elif hprevs[0] != chain[0]:
             await self.reorg_chain()
         else:
@@ -280,6 +331,11 @@ class BlockProcessor:
                 last -= len(raw_blocks)
 
             await self.run_in_thread_with_lock(self.db.sql.delete_claims_above_height, self.height)
+            self.db.sql.pop_claim_changes()
+            for cache in self.search_cache.values():
+                cache.clear()
+            if self.front_page is not None:
+                self.front_page.clear()
             await self.prefetcher.reset_height(self.height)
             self.reorg_count_metric.inc()
         except:
@@ -353,19 +409,94 @@ class BlockProcessor:
                          self.block_txs, self.undo_infos, self.utxo_cache,
                          self.db_deletes, self.tip)
 
+    def take_flush_data(self, flush_utxos):
+        """The data for a background flush.  Block processing continues
+        with empty caches, the UTXO caches are only handed over if
+        flush_utxos.  The lock must be taken."""
+        assert self.state_lock.locked()
+        flush_data = FlushData(self.height, self.tx_count, self.headers, self.block_hashes,
+                               self.block_txs, self.undo_infos, self.utxo_cache,
+                               self.db_deletes, self.tip, self.db.history.take_unflushed())
+        self.headers, self.block_hashes, self.block_txs = [], [], []
+        if flush_utxos:
+            self.undo_infos, self.utxo_cache, self.db_deletes = [], {}, []
+        return flush_data
+
     async def flush(self, flush_utxos):
+        """Flush everything, waiting for it to be written."""
         def flush():
+            start = time.perf_counter()
             self.db.flush_dbs(self.flush_data(), flush_utxos,
                               self.estimate_txs_remaining)
+            self.flush_time_metric.observe(time.perf_counter() - start)
+        await self.wait_for_background_flush()
         await self.run_in_thread_with_lock(flush)
 
-    async def _maybe_flush(self):
+    async def background_flush(self, flush_utxos, touched=None):
+        """Flush everything while blocks continue to be processed.
+
+        Returns once the previous background flush is written and the
+        state to flush is handed over.  If touched is given clients are
+        notified of the flushed height once it is written.
+        """
+        await self.wait_for_background_flush()
+        async with self.state_lock:
+            flush_data = self.take_flush_data(flush_utxos)
+        if flush_utxos:
+            self.flushing = flush_data
+        self.flush_overlap = 0.0
+        self.flush_task = asyncio.ensure_future(self._background_flush(flush_data, flush_utxos, touched))
+
+    async def _background_flush(self, flush_data, flush_utxos, touched):
+        start = time.perf_counter()
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                self.flush_executor, self.db.flush_dbs, flush_data, flush_utxos, self.estimate_txs_remaining
+            )
+        except Exception:
+            # its UTXOs are not committed, they stay reachable through self.flushing and block
+            # processing stops at the next check_background_flush()
+            self.logger.exception(f'background flush of height {flush_data.height:,d} failed')
+            raise
+        self.flushing = None
+        self.flush_time_metric.observe(time.perf_counter() - start)
+        self.flush_overlap_time_metric.observe(self.flush_overlap)
+        # history read before the flush finished could be stale
+        self.history_cache.clear()
+        if touched is not None:
+            await self.notifications.on_block(touched, flush_data.height)
+
+    async def wait_for_background_flush(self):
+        """Wait for the background flush, raising if it failed."""
+        if self.flush_task is not None:
+            await asyncio.shield(self.flush_task)
+            self.flush_task = None
+
+    def check_background_flush(self):
+        """Raise the error of the background flush if it failed, no more
+        blocks should be processed on top of a state that isn't written."""
+        if self.flush_task is not None and self.flush_task.done():
+            self.flush_task.result()
+
+    def background_flush_failed(self):
+        task = self.flush_task
+        return task is not None and task.done() and (task.cancelled() or task.exception() is not None)
+
+    async def _maybe_flush(self, touched):
         # If caught up, flush everything as client queries are
-        # performed on the DB.
+        # performed on the DB.  Clients are notified once the flush is
+        # written.
         if self._caught_up_event.is_set():
-            await self.flush(True)
+            if self.env.background_flush:
+                await self.background_flush(True, touched)
+            else:
+                await self.flush(True)
+                await self.notifications.on_block(touched, self.height)
         elif time.perf_counter() > self.next_cache_check:
-            await self.flush(True)
+            if self.env.background_flush:
+                await self.background_flush(True)
+            else:
+                await self.flush(True)
             self.next_cache_check = time.perf_counter() + 30
 
     def check_cache_size(self):
@@ -431,7 +562,6 @@ class BlockProcessor:
         undo_info_append = undo_info.append
         update_touched = self.touched.update
         append_hashX_by_tx = hashXs_by_tx.append
-        hashX_from_script = self.coin.hashX_from_script
 
         for tx, tx_hash in txs:
             hashXs = []
@@ -439,20 +569,15 @@ class BlockProcessor:
             tx_numb = pack('<I', tx_num)
 
             # Spend the inputs
-            for txin in tx.inputs:
-                if txin.is_generation():
-                    continue
-                cache_value = spend_utxo(txin.prev_hash, txin.prev_idx)
+            for prev_hash, prev_idx in tx.prevouts:
+                cache_value = spend_utxo(prev_hash, prev_idx)
                 undo_info_append(cache_value)
                 append_hashX(cache_value[:-12])
 
-            # Add the new UTXOs
-            for idx, txout in enumerate(tx.outputs):
-                # Get the hashX.  Ignore unspendable outputs
-                hashX = hashX_from_script(txout.pk_script)
-                if hashX:
-                    append_hashX(hashX)
-                    put_utxo(tx_hash + pack('<H', idx), hashX + tx_numb + pack('<Q', txout.value))
+            # Add the new UTXOs, unspendable outputs were dropped by the decoder
+            for idx, hashX, value in tx.outputs:
+                append_hashX(hashX)
+                put_utxo(tx_hash + pack('<H', idx), hashX + tx_numb + pack('<Q', value))
 
             append_hashX_by_tx(hashXs)
             update_touched(hashXs)
@@ -594,6 +719,17 @@ class BlockProcessor:
         if cache_value:
             return cache_value
 
+        # Then in the UTXOs of a background flush.  They are committed
+        # before the next flush, which deletes them.
+        flushing = self.flushing
+        if flushing is not None:
+            cache_value = flushing.adds.get(tx_hash + idx_packed)
+            if cache_value:
+                suffix = idx_packed + cache_value[-12:-8]
+                self.db_deletes.append(b'h' + tx_hash[:4] + suffix)
+                self.db_deletes.append(b'u' + cache_value[:-12] + suffix)
+                return cache_value
+
         # Spend it from the DB.
 
         # Key: b'h' + compressed_tx_hash + tx_idx + tx_num
@@ -696,10 +832,16 @@ class BlockProcessor:
             raise
         finally:
             # Shut down block processing
-            self.logger.info('flushing to DB for a clean shutdown...')
-            await self.flush(True)
+            if self.background_flush_failed():
+                # the DB state is written last, blocks after it are processed again on restart
+                self.logger.error('not flushing to DB, a background flush failed')
+            else:
+                self.logger.info('flushing to DB for a clean shutdown...')
+                await self.flush(True)
             self.db.close()
             self.executor.shutdown(wait=True)
+            self.flush_executor.shutdown(wait=True)
+            self.decoder.shutdown()
 
     def force_chain_reorg(self, count):
         """Force a reorg of the given number of blocks.
@@ -775,6 +917,10 @@ class LBRYBlockProcessor(BlockProcessor):
         self.logger.info(f"LbryumX Block Processor - Validating signatures: {self.should_validate_signatures}")
         self.sql: SQLDB = self.db.sql
         self.timer = Timer('BlockProcessor')
+        # claims are counted by type and tag off the state lock, see count_claims
+        self.cardinality_executor = ThreadPoolExecutor(1)
+        self.cardinality_task: Optional[asyncio.Task] = None
+        self.cardinality_height = None
 
     def advance_blocks(self, blocks):
         self.sql.begin()
@@ -790,6 +936,44 @@ class LBRYBlockProcessor(BlockProcessor):
             if self.env.individual_tag_indexes:
                 self.timer.run(self.sql.execute, self.sql.TAG_INDEXES, timer_name='executing TAG_INDEXES')
             self.timer.run(self.sql.execute, self.sql.LANGUAGE_INDEXES, timer_name='executing LANGUAGE_INDEXES')
+        if self.cardinality_height is None:
+            self.cardinality_height = self.sql.get_claim_cardinality_height()
+
+    async def check_and_advance_blocks(self, raw_blocks):
+        await super().check_and_advance_blocks(raw_blocks)
+        if self.env.cardinality_sketch_blocks and self.cardinality_height is not None \
+                and self.height == self.daemon.cached_height():
+            if self.height - self.cardinality_height >= self.env.cardinality_sketch_blocks:
+                if self.cardinality_task is None or self.cardinality_task.done():
+                    self.cardinality_task = asyncio.create_task(self.count_claims())
+
+    async def count_claims(self):
+        """Count the claims by type and tag on a connection of its own while blocks are
+        advanced, then replace the counts under the state lock."""
+        height = self.height
+        loop = asyncio.get_event_loop()
+        start = time.perf_counter()
+        try:
+            counts = await loop.run_in_executor(self.cardinality_executor, self.sql.count_claim_cardinality)
+            async with self.state_lock:
+                if self.sql.db is None:  # closed by a shutdown while counting
+                    return
+                await loop.run_in_executor(
+                    self.cardinality_executor, self.sql.update_claim_cardinality, height, counts
+                )
+        except Exception:
+            self.logger.exception('failed to count claims by type and tag')
+            return
+        self.cardinality_height = height
+        self.logger.info(f'counted claims by type and tag at height {height:,d} in {time.perf_counter() - start:.1f}s')
+
+    async def fetch_and_process_blocks(self, caught_up_event):
+        try:
+            await super().fetch_and_process_blocks(caught_up_event)
+        finally:
+            if self.cardinality_task is not None:
+                self.cardinality_task.cancel()
+            self.cardinality_executor.shutdown(wait=True)
 
     def advance_txs(self, height, txs, header, block_hash):
         timer = self.timer.sub_timers['advance_blocks']
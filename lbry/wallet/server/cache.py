@@ -0,0 +1,284 @@
+import time
+import typing
+import asyncio
+from collections import OrderedDict
+
+if typing.TYPE_CHECKING:
+    from lbry.wallet.server.db.writer import ClaimChanges
+
+
+# search arguments whose values are unordered collections, sorting them lets
+# equivalent queries share the same cache entry
+UNORDERED_SEARCH_PARAMS = {
+    'claim_ids', 'channel_ids', 'not_channel_ids', 'claim_type', 'stream_types', 'media_types',
+    'any_tags', 'all_tags', 'not_tags',
+    'any_languages', 'all_languages', 'not_languages',
+    'any_locations', 'all_locations', 'not_locations',
+}
+
+# rough per entry overhead (key, item, dict slot), charged before a result is available
+ENTRY_OVERHEAD = 256
+
+
+def canonical_cache_key(kwargs: typing.Union[dict, tuple]) -> str:
+    """Return a cache key which is the same for equivalent queries.
+
+    Search constraints are sorted by name and the values of unordered list
+    arguments (tags, claim ids, etc) are sorted too. Positional arguments
+    (urls to resolve) keep their order since results are returned in order.
+    """
+    if not isinstance(kwargs, dict):
+        return repr(tuple(kwargs))
+    canonical = []
+    for key in sorted(kwargs):
+        value = kwargs[key]
+        if key in UNORDERED_SEARCH_PARAMS and isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(set(value), key=str))
+        elif isinstance(value, list):
+            value = tuple(value)
+        canonical.append((key, value))
+    return repr(tuple(canonical))
+
+
+class ResultCacheItem:
+    __slots__ = '_result', 'lock', 'has_result', 'size', 'created', 'claim_hashes', 'names'
+
+    def __init__(self):
+        self.has_result = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self._result = None
+        self.size = ENTRY_OVERHEAD
+        self.created = None
+        self.claim_hashes = None
+        self.names = None
+
+    @property
+    def result(self) -> str:
+        return self._result
+
+    @result.setter
+    def result(self, result: str):
+        self._result = result
+        if result is not None:
+            self.created = time.perf_counter()
+            self.has_result.set()
+
+    @property
+    def is_indexed(self) -> bool:
+        return self.claim_hashes is not None
+
+
+class ResultCache:
+    """
+    LRU cache of encoded query results bounded by the total size of the cached
+    responses rather than by the number of entries. Entries older than `ttl`
+    seconds are treated as missing, a `ttl` of 0 disables expiration.
+
+    Items are inserted before their result is known so that concurrent requests
+    for the same query wait on `item.lock` instead of querying again, the item
+    is charged for its result once `set_result` is called. An item which was
+    evicted or invalidated while its query was running is not re-added.
+
+    Results stored along with the claim hashes and normalized names they were
+    computed from are kept in a reverse index so that a block only invalidates
+    the results depending on claims or names it changed. Results stored without
+    them (search results) and pending items are invalidated by any change.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = 0, hits=None, misses=None, evictions=None, size=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._items: typing.Dict[str, ResultCacheItem] = OrderedDict()
+        self._unindexed: typing.Set[str] = set()
+        self._by_claim_hash: typing.Dict[bytes, typing.Set[str]] = {}
+        self._by_name: typing.Dict[str, typing.Set[str]] = {}
+        self._hits = hits
+        self._misses = misses
+        self._evictions = evictions
+        self._size_metric = size
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def __setitem__(self, key: str, item: ResultCacheItem):
+        self._remove(key)
+        self._items[key] = item
+        self._index(key, item)
+        self.size += item.size
+        self._evict()
+        self._update_size_metric()
+
+    def get(self, key: str) -> typing.Optional[ResultCacheItem]:
+        item = self._items.get(key)
+        if item is not None and self._is_expired(item):
+            self._remove(key)
+            self._update_size_metric()
+            item = None
+        if item is None or item.result is None:
+            if self._misses is not None:
+                self._misses.inc()
+            return item
+        self._items.move_to_end(key)
+        if self._hits is not None:
+            self._hits.inc()
+        return item
+
+    def set_result(self, key: str, item: ResultCacheItem, result: str,
+                   claim_hashes: typing.Optional[typing.Set[bytes]] = None,
+                   names: typing.Optional[typing.Set[str]] = None):
+        item.result = result
+        if self._items.get(key) is not item:
+            return
+        if claim_hashes is not None:
+            self._unindex(key, item)
+            item.claim_hashes = claim_hashes
+            item.names = names or set()
+            self._index(key, item)
+        added = len(key) + len(result)
+        item.size += added
+        self.size += added
+        self._evict()
+        self._update_size_metric()
+
+    def discard(self, key: str, item: ResultCacheItem):
+        """Drop a pending item whose query will not be run."""
+        if self._items.get(key) is item:
+            self._remove(key)
+            self._update_size_metric()
+
+    def invalidate(self, changes: 'ClaimChanges'):
+        """Drop cached results which could have been changed by a block."""
+        if changes.bulk:
+            self.clear()
+            return
+        if not changes.claim_hashes and not changes.names:
+            return
+        keys = set(self._unindexed)
+        for claim_hash in changes.claim_hashes:
+            keys.update(self._by_claim_hash.get(claim_hash, ()))
+        for name in changes.names:
+            keys.update(self._by_name.get(name, ()))
+        for key in keys:
+            self._remove(key)
+        self._update_size_metric()
+
+    def clear(self):
+        self._items.clear()
+        self._unindexed.clear()
+        self._by_claim_hash.clear()
+        self._by_name.clear()
+        self.size = 0
+        self._update_size_metric()
+
+    def _is_expired(self, item: ResultCacheItem) -> bool:
+        return bool(self.ttl) and item.created is not None and time.perf_counter() - item.created > self.ttl
+
+    def _remove(self, key: str) -> typing.Optional[ResultCacheItem]:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._unindex(key, item)
+            self.size -= item.size
+        return item
+
+    def _index(self, key: str, item: ResultCacheItem):
+        if not item.is_indexed:
+            self._unindexed.add(key)
+            return
+        for claim_hash in item.claim_hashes:
+            self._by_claim_hash.setdefault(claim_hash, set()).add(key)
+        for name in item.names:
+            self._by_name.setdefault(name, set()).add(key)
+
+    def _unindex(self, key: str, item: ResultCacheItem):
+        if not item.is_indexed:
+            self._unindexed.discard(key)
+            return
+        for index, values in ((self._by_claim_hash, item.claim_hashes), (self._by_name, item.names)):
+            for value in values:
+                keys = index.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[value]
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._items:
+            key, item = self._items.popitem(last=False)
+            self._unindex(key, item)
+            self.size -= item.size
+            if self._evictions is not None:
+                self._evictions.inc()
+
+    def _update_size_metric(self):
+        if self._size_metric is not None:
+            self._size_metric.set(self.size)
+
+
+class SizedLRUCache:
+    """
+    LRU cache bounded by the total size of its values rather than by the number of
+    entries, `sizeof(value)` estimates the memory an entry holds.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: typing.Callable[[typing.Any], int],
+                 hits=None, misses=None, evictions=None, size=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self._items: typing.Dict[typing.Hashable, typing.Tuple[typing.Any, int]] = OrderedDict()
+        self._hits = hits
+        self._misses = misses
+        self._evictions = evictions
+        self._size_metric = size
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def get(self, key, default=None):
+        entry = self._items.get(key)
+        if entry is None:
+            if self._misses is not None:
+                self._misses.inc()
+            return default
+        self._items.move_to_end(key)
+        if self._hits is not None:
+            self._hits.inc()
+        return entry[0]
+
+    def __setitem__(self, key, value):
+        self.pop(key)
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            self._update_size_metric()
+            return
+        self._items[key] = value, size
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self.size -= evicted_size
+            if self._evictions is not None:
+                self._evictions.inc()
+        self._update_size_metric()
+
+    def pop(self, key, default=None):
+        entry = self._items.pop(key, None)
+        if entry is None:
+            return default
+        self.size -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._items.clear()
+        self.size = 0
+        self._update_size_metric()
+
+    def _update_size_metric(self):
+        if self._size_metric is not None:
+            self._size_metric.set(self.size)
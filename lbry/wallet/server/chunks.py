@@ -0,0 +1,78 @@
+import zlib
+import typing
+
+# wallets sync headers in ranges of this many, starting at multiples of it
+CHUNK_SIZE = 1000
+# an empty final block, ends a raw deflate stream made of sync flushed parts
+FINAL_BLOCK = b'\x03\x00'
+
+
+def compressor():
+    return zlib.compressobj(wbits=-15, level=1, memLevel=9)
+
+
+class HeaderChunks:
+    """
+    Compressed headers of the complete CHUNK_SIZE ranges of the chain, for the
+    base64 responses of blockchain.block.headers.
+
+    Every chunk is compressed by its own compressor and sync flushed instead of
+    finished, so the raw deflate streams of consecutive chunks concatenate into one.
+    A response copies the chunks its range covers and only compresses the headers
+    before the first and after the last one.
+
+    Chunks are added by extend() in a thread as blocks arrive. A chunk is used only
+    while its last header is still the one being served, which a reorg changes, and
+    extend() drops the replaced chunks by swapping in a new list so readers on the
+    event loop never see one shrink.
+    """
+
+    def __init__(self, read_headers: typing.Callable[[int, int], typing.Tuple[bytes, int]], header_size: int):
+        self.read_headers = read_headers
+        self.header_size = header_size
+        # (last header, compressed headers) of each chunk
+        self.chunks: typing.List[typing.Tuple[bytes, bytes]] = []
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def extend(self) -> int:
+        """Drop the chunks replaced by a reorg and compress the complete chunks
+        not compressed yet. Returns the number of chunks compressed."""
+        chunks = self.chunks
+        keep = len(chunks)
+        while keep and self.read_headers(keep * CHUNK_SIZE - 1, 1)[0] != chunks[keep - 1][0]:
+            keep -= 1
+        if keep < len(chunks):
+            chunks = self.chunks = chunks[:keep]
+        added = 0
+        while True:
+            headers, count = self.read_headers(len(chunks) * CHUNK_SIZE, CHUNK_SIZE)
+            if count < CHUNK_SIZE:
+                return added
+            compress = compressor()
+            chunks.append((headers[-self.header_size:], compress.compress(headers) + compress.flush(zlib.Z_SYNC_FLUSH)))
+            added += 1
+
+    def compress(self, start_height: int, headers: bytes) -> bytes:
+        """Return the raw deflate stream of headers, the concatenated headers from
+        start_height on."""
+        size, chunks = self.header_size, self.chunks
+        first = -(-start_height // CHUNK_SIZE)
+        last = min((start_height + len(headers) // size) // CHUNK_SIZE, len(chunks))
+        parts = []
+        if first < last:
+            head = (first * CHUNK_SIZE - start_height) * size
+            tail = (last * CHUNK_SIZE - start_height) * size
+            if headers[tail - size:tail] == chunks[last - 1][0]:
+                if head:
+                    compress = compressor()
+                    parts.append(compress.compress(headers[:head]) + compress.flush(zlib.Z_SYNC_FLUSH))
+                parts.extend(compressed for _, compressed in chunks[first:last])
+                headers = headers[tail:]
+        if headers:
+            compress = compressor()
+            parts.append(compress.compress(headers) + compress.flush())
+        else:
+            parts.append(FINAL_BLOCK)
+        return b''.join(parts)
@@ -2,6 +2,7 @@ import asyncio
 import itertools
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
 import aiohttp
@@ -25,24 +26,44 @@ class WorkQueueFullError(Exception):
 
 
 NAMESPACE = "wallet_server"
+HISTOGRAM_BUCKETS = (
+    .005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0, float('inf')
+)
+
+# Responses at least this big are decoded in a thread instead of on the event loop
+DECODE_IN_THREAD_SIZE = 256 * 1024
 
 
 class Daemon:
-    """Handles connections to a daemon at the given URL."""
+    """Handles connections to a daemon at the given URL.
+
+    Requests go through a pool of up to `max_workqueue` keep-alive connections.
+    Vectors of requests of one method are split in batches sent concurrently, the
+    batch size of each method adapts so a batch takes about `batch_target_secs`.
+    """
 
     WARMING_UP = -28
     id_counter = itertools.count()
 
     lbrycrd_request_time_metric = Histogram(
-        "lbrycrd_request", "lbrycrd requests count", namespace=NAMESPACE, labelnames=("method",)
+        "lbrycrd_request", "lbrycrd requests count", namespace=NAMESPACE, labelnames=("method",),
+        buckets=HISTOGRAM_BUCKETS
     )
     lbrycrd_pending_count_metric = Gauge(
         "lbrycrd_pending_count", "Number of lbrycrd rpcs that are in flight", namespace=NAMESPACE,
         labelnames=("method",)
     )
+    lbrycrd_batch_size_metric = Gauge(
+        "lbrycrd_batch_size", "Number of requests sent per batch to lbrycrd", namespace=NAMESPACE,
+        labelnames=("method",)
+    )
+    lbrycrd_decode_time_metric = Histogram(
+        "lbrycrd_decode", "Time to decode lbrycrd responses", namespace=NAMESPACE, labelnames=("method",),
+        buckets=HISTOGRAM_BUCKETS
+    )
 
     def __init__(self, coin, url, max_workqueue=10, init_retry=0.25,
-                 max_retry=4.0):
+                 max_retry=4.0, batch_target_secs=0.5, init_batch_size=100, max_batch_size=1000):
         self.coin = coin
         self.logger = class_logger(__name__, self.__class__.__name__)
         self.set_url(url)
@@ -51,16 +72,26 @@ class Daemon:
         self.workqueue_semaphore = asyncio.Semaphore(value=max_workqueue)
         self.init_retry = init_retry
         self.max_retry = max_retry
+        self.batch_target_secs = batch_target_secs
+        self.init_batch_size = init_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = {}
         self._height = None
         self.available_rpcs = {}
-        self.connector = aiohttp.TCPConnector()
+        self.connector = aiohttp.TCPConnector(limit=max_workqueue)
+        self._session = None
+        self.decode_executor = ThreadPoolExecutor(1)
         self._block_hash_cache = LRUCache(100000)
         self._block_cache = LRUCache(2**16, metric_name='block', namespace=NAMESPACE)
 
     async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
         if self.connector:
             await self.connector.close()
             self.connector = None
+        self.decode_executor.shutdown(wait=False)
 
     def set_url(self, url):
         """Set the URLS to the given list, and switch to the first one."""
@@ -94,25 +125,58 @@ class Daemon:
         return False
 
     def client_session(self):
-        """An aiohttp client session."""
-        return aiohttp.ClientSession(connector=self.connector, connector_owner=False)
+        """The aiohttp client session, its connections are kept alive between requests."""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=self.connector, connector_owner=False)
+        return self._session
 
     async def _send_data(self, data):
+        """Post the data, returns the undecoded JSON response and the time the daemon took."""
         if not self.connector:
             raise asyncio.CancelledError('Tried to send request during shutdown.')
         async with self.workqueue_semaphore:
-            async with self.client_session() as session:
-                async with session.post(self.current_url(), data=data) as resp:
-                    kind = resp.headers.get('Content-Type', None)
-                    if kind == 'application/json':
-                        return await resp.json()
-                    # bitcoind's HTTP protocol "handling" is a bad joke
-                    text = await resp.text()
-                    if 'Work queue depth exceeded' in text:
-                        raise WorkQueueFullError
-                    text = text.strip() or resp.reason
-                    self.logger.error(text)
-                    raise DaemonError(text)
+            start = time.perf_counter()
+            async with self.client_session().post(self.current_url(), data=data) as resp:
+                kind = resp.headers.get('Content-Type', None)
+                if kind == 'application/json':
+                    return await resp.read(), time.perf_counter() - start
+                # bitcoind's HTTP protocol "handling" is a bad joke
+                text = await resp.text()
+                if 'Work queue depth exceeded' in text:
+                    raise WorkQueueFullError
+                text = text.strip() or resp.reason
+                self.logger.error(text)
+                raise DaemonError(text)
+
+    @staticmethod
+    def _decode(body, processor):
+        return processor(json.loads(body))
+
+    async def _process(self, method, body, processor):
+        """Decode and process a response, in a thread if it is big enough to stall the event loop."""
+        start = time.perf_counter()
+        if len(body) < DECODE_IN_THREAD_SIZE:
+            result = self._decode(body, processor)
+        else:
+            result = await asyncio.get_event_loop().run_in_executor(
+                self.decode_executor, self._decode, body, processor
+            )
+        self.lbrycrd_decode_time_metric.labels(method=method).observe(time.perf_counter() - start)
+        return result
+
+    def batch_size(self, method):
+        return self.batch_sizes.get(method, self.init_batch_size)
+
+    def _adapt_batch_size(self, method, count, elapsed):
+        """Move the batch size of a method towards the size the daemon answers in batch_target_secs."""
+        size = self.batch_size(method)
+        if count < size // 2:
+            # the fixed cost of a request dominates small batches
+            return
+        target = self.batch_target_secs * count / max(elapsed, 1e-6)
+        size = max(1, min(self.max_batch_size, int((size + target) / 2)))
+        self.batch_sizes[method] = size
+        self.lbrycrd_batch_size_metric.labels(method=method).set(size)
 
     async def _send(self, payload, processor):
         """Send a payload to be converted to JSON.
@@ -141,8 +205,10 @@ class Daemon:
             try:
                 for method in methods:
                     self.lbrycrd_pending_count_metric.labels(method=method).inc()
-                result = await self._send_data(data)
-                result = processor(result)
+                body, elapsed = await self._send_data(data)
+                result = await self._process(methods[0], body, processor)
+                if isinstance(payload, list):
+                    self._adapt_batch_size(methods[0], len(payload), elapsed)
                 if on_good_message:
                     self.logger.info(on_good_message)
                 return result
@@ -189,12 +255,13 @@ class Daemon:
         self.lbrycrd_request_time_metric.labels(method=method).observe(time.perf_counter() - start)
         return result
 
-    async def _send_vector(self, method, params_iterable, replace_errs=False):
+    async def _send_vector(self, method, params_iterable, replace_errs=False, convert=None):
         """Send several requests of the same method.
 
         The result will be an array of the same length as params_iterable.
         If replace_errs is true, any item with an error is returned as None,
-        otherwise an exception is raised."""
+        otherwise an exception is raised. Results that are not None are passed
+        through convert, with the decoding of the response."""
 
         start = time.perf_counter()
 
@@ -203,14 +270,20 @@ class Daemon:
             if any(err.get('code') == self.WARMING_UP for err in errs):
                 raise WarmingUpError
             if not errs or replace_errs:
-                return [item['result'] for item in result]
+                if convert is None:
+                    return [item['result'] for item in result]
+                return [convert(item['result']) if item['result'] else None for item in result]
             raise DaemonError(errs)
 
         payload = [{'method': method, 'params': p, 'id': next(self.id_counter)}
                    for p in params_iterable]
         result = []
         if payload:
-            result = await self._send(payload, processor)
+            batch_size = self.batch_size(method)
+            batches = await asyncio.gather(*(
+                self._send(payload[i:i + batch_size], processor) for i in range(0, len(payload), batch_size)
+            ))
+            result = list(itertools.chain.from_iterable(batches))
         self.lbrycrd_request_time_metric.labels(method=method).observe(time.perf_counter() - start)
         return result
 
@@ -258,9 +331,8 @@ class Daemon:
     async def raw_blocks(self, hex_hashes):
         """Return the raw binary blocks with the given hex hashes."""
         params_iterable = ((h, False) for h in hex_hashes)
-        blocks = await self._send_vector('getblock', params_iterable)
-        # Convert hex string to bytes
-        return [hex_to_bytes(block) for block in blocks]
+        # Hex strings are converted to bytes with the decoding of the response
+        return await self._send_vector('getblock', params_iterable, convert=hex_to_bytes)
 
     async def mempool_hashes(self):
         """Update our record of the daemon's mempool hashes."""
@@ -298,10 +370,16 @@ class Daemon:
 
         Replaces errors with None by default."""
         params_iterable = ((hex_hash, 0) for hex_hash in hex_hashes)
-        txs = await self._send_vector('getrawtransaction', params_iterable,
-                                      replace_errs=replace_errs)
-        # Convert hex strings to bytes
-        return [hex_to_bytes(tx) if tx else None for tx in txs]
+        # Hex strings are converted to bytes with the decoding of the response
+        return await self._send_vector('getrawtransaction', params_iterable,
+                                       replace_errs=replace_errs, convert=hex_to_bytes)
+
+    async def mempool_entries(self, hex_hashes):
+        """Return the mempool entries of the transactions with the given hashes.
+
+        Transactions which are not in the mempool are returned as None."""
+        params_iterable = ((hex_hash,) for hex_hash in hex_hashes)
+        return await self._send_vector('getmempoolentry', params_iterable, replace_errs=True)
 
     async def broadcast_transaction(self, raw_tx):
         """Broadcast a transaction to the network."""
@@ -318,6 +396,10 @@ class Daemon:
         If the daemon has not been queried yet this returns None."""
         return self._height
 
+    def set_cached_height(self, height):
+        """Set the cached daemon height to one queried elsewhere."""
+        self._height = height
+
 
 def handles_errors(decorated_function):
     @wraps(decorated_function)
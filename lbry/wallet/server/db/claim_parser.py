@@ -0,0 +1,146 @@
+import typing
+from decimal import Decimal
+from itertools import repeat
+from collections import namedtuple
+from concurrent.futures.process import ProcessPoolExecutor
+
+from lbry.schema.tags import clean_tags
+from lbry.schema.mime_types import guess_stream_type
+from lbry.wallet.transaction import Transaction, Output
+
+from .common import CLAIM_TYPES, STREAM_TYPES
+
+# what the claims db needs from the protobuf of a claim output: metadata are claim table
+# columns, channels have their public key and its hash, signed claims have their DER encoded
+# signature and the digest it signs
+ParsedClaim = namedtuple('ParsedClaim', (
+    'metadata', 'tags', 'language', 'is_channel', 'public_key_bytes', 'public_key_hash',
+    'signing_channel_hash', 'signature', 'signature_digest'
+))
+
+# claims parsed and signatures verified by one job of the worker processes, smaller
+# batches are handled in process
+CLAIM_PARSE_CHUNK = 100
+
+
+def parse_claim(txo: Output, ledger) -> typing.Optional[ParsedClaim]:
+    try:
+        claim = txo.claim
+    except:
+        return None
+
+    language = 'none'
+    try:
+        if claim.is_stream and claim.stream.languages:
+            language = claim.stream.languages[0].language
+    except:
+        pass
+
+    metadata = {}
+    if claim.is_stream:
+        metadata['claim_type'] = CLAIM_TYPES['stream']
+        metadata['media_type'] = claim.stream.source.media_type
+        metadata['stream_type'] = STREAM_TYPES[guess_stream_type(metadata['media_type'])]
+        metadata['title'] = claim.stream.title
+        metadata['description'] = claim.stream.description
+        metadata['author'] = claim.stream.author
+        if claim.stream.video and claim.stream.video.duration:
+            metadata['duration'] = claim.stream.video.duration
+        if claim.stream.audio and claim.stream.audio.duration:
+            metadata['duration'] = claim.stream.audio.duration
+        if claim.stream.release_time:
+            metadata['release_time'] = claim.stream.release_time
+        if claim.stream.has_fee:
+            fee = claim.stream.fee
+            if isinstance(fee.currency, str):
+                metadata['fee_currency'] = fee.currency.lower()
+            if isinstance(fee.amount, Decimal):
+                metadata['fee_amount'] = int(fee.amount*1000)
+    elif claim.is_repost:
+        metadata['claim_type'] = CLAIM_TYPES['repost']
+        metadata['reposted_claim_hash'] = claim.repost.reference.claim_hash
+    elif claim.is_channel:
+        metadata['claim_type'] = CLAIM_TYPES['channel']
+
+    public_key_bytes = public_key_hash = None
+    signing_channel_hash = signature = signature_digest = None
+    if claim.is_channel:
+        public_key_bytes = claim.channel.public_key_bytes
+        public_key_hash = ledger.address_to_hash160(ledger.public_key_to_address(public_key_bytes))
+    elif claim.is_signed:
+        signing_channel_hash = claim.signing_channel_hash
+        signature = txo.get_encoded_signature()
+        signature_digest = txo.get_signature_digest(ledger)
+
+    return ParsedClaim(
+        metadata, tuple(clean_tags(claim.message.tags)), language, claim.is_channel,
+        public_key_bytes, public_key_hash, signing_channel_hash, signature, signature_digest
+    )
+
+
+def _parse_claims(ledger, claims: typing.List[typing.Tuple[bytes, int]]) -> typing.List[typing.Optional[ParsedClaim]]:
+    # runs in a worker process, claims are (raw tx, nout) pairs and consecutive claims of a tx parse it once
+    parsed, tx = [], None
+    for raw, nout in claims:
+        if tx is None or tx.raw != raw:
+            tx = Transaction(raw)
+        parsed.append(parse_claim(tx.outputs[nout], ledger))
+    return parsed
+
+
+def verify_signatures(signatures: typing.List[typing.Tuple[bytes, bytes, bytes]]) -> typing.List[bool]:
+    return [
+        Output.is_signature_valid(signature, signature_digest, public_key_bytes)
+        for signature, signature_digest, public_key_bytes in signatures
+    ]
+
+
+def _chunks(items: typing.List, size: int) -> typing.List[typing.List]:
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+
+class ClaimParser:
+    """
+    Parses the protobuf of claims and verifies channel signatures for the claims db writer.
+    Neither depends on the claims db, so the claims of a block are split in chunks handled
+    concurrently by worker processes and the results are merged back in order, leaving
+    only the SQLite writes serialized on the writer thread.
+
+    Batches fitting in a single chunk are handled in process, as are all batches of a
+    parser without workers.
+    """
+
+    def __init__(self, ledger, workers: int, chunk_size: int = CLAIM_PARSE_CHUNK):
+        self.ledger = ledger
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor: typing.Optional[ProcessPoolExecutor] = None
+
+    def _fan_out(self, items: typing.List) -> bool:
+        if self.workers <= 0 or len(items) <= self.chunk_size:
+            return False
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        return True
+
+    def parse(self, txos: typing.List[Output]) -> typing.Dict[bytes, typing.Optional[ParsedClaim]]:
+        """ Parsed claims by txo hash, None for claims that could not be parsed. """
+        if not self._fan_out(txos):
+            return {txo.ref.hash: parse_claim(txo, self.ledger) for txo in txos}
+        chunks = _chunks([(txo.tx_ref.tx.raw, txo.position) for txo in txos], self.chunk_size)
+        parsed = (
+            claim for chunk in self._executor.map(_parse_claims, repeat(self.ledger), chunks) for claim in chunk
+        )
+        return {txo.ref.hash: claim for txo, claim in zip(txos, parsed)}
+
+    def verify(self, signatures: typing.List[typing.Tuple[bytes, bytes, bytes]]) -> typing.List[bool]:
+        """ Validity of (signature, signature digest, channel public key) triples, in order. """
+        if not self._fan_out(signatures):
+            return verify_signatures(signatures)
+        chunks = _chunks(signatures, self.chunk_size)
+        return [valid for chunk in self._executor.map(verify_signatures, chunks) for valid in chunk]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -1,23 +1,28 @@
 import time
+import json
 import struct
 import apsw
 import logging
 from operator import itemgetter
-from typing import Tuple, List, Dict, Union, Type, Optional
+from typing import Tuple, List, Dict, Union, Type, Optional, Set
 from binascii import unhexlify
 from decimal import Decimal
 from contextvars import ContextVar
 from functools import wraps
+from collections import OrderedDict
 from itertools import chain
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from lbry.wallet.database import query, interpolate
 from lbry.error import ResolveCensoredError
-from lbry.schema.url import URL, normalize_name
+from lbry.schema.url import URL, PathSegment, normalize_name
 from lbry.schema.tags import clean_tags
 from lbry.schema.result import Outputs, Censor
 from lbry.wallet import Ledger, RegTestLedger
 
+from lbry.wallet.server.cache import canonical_cache_key
+
+from .shared_map import SharedHashMap
 from .common import CLAIM_TYPES, STREAM_TYPES, COMMON_TAGS, INDEXED_LANGUAGES
 from .full_text_search import FTS_ORDER_BY
 
@@ -28,6 +33,10 @@ class SQLiteOperationalError(apsw.Error):
         self.metrics = metrics
 
 
+class InvalidContinuationError(ValueError):
+    """A search continuation token which is malformed or does not match the search."""
+
+
 class SQLiteInterruptedError(apsw.InterruptError):
     def __init__(self, metrics):
         super().__init__('sqlite query interrupted')
@@ -53,14 +62,86 @@ SEARCH_PARAMS = {
     'any_locations', 'all_locations', 'not_locations',
     'any_languages', 'all_languages', 'not_languages',
     'is_controlling', 'limit', 'offset', 'order_by',
-    'no_totals',
+    'no_totals', 'estimate_totals', 'continuation',
 } | INTEGER_PARAMS
 
 
+SEARCH_CLAIM_COLUMNS = """
+claimtrie.claim_hash as is_controlling,
+claimtrie.last_take_over_height,
+claim.claim_hash, claim.txo_hash,
+claim.claims_in_channel, claim.reposted,
+claim.height, claim.creation_height,
+claim.activation_height, claim.expiration_height,
+claim.effective_amount, claim.support_amount,
+claim.trending_group, claim.trending_mixed,
+claim.trending_local, claim.trending_global,
+claim.short_url, claim.canonical_url,
+claim.channel_hash, claim.reposted_claim_hash,
+claim.signature_valid
+"""
+
+# candidates fetched per url segment by the batched resolver, a segment whose candidates
+# are all censored is resolved again by `resolve_url` as there may be more of them
+RESOLVE_BATCH_CANDIDATES = 5
+# url segments resolved by a single statement, keeps the number of bound variables low
+RESOLVE_BATCH_SIZE = 200
+
+
 ORDER_FIELDS = {
    'name', 'claim_hash'
 } | INTEGER_PARAMS
 
+# order fields which are never NULL, searches sorted by them can be continued from their last row
+KEYSET_ORDER_FIELDS = {
+    'name', 'claim_hash', 'height', 'creation_height', 'expiration_height',
+    'timestamp', 'creation_timestamp', 'release_time', 'tx_position', 'amount',
+    'effective_amount', 'support_amount',
+    'trending_group', 'trending_mixed', 'trending_local', 'trending_global',
+}
+CONTINUATION_VERSION = 1
+
+# search totals remembered by each reader, least recently used ones are dropped first
+MAX_CACHED_TOTALS = 10000
+# search params whose matching claims are counted in the claim_cardinality table, totals
+# of searches constrained by nothing else can be estimated without counting claims
+ESTIMATED_TOTAL_PARAMS = {'claim_type', 'stream_types', 'any_tags', 'all_tags', 'not_tags'}
+
+
+class TotalsCache:
+    """
+    Totals of searches by their constraints, excluding paging, and whether they were
+    estimated. The writer commits once per block so the totals are dropped whenever
+    sqlite reports that the database changed since the last check.
+    """
+
+    def __init__(self, max_size: int = MAX_CACHED_TOTALS):
+        self.max_size = max_size
+        self._data_version = None
+        self._totals: Dict[str, Tuple[int, bool]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._totals)
+
+    def check_data_version(self, db: apsw.Connection):
+        data_version = db.cursor().execute('pragma data_version').fetchone()['data_version']
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._totals.clear()
+
+    def get(self, key: str, allow_estimate: bool) -> Optional[Tuple[int, bool]]:
+        cached = self._totals.get(key)
+        if cached is None or (cached[1] and not allow_estimate):
+            return None
+        self._totals.move_to_end(key)
+        return cached
+
+    def set(self, key: str, total: int, estimated: bool):
+        self._totals[key] = total, estimated
+        self._totals.move_to_end(key)
+        while len(self._totals) > self.max_size:
+            self._totals.popitem(last=False)
+
 
 @dataclass
 class ReaderState:
@@ -75,9 +156,13 @@ class ReaderState:
     blocked_channels: Dict
     filtered_streams: Dict
     filtered_channels: Dict
+    totals: TotalsCache = field(default_factory=TotalsCache)
+    opened_lookups: List[SharedHashMap] = field(default_factory=list)
 
     def close(self):
         self.db.close()
+        for lookup in self.opened_lookups:
+            lookup.close()
 
     def reset_metrics(self):
         self.stack = []
@@ -93,10 +178,17 @@ class ReaderState:
 
         self.db.setprogresshandler(interruptor, 100)
 
+    def refresh_blocked_and_filtered(self, *lookups):
+        for lookup in lookups:
+            if isinstance(lookup, SharedHashMap):
+                lookup.refresh()
+
     def get_resolve_censor(self) -> Censor:
+        self.refresh_blocked_and_filtered(self.blocked_streams, self.blocked_channels)
         return Censor(self.blocked_streams, self.blocked_channels)
 
     def get_search_censor(self, limit_claims_per_channel: int) -> Censor:
+        self.refresh_blocked_and_filtered(self.filtered_streams, self.filtered_channels)
         return Censor(self.filtered_streams, self.filtered_channels, limit_claims_per_channel)
 
 
@@ -110,11 +202,57 @@ def row_factory(cursor, row):
     }
 
 
+class Row(tuple):
+    """
+    Query result row which can be indexed by column name like the dicts made by
+    `row_factory`, without building a dict per row. Subclasses are created once
+    per distinct list of selected columns by `row_class`.
+    """
+
+    __slots__ = ()
+
+    columns: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            return tuple.__getitem__(self, self.columns[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self.columns.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self.columns.keys()
+
+
+_row_classes: Dict[Tuple[str, ...], Type[Row]] = {}
+
+
+def row_class(description) -> Type[Row]:
+    names = tuple(column[0] for column in description)
+    cls = _row_classes.get(names)
+    if cls is None:
+        cls = _row_classes[names] = type('Row', (Row,), {
+            '__slots__': (), 'columns': {name: i for i, name in enumerate(names)}
+        })
+    return cls
+
+
 def initializer(log, _path, _ledger_name, query_timeout, _measure=False, block_and_filter=None):
     db = apsw.Connection(_path, flags=apsw.SQLITE_OPEN_READONLY | apsw.SQLITE_OPEN_URI)
     db.setrowtrace(row_factory)
+    opened_lookups = []
     if block_and_filter:
-        blocked_streams, blocked_channels, filtered_streams, filtered_channels = block_and_filter
+        # reader threads of the writer get read only views of its shared maps, read only maps (unpickled
+        # in a reader process or shared by the reader threads of a front-end) are used as they are
+        lookups = []
+        for lookup in block_and_filter:
+            if isinstance(lookup, SharedHashMap) and lookup.writable:
+                lookup = lookup.open_reader()
+                opened_lookups.append(lookup)
+            lookups.append(lookup)
+        blocked_streams, blocked_channels, filtered_streams, filtered_channels = lookups
     else:
         blocked_streams = blocked_channels = filtered_streams = filtered_channels = {}
     ctx.set(
@@ -124,6 +262,7 @@ def initializer(log, _path, _ledger_name, query_timeout, _measure=False, block_a
             query_timeout=query_timeout, log=log,
             blocked_streams=blocked_streams, blocked_channels=blocked_channels,
             filtered_streams=filtered_streams, filtered_channels=filtered_channels,
+            opened_lookups=opened_lookups,
         )
     )
 
@@ -171,25 +310,46 @@ def search_to_bytes(constraints) -> Union[bytes, Tuple[bytes, Dict]]:
     return encode_result(search(constraints))
 
 
+def timed_search_to_bytes(constraints) -> Tuple[Union[bytes, Tuple[bytes, Dict]], float]:
+    """search_to_bytes and the seconds it ran for, without the time spent waiting for a
+    reader, which search admission uses to tell expensive searches from cheap ones."""
+    start = time.perf_counter()
+    result = search_to_bytes(constraints)
+    return result, time.perf_counter() - start
+
+
 @reports_metrics
 def resolve_to_bytes(urls) -> Union[bytes, Tuple[bytes, Dict]]:
     return encode_result(resolve(urls))
 
 
+@reports_metrics
+def resolve_to_bytes_and_dependencies(urls) -> Union[Tuple[bytes, Set[bytes], Set[str]], Tuple[Tuple, Dict]]:
+    txo_rows, extra_txo_rows = resolve(urls)
+    return (encode_result((txo_rows, extra_txo_rows)), *resolve_dependencies(urls, txo_rows, extra_txo_rows))
+
+
 def encode_result(result):
     return Outputs.to_bytes(*result)
 
 
 @measure
-def execute_query(sql, values, row_offset: int, row_limit: int, censor: Censor) -> List:
+def execute_query(sql, values, row_offset: int, row_limit: Optional[int], censor: Optional[Censor]) -> List:
     context = ctx.get()
     context.set_query_timeout()
     try:
         c = context.db.cursor()
+        make_row = tags_index = None
         def row_filter(cursor, row):
-            nonlocal row_offset
-            row = row_factory(cursor, row)
-            if len(row) > 1 and censor.censor(row):
+            nonlocal row_offset, make_row, tags_index
+            if make_row is None:
+                make_row = row_class(cursor.getdescription())
+                tags_index = make_row.columns.get('tags')
+            if tags_index is not None:
+                row = list(row)
+                row[tags_index] = set(row[tags_index].split(','))
+            row = make_row(row)
+            if censor is not None and len(row) > 1 and censor.censor(row):
                 return
             if row_offset:
                 row_offset -= 1
@@ -200,7 +360,7 @@ def execute_query(sql, values, row_offset: int, row_limit: int, censor: Censor)
         for row in c.execute(sql, values):
             i += 1
             rows.append(row)
-            if i >= row_limit:
+            if row_limit is not None and i >= row_limit:
                 break
         return rows
     except apsw.Error as err:
@@ -357,7 +517,7 @@ def select_claims(censor: Censor, cols: str, for_count=False, **constraints) ->
     if 'channel' in constraints:
         channel_url = constraints.pop('channel')
         match = resolve_url(channel_url)
-        if isinstance(match, dict):
+        if isinstance(match, Row):
             constraints['channel_hash'] = match['claim_hash']
         else:
             return [{'row_count': 0}] if cols == 'count(*) as row_count' else []
@@ -367,6 +527,14 @@ def select_claims(censor: Censor, cols: str, for_count=False, **constraints) ->
     return execute_query(sql, values, row_offset, row_limit, censor)
 
 
+def indexed_claim_ids(claim_ids: List[str]) -> Set[str]:
+    """The ids of claim_ids found in the claim table."""
+    if not claim_ids:
+        return set()
+    rows = select_claims(None, 'claim.claim_id', claim_ids=claim_ids, limit=len(claim_ids))
+    return {row['claim_id'] for row in rows}
+
+
 @measure
 def count_claims(**constraints) -> int:
     constraints.pop('offset', None)
@@ -376,23 +544,77 @@ def count_claims(**constraints) -> int:
     return count[0]['row_count']
 
 
+@measure
+def estimate_claims(**constraints) -> Optional[int]:
+    """
+    Estimate of `count_claims` from the claims counted per claim type, stream type and
+    tag in the claim_cardinality table, assuming those are independent of each other.
+    None when a constraint is not covered by the table or it was not filled yet.
+    """
+    if not set(constraints).issubset(ESTIMATED_TOTAL_PARAMS):
+        return None
+    claim_types = constraints.get('claim_type') or []
+    if isinstance(claim_types, str):
+        claim_types = [claim_types]
+    claim_types = {CLAIM_TYPES[claim_type] for claim_type in claim_types}
+    stream_types = {STREAM_TYPES[stream_type] for stream_type in constraints.get('stream_types') or []}
+    any_tags, all_tags, not_tags = (
+        set(clean_tags(constraints.get(key) or [])[:ATTRIBUTE_ARRAY_MAX_LENGTH])
+        for key in ('any_tags', 'all_tags', 'not_tags')
+    )
+    any_tags -= not_tags
+    all_tags -= not_tags
+    keys = [('claim', '')]
+    keys.extend(('claim_type', claim_type) for claim_type in claim_types)
+    keys.extend(('stream_type', stream_type) for stream_type in stream_types)
+    keys.extend(('tag', tag) for tag in any_tags | all_tags | not_tags)
+    rows = ctx.get().db.cursor().execute(
+        f"SELECT facet, value, count FROM claim_cardinality "
+        f"WHERE (facet, value) IN (VALUES {', '.join('(?, ?)' for _ in keys)})", list(chain.from_iterable(keys))
+    )
+    counts = {(row['facet'], row['value']): row['count'] for row in rows}
+    claims = counts.get(('claim', ''))
+    if not claims:
+        return claims
+
+    def share(facet, values):
+        return min(1.0, sum(counts.get((facet, value), 0) for value in values) / claims)
+
+    estimate = float(claims)
+    if claim_types:
+        estimate *= share('claim_type', claim_types)
+    if stream_types:
+        estimate *= share('stream_type', stream_types)
+    if any_tags:
+        estimate *= share('tag', any_tags)
+    for tag in all_tags:
+        estimate *= share('tag', [tag])
+    if not_tags:
+        estimate *= 1.0 - share('tag', not_tags)
+    return int(round(estimate))
+
+
+def get_total(constraints: dict, allow_estimate: bool) -> Tuple[int, bool]:
+    """Total of a search and whether it was estimated, shared by its pages until the next block."""
+    constraints = {key: value for key, value in constraints.items() if key not in ('offset', 'limit', 'order_by')}
+    context = ctx.get()
+    context.totals.check_data_version(context.db)
+    key = canonical_cache_key(constraints)
+    cached = context.totals.get(key, allow_estimate)
+    if cached is not None:
+        return cached
+    total = estimate_claims(**constraints) if allow_estimate else None
+    estimated = total is not None
+    if not estimated:
+        total = count_claims(**constraints)
+    context.totals.set(key, total, estimated)
+    return total, estimated
+
+
 def search_claims(censor: Censor, **constraints) -> List:
     return select_claims(
         censor,
-        """
-        claimtrie.claim_hash as is_controlling,
-        claimtrie.last_take_over_height,
-        claim.claim_hash, claim.txo_hash,
-        claim.claims_in_channel, claim.reposted,
-        claim.height, claim.creation_height,
-        claim.activation_height, claim.expiration_height,
-        claim.effective_amount, claim.support_amount,
-        claim.trending_group, claim.trending_mixed,
-        claim.trending_local, claim.trending_global,
-        claim.short_url, claim.canonical_url,
-        claim.channel_hash, claim.reposted_claim_hash,
-        claim.signature_valid
-        """, **constraints
+        SEARCH_CLAIM_COLUMNS, **constraints
     )
 
 
@@ -416,33 +638,170 @@ def _get_referenced_rows(txo_rows: List[dict], censor_channels: List[bytes]):
     # channels must come first for client side inflation to work properly
     return channel_txos + reposted_txos
 
+def keyset_order(constraints) -> Optional[List[Tuple[str, bool]]]:
+    """
+    Order fields and directions (True when ascending) a search is sorted by, ending with
+    the claim hash which breaks ties, or None when the search can't be continued from
+    its last row (no ordering, full text search or a field which can be NULL).
+    """
+    order_by = constraints.get('order_by')
+    if not order_by or 'text' in constraints:
+        return None
+    keyset = []
+    for field in [order_by] if isinstance(order_by, str) else order_by:
+        is_asc = field.startswith('^')
+        field = field[1:] if is_asc else field
+        if field not in KEYSET_ORDER_FIELDS:
+            return None
+        keyset.append((field, is_asc))
+        if field == 'claim_hash':
+            return keyset
+    keyset.append(('claim_hash', keyset[-1][1]))
+    return keyset
+
+
+def _keyset_order_by(keyset: List[Tuple[str, bool]]) -> List[str]:
+    return [f"^{field}" if is_asc else field for field, is_asc in keyset]
+
+
+def _keyset_column(field: str) -> str:
+    return 'claim.normalized' if field == 'name' else f'claim.{field}'
+
+
+def encode_continuation(keyset: List[Tuple[str, bool]], row) -> bytes:
+    return bytes((CONTINUATION_VERSION,)) + json.dumps([
+        _keyset_order_by(keyset),
+        [row[f'keyset_{i}'].hex() if field == 'claim_hash' else row[f'keyset_{i}']
+         for i, (field, _) in enumerate(keyset)]
+    ], separators=(',', ':')).encode()
+
+
+def decode_continuation(continuation: str, keyset: List[Tuple[str, bool]]) -> List:
+    """Sort key of the last row of the previous page, `continuation` is the hex of the token it returned."""
+    try:
+        token = unhexlify(continuation)
+        order_by, values = json.loads(token[1:].decode())
+        assert token[0] == CONTINUATION_VERSION and len(values) == len(keyset)
+    except Exception:
+        raise InvalidContinuationError('invalid continuation')
+    if order_by != _keyset_order_by(keyset):
+        raise InvalidContinuationError('continuation was returned by a search with a different order_by')
+    return [unhexlify(value) if field == 'claim_hash' else value for (field, _), value in zip(keyset, values)]
+
+
+def keyset_constraints(keyset: List[Tuple[str, bool]], values: List) -> Dict:
+    """
+    Constraints selecting the rows sorted after `values`. The first field is also
+    bounded on its own, which lets sqlite seek into the (..., claim_hash) index
+    instead of walking it from the start like an offset does.
+    """
+    first, first_is_asc = keyset[0]
+    after = {}
+    for i, (field, is_asc) in enumerate(keyset):
+        conditions = {f'{_keyset_column(keyset[j][0])}#keyset_{j}': values[j] for j in range(i)}
+        conditions[f"{_keyset_column(field)}__{'gt' if is_asc else 'lt'}#keyset_{i}"] = values[i]
+        after[f'keyset_{i}__and'] = conditions
+    return {
+        f"{_keyset_column(first)}__{'gte' if first_is_asc else 'lte'}#keyset": values[0],
+        'keyset__or': after,
+    }
+
+
 @measure
-def search(constraints) -> Tuple[List, List, int, int, Censor]:
+def search(constraints) -> Tuple[List, List, int, int, Censor, Optional[bytes], bool]:
     assert set(constraints).issubset(SEARCH_PARAMS), \
         f"Search query contains invalid arguments: {set(constraints).difference(SEARCH_PARAMS)}"
-    total = None
+    total, total_estimated = None, False
     limit_claims_per_channel = constraints.pop('limit_claims_per_channel', None)
+    continuation = constraints.pop('continuation', None)
+    estimate_totals = constraints.pop('estimate_totals', False)
     if not constraints.pop('no_totals', False):
-        total = count_claims(**constraints)
+        total, total_estimated = get_total(constraints, estimate_totals)
     constraints['offset'] = abs(constraints.get('offset', 0))
     constraints['limit'] = min(abs(constraints.get('limit', 10)), 50)
+    cols = SEARCH_CLAIM_COLUMNS
+    # an empty continuation asks for the first page of a search paged by continuations
+    keyset = keyset_order(constraints) if continuation is not None else None
+    if keyset is not None:
+        constraints['order_by'] = _keyset_order_by(keyset)
+        cols += ''.join(f', {_keyset_column(field)} as keyset_{i}' for i, (field, _) in enumerate(keyset))
+        if continuation:
+            constraints.update(keyset_constraints(keyset, decode_continuation(continuation, keyset)))
+            constraints['offset'] = 0
+    elif continuation is not None:
+        raise InvalidContinuationError(
+            'continuation requires ordering by columns which are never null and no text search'
+        )
     context = ctx.get()
     search_censor = context.get_search_censor(limit_claims_per_channel)
-    txo_rows = search_claims(search_censor, **constraints)
+    txo_rows = select_claims(search_censor, cols, **constraints)
     extra_txo_rows = _get_referenced_rows(txo_rows, search_censor.censored.keys())
-    return txo_rows, extra_txo_rows, constraints['offset'], total, search_censor
+    next_continuation = None
+    if keyset is not None and txo_rows and len(txo_rows) == constraints['limit']:
+        next_continuation = encode_continuation(keyset, txo_rows[-1])
+    return (
+        txo_rows, extra_txo_rows, constraints['offset'], total, search_censor, next_continuation, total_estimated
+    )
+
+
+def explain_search(constraints) -> List[str]:
+    """Steps of the query plans of a search, the channel url is not resolved."""
+    constraints = dict(constraints)
+    constraints.pop('limit_claims_per_channel', None)
+    constraints.pop('continuation', None)
+    constraints.pop('estimate_totals', None)
+    constraints.pop('offset', None)
+    constraints.pop('limit', None)
+    no_totals = constraints.pop('no_totals', False)
+    if 'channel' in constraints:
+        constraints.pop('channel')
+        constraints['channel_hash'] = bytes(20)
+    queries = [claims_query(SEARCH_CLAIM_COLUMNS, **constraints)]
+    if not no_totals:
+        constraints.pop('order_by', None)
+        queries.append(claims_query('count(*) as row_count', for_count=True, **constraints))
+    cursor = ctx.get().db.cursor()
+    return [
+        step['detail'] for sql, values in queries
+        for step in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", values)
+    ]
 
 
 @measure
 def resolve(urls) -> Tuple[List, List]:
-    txo_rows = [resolve_url(raw_url) for raw_url in urls]
+    txo_rows = resolve_urls(urls)
     extra_txo_rows = _get_referenced_rows(
-        [txo for txo in txo_rows if isinstance(txo, dict)],
+        [txo for txo in txo_rows if isinstance(txo, Row)],
         [txo.censor_hash for txo in txo_rows if isinstance(txo, ResolveCensoredError)]
     )
     return txo_rows, extra_txo_rows
 
 
+def resolve_dependencies(urls, txo_rows, extra_txo_rows) -> Tuple[Set[bytes], Set[str]]:
+    """
+    Claim hashes and normalized names which a block has to change in order to change
+    the result of resolving `urls`: every claim referenced by the result and the names
+    looked up by the urls (a new or activated claim can take over a name).
+    """
+    names = set()
+    for raw_url in urls:
+        try:
+            url = URL.parse(raw_url)
+        except ValueError:
+            continue
+        if url.has_channel:
+            names.add(normalize_name(url.channel.name))
+        if url.has_stream:
+            names.add(normalize_name(url.stream.name))
+    claim_hashes = set()
+    for txo in chain(txo_rows, extra_txo_rows):
+        if isinstance(txo, ResolveCensoredError):
+            claim_hashes.add(txo.censor_hash)
+        elif isinstance(txo, Row):
+            claim_hashes.update(filter(None, (txo['claim_hash'], txo['channel_hash'], txo['reposted_claim_hash'])))
+    return claim_hashes, names
+
+
 @measure
 def resolve_url(raw_url):
     censor = ctx.get().get_resolve_censor()
@@ -491,6 +850,148 @@ def resolve_url(raw_url):
     return channel
 
 
+@measure
+def resolve_urls(raw_urls) -> List:
+    """
+    Resolve many urls with a few set based queries, giving the same results as calling
+    `resolve_url` for each of them. Channels are resolved first, then streams, and url
+    segments of the same shape are looked up together by `_resolve_segments`.
+    """
+    results = [None] * len(raw_urls)
+    urls = {}
+    for i, raw_url in enumerate(raw_urls):
+        try:
+            urls[i] = URL.parse(raw_url)
+        except ValueError as e:
+            results[i] = e
+    censors = {i: ctx.get().get_resolve_censor() for i in urls}
+    fallback = set()
+
+    channels = _resolve_segments(
+        {i: (url.channel, None) for i, url in urls.items() if url.has_channel}, censors
+    )
+    for i, channel in channels.items():
+        if channel is _UNRESOLVED:
+            fallback.add(i)
+        elif channel is None:
+            results[i] = _resolve_failure(censors[i], raw_urls[i], 'channel in')
+        elif not urls[i].has_stream:
+            results[i] = channel
+
+    streams = _resolve_segments({
+        i: (url.stream, channels[i]['claim_hash'] if url.has_channel else None)
+        for i, url in urls.items() if url.has_stream and (not url.has_channel or isinstance(channels[i], Row))
+    }, censors)
+    for i, stream in streams.items():
+        if stream is _UNRESOLVED:
+            fallback.add(i)
+        elif stream is None:
+            results[i] = _resolve_failure(censors[i], raw_urls[i], 'claim at')
+        else:
+            results[i] = stream
+
+    for i in fallback:
+        results[i] = resolve_url(raw_urls[i])
+    return results
+
+
+def _resolve_failure(censor: Censor, raw_url: str, what: str):
+    if censor.censored:
+        return ResolveCensoredError(raw_url, next(iter(censor.censored)))
+    return LookupError(f'Could not find {what} "{raw_url}".')
+
+
+_UNRESOLVED = object()
+
+
+def _resolve_segments(segments: Dict[int, Tuple[PathSegment, Optional[bytes]]], censors: Dict[int, Censor]) -> Dict:
+    """
+    Find the claim for each url segment, optionally within a channel. The result for a
+    segment is its row, None when there is no uncensored match or `_UNRESOLVED` when
+    every candidate fetched was censored and more candidates may exist.
+    """
+    shapes = {}
+    for i, (segment, channel_hash) in segments.items():
+        if segment.amount_order is not None:
+            shape = 'amount_order'
+        elif segment.claim_id is not None:
+            shape = 'claim_id'
+        else:
+            shape = 'name'
+        shapes.setdefault((shape, channel_hash is not None), []).append(i)
+
+    results = dict.fromkeys(segments)
+    for (shape, in_channel), indexes in shapes.items():
+        for start in range(0, len(indexes), RESOLVE_BATCH_SIZE):
+            batch = {i: segments[i] for i in indexes[start:start+RESOLVE_BATCH_SIZE]}
+            sql, values = _resolve_segments_query(shape, in_channel, batch)
+            candidates = {}
+            for row in execute_query(sql, values, 0, None, None):
+                candidates.setdefault(row['segment_index'], []).append(row)
+            for i, rows in candidates.items():
+                censor = censors[i]
+                for row in rows:
+                    if not censor.censor(row):
+                        results[i] = row
+                        break
+                else:
+                    if len(rows) >= RESOLVE_BATCH_CANDIDATES:
+                        results[i] = _UNRESOLVED
+    return results
+
+
+def _resolve_segments_query(shape: str, in_channel: bool, segments: Dict) -> Tuple[str, Dict]:
+    """ Mirrors the queries made by `resolve_url` for each shape of url segment. """
+    rows, values = [], {}
+    for i, (segment, channel_hash) in segments.items():
+        rows.append(f"(:i{i}, :name{i}, :claim_id{i}, :rank{i}, :channel{i})")
+        values.update({
+            f'i{i}': i, f'name{i}': normalize_name(segment.name), f'claim_id{i}': segment.claim_id,
+            f'rank{i}': int(segment.amount_order) if shape == 'amount_order' else None,
+            f'channel{i}': channel_hash
+        })
+    where = []
+    if shape == 'claim_id':
+        where.append(
+            "(CASE WHEN length(segment.claim_id) = 40 THEN claim.claim_id = segment.claim_id "
+            "ELSE claim.claim_id LIKE segment.claim_id || '%' END)"
+        )
+    if in_channel:
+        where.append(
+            "claim.channel_hash = segment.channel_hash AND "
+            "(claim.signature_valid IS NULL OR claim.signature_valid = 1)"
+        )
+    if shape == 'amount_order':
+        order_by = "claim.effective_amount DESC"
+    elif shape == 'claim_id':
+        order_by = "claim.channel_join ASC" if in_channel else "claim.creation_height ASC"
+    elif in_channel:
+        order_by = "claim.effective_amount DESC, claim.height ASC"
+    else:
+        order_by = "claim.claim_hash"
+        where.append("claimtrie.claim_hash IS NOT NULL")
+    if shape == 'amount_order':
+        rank_filter = "segment_rank = segment_amount_order"
+    else:
+        rank_filter = f"segment_rank <= {RESOLVE_BATCH_CANDIDATES}"
+    sql = f"""
+    WITH segment(segment_index, normalized, claim_id, amount_order, channel_hash) AS (
+        VALUES {', '.join(rows)}
+    )
+    SELECT * FROM (
+        SELECT {SEARCH_CLAIM_COLUMNS},
+            segment.segment_index AS segment_index, segment.amount_order AS segment_amount_order,
+            ROW_NUMBER() OVER (PARTITION BY segment.segment_index ORDER BY {order_by}) AS segment_rank
+        FROM segment
+        JOIN claim ON (claim.normalized = segment.normalized)
+        LEFT JOIN claimtrie USING (claim_hash)
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+    ) WHERE {rank_filter}
+    ORDER BY segment_index, segment_rank
+    """
+    return sql, values
+
+
 CLAIM_HASH_OR_REPOST_HASH_SQL = f"""
 CASE WHEN claim.claim_type = {CLAIM_TYPES['repost']}
     THEN claim.reposted_claim_hash
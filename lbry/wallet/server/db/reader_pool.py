@@ -0,0 +1,142 @@
+import base64
+import queue
+import typing
+import asyncio
+import threading
+from itertools import count
+
+from . import reader
+
+# lower runs first, queries not listed here run after the listed ones
+QUERY_PRIORITIES = {
+    'resolve': 0,
+    'search': 1,
+}
+DEFAULT_PRIORITY = 2
+
+
+def to_base64(result):
+    """
+    Base64 encode the serialized protobuf of a reader result, metrics and resolve
+    dependencies returned along with it are left as they are. Encoded results are
+    returned unchanged.
+    """
+    if isinstance(result, bytes):
+        return base64.b64encode(result).decode()
+    if isinstance(result, tuple) and result:
+        return (to_base64(result[0]),) + result[1:]
+    return result
+
+
+class _Job:
+    __slots__ = 'func', 'args', 'loop', 'future', 'abandoned'
+
+    def __init__(self, func, args, loop: asyncio.AbstractEventLoop):
+        self.func = func
+        self.args = args
+        self.loop = loop
+        self.future = loop.create_future()
+        self.abandoned = False
+
+    def set_result(self, result):
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def set_exception(self, exception):
+        if not self.future.done():
+            self.future.set_exception(exception)
+
+
+class _Worker(threading.Thread):
+
+    def __init__(self, pool: 'ReaderThreadPool', name: str):
+        super().__init__(name=name, daemon=True)
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.job: typing.Optional[_Job] = None
+        self.db = None
+
+    def run(self):
+        try:
+            self.pool.initializer(*self.pool.initargs)
+            self.db = reader.ctx.get().db
+        finally:
+            self.pool.started.release()
+        try:
+            while True:
+                _, _, job = self.pool.jobs.get()
+                if job is None:
+                    break
+                if job.abandoned:
+                    continue
+                with self.lock:
+                    self.job = job
+                try:
+                    result = to_base64(job.func(*job.args))
+                except BaseException as err:
+                    job.loop.call_soon_threadsafe(job.set_exception, err)
+                else:
+                    job.loop.call_soon_threadsafe(job.set_result, result)
+                finally:
+                    with self.lock:
+                        self.job = None
+        finally:
+            reader.cleanup()
+
+    def interrupt(self, job: _Job) -> bool:
+        """Interrupt the sqlite statement of `job` if this worker is still running it."""
+        with self.lock:
+            if self.job is job:
+                # a no-op if the query finished and the worker is waiting for the lock
+                self.db.interrupt()
+                return True
+        return False
+
+
+class ReaderThreadPool:
+    """
+    Runs reader queries on a pool of threads, each with its own apsw connection.
+
+    apsw releases the GIL while sqlite runs a statement, so queries run in parallel
+    and results come back as plain objects instead of being pickled between processes.
+    The base64 encoding of the result is done in the worker thread as well.
+
+    Queries are taken from a priority queue (see `QUERY_PRIORITIES`). When the
+    awaiting task is cancelled, for instance because the client disconnected, a
+    queued query is dropped and a running one is stopped with `Connection.interrupt`.
+    """
+
+    def __init__(self, max_workers: int, initializer: typing.Callable, initargs: typing.Tuple = (),
+                 interrupted=None):
+        self.initializer = initializer
+        self.initargs = initargs
+        self.jobs = queue.PriorityQueue()
+        self.started = threading.Semaphore(0)
+        self._counter = count()
+        self._workers = [_Worker(self, f'reader-{i}') for i in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+        for _ in self._workers:
+            self.started.acquire()
+        self._interrupted_metric = interrupted
+
+    async def run(self, func, *args, priority: int = DEFAULT_PRIORITY):
+        job = _Job(func, args, asyncio.get_running_loop())
+        self.jobs.put((priority, next(self._counter), job))
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            job.abandoned = True
+            for worker in self._workers:
+                if worker.interrupt(job):
+                    if self._interrupted_metric is not None:
+                        self._interrupted_metric.inc()
+                    break
+            raise
+
+    def shutdown(self, wait: bool = True):
+        for _ in self._workers:
+            self.jobs.put((float('inf'), next(self._counter), None))
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,224 @@
+import os
+import mmap
+import time
+import struct
+import typing
+
+MAGIC = b'LBHM'
+HEADER = struct.Struct('<4sBBxxQIIIB3x')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 8
+COUNT = struct.Struct('<I')
+COUNT_OFFSET = 20
+REPLACED_OFFSET = 28
+
+EMPTY, USED, DELETED = 0, 1, 2
+MIN_CAPACITY = 1024
+# rebuild the table once deleted slots take up this fraction of it
+MAX_DELETED_FRACTION = 1 / 8
+
+
+class SharedHashMap:
+    """
+    Fixed width bytes to bytes hash map kept in a memory mapped file, written by the
+    block processor and read in place by every reader process.
+
+    The table uses open addressing with linear probing, its header holds a sequence
+    number which is odd while the writer is changing slots. Readers retry a lookup
+    when the sequence changed under them (a seqlock), so they never see a half written
+    entry and never copy the map. Changes are applied slot by slot, the cost of an
+    update is proportional to the number of changed keys.
+
+    When the table fills up, or too many of its slots are deleted (deleted slots keep
+    probe chains long), the writer builds a new table in a new file, moves it over the
+    old path and flags the old file as replaced, readers reopen the path the next time
+    `refresh` is called (once per query). A read only view can be shared by threads,
+    the mapping it replaces stays valid until nothing uses it any more.
+
+    Pickling a map gives a read only view of the same file in the unpickling process.
+    """
+
+    def __init__(self, path: str, key_size: int = 20, value_size: int = 20, writable: bool = False):
+        self.path = path
+        self.key_size = key_size
+        self.value_size = value_size
+        self.slot_size = 1 + key_size + value_size
+        self.writable = writable
+        # the mapping and its capacity are swapped together so readers never pair a table with a
+        # capacity from another one
+        self._table: typing.Optional[typing.Tuple[mmap.mmap, int]] = None
+        self._used = 0
+        self._local: typing.Dict[bytes, bytes] = {}
+        if writable:
+            self._create(MIN_CAPACITY)
+        else:
+            self._open()
+
+    def __reduce__(self):
+        return self.__class__, (self.path, self.key_size, self.value_size)
+
+    def open_reader(self) -> 'SharedHashMap':
+        return self.__class__(self.path, self.key_size, self.value_size)
+
+    def _create(self, capacity: int, items: typing.Optional[typing.Dict[bytes, bytes]] = None):
+        """Write a new table holding `items` and move it over `path`."""
+        items = items or {}
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.truncate(HEADER.size + capacity * self.slot_size)
+        with open(tmp_path, 'r+b') as f:
+            new = mmap.mmap(f.fileno(), 0)
+        mask = capacity - 1
+        for key, value in items.items():
+            offset = self._find_free_slot(new, key, mask)
+            new[offset:offset+self.slot_size] = bytes((USED,)) + key + value
+        new[:HEADER.size] = HEADER.pack(
+            MAGIC, self.key_size, self.value_size, 0, capacity, len(items), len(items), 0
+        )
+        new.flush()
+        os.replace(tmp_path, self.path)
+        old = self._table
+        self._table, self._used = (new, capacity), len(items)
+        if old is not None:
+            old[0][REPLACED_OFFSET] = 1
+            old[0].close()
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key_size, value_size, _, capacity, _, _, _ = HEADER.unpack_from(table)
+        if magic != MAGIC or (key_size, value_size) != (self.key_size, self.value_size):
+            table.close()
+            raise ValueError(f'{self.path} is not a shared hash map of {self.key_size} to {self.value_size} bytes')
+        self._table = table, capacity
+
+    def refresh(self):
+        """Reopen the file if the writer replaced it with a new table."""
+        if not self.writable and self._table[0][REPLACED_OFFSET]:
+            # the old mapping is not closed, another thread may still be reading it, it is
+            # unmapped once the last reference to it is gone
+            self._open()
+
+    def close(self):
+        if self._table is not None:
+            self._table[0].close()
+            self._table = None
+
+    def _find_free_slot(self, table, key: bytes, mask: int) -> int:
+        i = int.from_bytes(key[:8], 'little') & mask
+        while True:
+            offset = HEADER.size + i * self.slot_size
+            if table[offset] != USED:
+                return offset
+            i = (i + 1) & mask
+
+    def _find(self, table, key: bytes, capacity: int) -> typing.Optional[int]:
+        mask = capacity - 1
+        i = int.from_bytes(key[:8], 'little') & mask
+        key_end = 1 + self.key_size
+        for _ in range(capacity):
+            offset = HEADER.size + i * self.slot_size
+            state = table[offset]
+            if state == EMPTY:
+                return None
+            if state == USED and table[offset+1:offset+key_end] == key:
+                return offset
+            i = (i + 1) & mask
+        return None
+
+    def get(self, key: bytes, default=None):
+        if not key or len(key) != self.key_size:
+            return default
+        table, capacity = self._table
+        while True:
+            sequence, = SEQUENCE.unpack_from(table, SEQUENCE_OFFSET)
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            value = None
+            if COUNT.unpack_from(table, COUNT_OFFSET)[0]:
+                offset = self._find(table, key, capacity)
+                if offset is not None:
+                    value = table[offset+1+self.key_size:offset+self.slot_size]
+            if SEQUENCE.unpack_from(table, SEQUENCE_OFFSET)[0] == sequence:
+                return default if value is None else value
+
+    def __getitem__(self, key: bytes) -> bytes:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return COUNT.unpack_from(self._table[0], COUNT_OFFSET)[0]
+
+    def items(self) -> typing.List[typing.Tuple[bytes, bytes]]:
+        table, capacity = self._table
+        while True:
+            sequence, = SEQUENCE.unpack_from(table, SEQUENCE_OFFSET)
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            items = []
+            for i in range(capacity):
+                offset = HEADER.size + i * self.slot_size
+                if table[offset] == USED:
+                    items.append((
+                        table[offset+1:offset+1+self.key_size], table[offset+1+self.key_size:offset+self.slot_size]
+                    ))
+            if SEQUENCE.unpack_from(table, SEQUENCE_OFFSET)[0] == sequence:
+                return items
+
+    def keys(self) -> typing.List[bytes]:
+        return [key for key, _ in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def replace(self, items: typing.Dict[bytes, bytes]) -> bool:
+        """Make the map hold exactly `items`, only writing the entries which changed. Returns True on change."""
+        assert self.writable, 'shared hash map was opened read only'
+        deleted = [key for key in self._local if key not in items]
+        changed = {key: value for key, value in items.items() if self._local.get(key) != value}
+        if not deleted and not changed:
+            return False
+        table, capacity = self._table
+        used = self._used + sum(1 for key in changed if key not in self._local)
+        # new keys may reuse deleted slots, so `used` is an upper bound
+        if used * 2 > capacity or used - len(items) > capacity * MAX_DELETED_FRACTION:
+            self._local = dict(items)
+            capacity = MIN_CAPACITY
+            while len(items) * 4 > capacity:
+                capacity *= 2
+            self._create(capacity, self._local)
+            return True
+        sequence, = SEQUENCE.unpack_from(table, SEQUENCE_OFFSET)
+        SEQUENCE.pack_into(table, SEQUENCE_OFFSET, sequence + 1)
+        try:
+            for key in deleted:
+                offset = self._find(table, key, capacity)
+                table[offset] = DELETED
+                del self._local[key]
+            for key, value in changed.items():
+                offset = self._find(table, key, capacity) if key in self._local else None
+                if offset is None:
+                    offset = self._find_free_slot(table, key, capacity - 1)
+                    if table[offset] == EMPTY:
+                        self._used += 1
+                table[offset+1:offset+self.slot_size] = key + value
+                table[offset] = USED
+                self._local[key] = value
+            COUNT.pack_into(table, COUNT_OFFSET, len(self._local))
+            COUNT.pack_into(table, COUNT_OFFSET + 4, self._used)
+        finally:
+            SEQUENCE.pack_into(table, SEQUENCE_OFFSET, sequence + 2)
+        return True
+
+    def update(self, items: typing.Dict[bytes, bytes]):
+        self.replace({**self._local, **items})
+
+    def clear(self):
+        self.replace({})
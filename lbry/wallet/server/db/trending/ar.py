@@ -177,10 +177,13 @@ def test_trending():
 trending_data = TrendingData()
 
 def run(db, height, final_height, recalculate_claim_hashes):
+    """
+    Update the trending scores, returns the hashes of the claims written to db.
+    """
 
     if height < final_height - 5*HALF_LIFE:
         trending_log("Skipping AR trending at block {h}.\n".format(h=height))
-        return
+        return set()
 
     start = time.time()
 
@@ -238,6 +241,7 @@ def run(db, height, final_height, recalculate_claim_hashes):
 
 
     # Write trending scores to DB
+    written = set()
     if height % SAVE_INTERVAL == 0:
 
         trending_log("    Writing trending scores to db...")
@@ -254,11 +258,13 @@ def run(db, height, final_height, recalculate_claim_hashes):
 
         db.executemany("UPDATE claim SET trending_mixed=? WHERE claim_hash=?;",
                        the_list)
+        written.update(claim_hash for _, claim_hash in the_list)
 
         trending_log("done.\n")
 
     trending_log("Trending operations took {time} seconds.\n\n"\
                             .format(time=time.time() - start))
+    return written
 
 
 if __name__ == "__main__":
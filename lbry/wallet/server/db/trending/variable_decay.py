@@ -241,10 +241,11 @@ class TrendingDB:
 
     def write_to_claims_db(self, db, height):
         """
-        Write changed trending scores to claims.db.
+        Write changed trending scores to claims.db, returns the hashes of
+        the claims written.
         """
         if height % SAVE_INTERVAL != 0:
-            return
+            return set()
 
         rows = self.execute(f"""
                                 SELECT trending_score, claim_hash
@@ -257,14 +258,16 @@ class TrendingDB:
                          WHERE claim_hash = ?;""", rows)
 
         # Clear list of claims needing to be written to claims.db
-        self.write_needed = set()
+        written, self.write_needed = self.write_needed, set()
+        return written
 
 
     def update(self, db, height, recalculate_claim_hashes):
         """
         Update trending scores.
         Input is a cursor to claims.db, the block height, and the list of
-        claims that changed.
+        claims that changed. Returns the hashes of the claims whose trending
+        scores were written to claims.db.
         """
         assert self.initialised
 
@@ -342,7 +345,7 @@ class TrendingDB:
         self.decay_whales(height)
         self.commit()
 
-        self.write_to_claims_db(db, height)
+        return self.write_to_claims_db(db, height)
 
 
 
@@ -374,15 +377,19 @@ def spike_mass(x, x_old):
 
 
 def run(db, height, final_height, recalculate_claim_hashes):
+    """
+    Update the trending scores, returns the hashes of the claims written to db.
+    """
     if height < final_height - 5*HALF_LIFE:
         trending_log(f"Skipping trending calculations at block {height}.\n")
-        return
+        return set()
 
     start = time.time()
     trending_log(f"Calculating variable_decay trending at block {height}.\n")
-    trending_data.update(db, height, recalculate_claim_hashes)
+    written = trending_data.update(db, height, recalculate_claim_hashes)
     end = time.time()
     trending_log(f"Trending operations took {end - start} seconds.\n\n")
+    return written
 
 def test_trending():
     """
@@ -58,12 +58,13 @@ def install(connection):
 
 
 def run(db, height, final_height, affected_claims):
+    """Update the trending values, returns the hashes of the claims they could change for."""
     # don't start tracking until we're at the end of initial sync
     if height < (final_height - (TRENDING_WINDOW * TRENDING_DATA_POINTS)):
-        return
+        return set()
 
     if height % TRENDING_WINDOW != 0:
-        return
+        return set()
 
     db.execute(f"""
     DELETE FROM trend WHERE height < {height - (TRENDING_WINDOW * TRENDING_DATA_POINTS)}
@@ -79,6 +80,13 @@ def run(db, height, final_height, affected_claims):
     FROM claim WHERE support_sum > 0
     """)
 
+    # claims without samples and without trending values keep them at 0
+    changed = {row[0] for row in db.execute("""
+    SELECT claim_hash FROM trend UNION
+    SELECT claim_hash FROM claim
+    WHERE trending_local <> 0 OR trending_global <> 0 OR trending_group <> 0 OR trending_mixed <> 0
+    """)}
+
     zscore = ZScore()
     for global_sum in db.execute("SELECT AVG(amount) AS avg_amount FROM trend GROUP BY height"):
         zscore.step(global_sum.avg_amount)
@@ -121,3 +129,4 @@ def run(db, height, final_height, affected_claims):
         END
     WHERE trending_local <> 0 OR trending_global <> 0
     """)
+    return changed
@@ -1,28 +1,33 @@
 import os
 import apsw
-from typing import Union, Tuple, Set, List
+import shutil
+import tempfile
+from typing import Union, Tuple, Set, List, Dict, Optional
 from itertools import chain
-from decimal import Decimal
 from collections import namedtuple
-from multiprocessing import Manager
 from binascii import unhexlify
 from lbry.wallet.server.leveldb import LevelDB
 from lbry.wallet.server.util import class_logger
 from lbry.wallet.database import query, constraints_to_sql
 
-from lbry.schema.tags import clean_tags
-from lbry.schema.mime_types import guess_stream_type
 from lbry.wallet import Ledger, RegTestLedger
 from lbry.wallet.transaction import Transaction, Output
 from lbry.wallet.server.db.canonical import register_canonical_functions
 from lbry.wallet.server.db.full_text_search import update_full_text_search, CREATE_FULL_TEXT_SEARCH, first_sync_finished
 from lbry.wallet.server.db.trending import TRENDING_ALGORITHMS
+from lbry.wallet.server.db.shared_map import SharedHashMap
+from lbry.wallet.server.db.claim_parser import ClaimParser, ParsedClaim
 
 from .common import CLAIM_TYPES, STREAM_TYPES, COMMON_TAGS, INDEXED_LANGUAGES
 
 
 ATTRIBUTE_ARRAY_MAX_LENGTH = 100
 
+# claims and normalized claim names changed by the blocks advanced since the last call to
+# SQLDB.pop_claim_changes(), bulk is set when changes could not be attributed to specific
+# claims (blocking and filtering lists)
+ClaimChanges = namedtuple('ClaimChanges', ('claim_hashes', 'names', 'bulk'))
+
 
 class SQLDB:
 
@@ -134,6 +139,27 @@ class SQLDB:
         create index if not exists claimtrie_claim_hash_idx on claimtrie (claim_hash);
     """
 
+    CREATE_CLAIM_CARDINALITY_TABLE = """
+        -- number of claims of each claim type, stream type and tag, used to estimate search totals
+        create table if not exists claim_cardinality (
+            facet text not null, -- 'claim' (all claims), 'claim_type', 'stream_type' or 'tag'
+            value not null,
+            count integer not null,
+            height integer not null, -- height at which the claims were counted
+            primary key (facet, value)
+        ) without rowid;
+    """
+
+    COUNT_CLAIM_CARDINALITY = """
+        select 'claim' as facet, '' as value, count(*) as count from claim
+        union all
+        select 'claim_type', claim_type, count(*) from claim where claim_type is not null group by claim_type
+        union all
+        select 'stream_type', stream_type, count(*) from claim where stream_type is not null group by stream_type
+        union all
+        select 'tag', tag, count(*) from tag group by tag
+    """
+
     SEARCH_INDEXES = """
         -- used by any tag clouds
         create index if not exists tag_tag_idx on tag (tag, claim_hash);
@@ -193,18 +219,21 @@ class SQLDB:
         CREATE_SUPPORT_TABLE +
         CREATE_CLAIMTRIE_TABLE +
         CREATE_TAG_TABLE +
-        CREATE_LANGUAGE_TABLE
+        CREATE_LANGUAGE_TABLE +
+        CREATE_CLAIM_CARDINALITY_TABLE
     )
 
     def __init__(
-            self, main, path: str, blocking_channels: list, filtering_channels: list, trending: list):
+            self, main, path: str, blocking_channels: list, filtering_channels: list, trending: list,
+            shared_dir: str = None, claim_parse_workers: int = 0):
         self.main = main
         self._db_path = path
+        self._shared_dir = shared_dir
+        self._temporary_shared_dir = None
         self.db = None
         self.logger = class_logger(__name__, self.__class__.__name__)
         self.ledger = Ledger if main.coin.NET == 'mainnet' else RegTestLedger
         self._fts_synced = False
-        self.state_manager = None
         self.blocked_streams = None
         self.blocked_channels = None
         self.blocking_channel_hashes = {
@@ -216,6 +245,10 @@ class SQLDB:
             unhexlify(channel_id)[::-1] for channel_id in filtering_channels if channel_id
         }
         self.trending = trending
+        self.changed_claim_hashes = set()
+        self.changed_claim_names = set()
+        self.claims_changed_in_bulk = False
+        self.claim_parser = ClaimParser(self.ledger, claim_parse_workers)
 
     def open(self):
         self.db = apsw.Connection(
@@ -234,11 +267,12 @@ class SQLDB:
         self.execute(self.PRAGMAS)
         self.execute(self.CREATE_TABLES_QUERY)
         register_canonical_functions(self.db)
-        self.state_manager = Manager()
-        self.blocked_streams = self.state_manager.dict()
-        self.blocked_channels = self.state_manager.dict()
-        self.filtered_streams = self.state_manager.dict()
-        self.filtered_channels = self.state_manager.dict()
+        if self._shared_dir is None:
+            self._shared_dir = self._temporary_shared_dir = tempfile.mkdtemp()
+        self.blocked_streams, self.blocked_channels, self.filtered_streams, self.filtered_channels = (
+            SharedHashMap(os.path.join(self._shared_dir, f'{name}.map'), writable=True)
+            for name in ('blocked_streams', 'blocked_channels', 'filtered_streams', 'filtered_channels')
+        )
         self.update_blocked_and_filtered_claims()
         for algorithm in self.trending:
             algorithm.install(self.db)
@@ -246,20 +280,26 @@ class SQLDB:
     def close(self):
         if self.db is not None:
             self.db.close()
-        if self.state_manager is not None:
-            self.state_manager.shutdown()
+            self.db = None
+        for shared in (self.blocked_streams, self.blocked_channels, self.filtered_streams, self.filtered_channels):
+            if shared is not None:
+                shared.close()
+        if self._temporary_shared_dir is not None:
+            shutil.rmtree(self._temporary_shared_dir, ignore_errors=True)
+        self.claim_parser.shutdown()
 
     def update_blocked_and_filtered_claims(self):
-        self.update_claims_from_channel_hashes(
-            self.blocked_streams, self.blocked_channels, self.blocking_channel_hashes
-        )
-        self.update_claims_from_channel_hashes(
-            self.filtered_streams, self.filtered_channels, self.filtering_channel_hashes
-        )
-        self.filtered_streams.update(self.blocked_streams)
-        self.filtered_channels.update(self.blocked_channels)
-
-    def update_claims_from_channel_hashes(self, shared_streams, shared_channels, channel_hashes):
+        blocked_streams, blocked_channels = self.get_claims_from_channel_hashes(self.blocking_channel_hashes)
+        filtered_streams, filtered_channels = self.get_claims_from_channel_hashes(self.filtering_channel_hashes)
+        filtered_streams.update(blocked_streams)
+        filtered_channels.update(blocked_channels)
+        # readers see the new lists on their next query, only changed entries are written
+        for shared, claims in ((self.blocked_streams, blocked_streams), (self.blocked_channels, blocked_channels),
+                               (self.filtered_streams, filtered_streams), (self.filtered_channels, filtered_channels)):
+            if shared.replace(claims):
+                self.claims_changed_in_bulk = True
+
+    def get_claims_from_channel_hashes(self, channel_hashes) -> Tuple[dict, dict]:
         streams, channels = {}, {}
         if channel_hashes:
             sql = query(
@@ -274,10 +314,7 @@ class SQLDB:
                     streams[blocked_claim.reposted_claim_hash] = blocked_claim.channel_hash
                 elif blocked_claim.claim_type == CLAIM_TYPES['channel']:
                     channels[blocked_claim.reposted_claim_hash] = blocked_claim.channel_hash
-        shared_streams.clear()
-        shared_streams.update(streams)
-        shared_channels.clear()
-        shared_channels.update(channels)
+        return streams, channels
 
     @staticmethod
     def _insert_sql(table: str, data: dict) -> Tuple[str, list]:
@@ -318,7 +355,7 @@ class SQLDB:
     def commit(self):
         self.execute('commit;')
 
-    def _upsertable_claims(self, txos: List[Output], header, clear_first=False):
+    def _upsertable_claims(self, txos: List[Output], header, parsed: Dict[bytes, ParsedClaim], clear_first=False):
         claim_hashes, claims, tags, languages = set(), [], {}, {}
         for txo in txos:
             tx = txo.tx_ref.tx
@@ -330,13 +367,6 @@ class SQLDB:
                 #self.logger.exception(f"Could not decode claim name for {tx.id}:{txo.position}.")
                 continue
 
-            language = 'none'
-            try:
-                if txo.claim.is_stream and txo.claim.stream.languages:
-                    language = txo.claim.stream.languages[0].language
-            except:
-                pass
-
             claim_hash = txo.claim_hash
             claim_hashes.add(claim_hash)
             claim_record = {
@@ -363,40 +393,16 @@ class SQLDB:
             }
             claims.append(claim_record)
 
-            try:
-                claim = txo.claim
-            except:
+            claim = parsed[txo.ref.hash]
+            if claim is None:
                 #self.logger.exception(f"Could not parse claim protobuf for {tx.id}:{txo.position}.")
                 continue
 
-            if claim.is_stream:
-                claim_record['claim_type'] = CLAIM_TYPES['stream']
-                claim_record['media_type'] = claim.stream.source.media_type
-                claim_record['stream_type'] = STREAM_TYPES[guess_stream_type(claim_record['media_type'])]
-                claim_record['title'] = claim.stream.title
-                claim_record['description'] = claim.stream.description
-                claim_record['author'] = claim.stream.author
-                if claim.stream.video and claim.stream.video.duration:
-                    claim_record['duration'] = claim.stream.video.duration
-                if claim.stream.audio and claim.stream.audio.duration:
-                    claim_record['duration'] = claim.stream.audio.duration
-                if claim.stream.release_time:
-                    claim_record['release_time'] = claim.stream.release_time
-                if claim.stream.has_fee:
-                    fee = claim.stream.fee
-                    if isinstance(fee.currency, str):
-                        claim_record['fee_currency'] = fee.currency.lower()
-                    if isinstance(fee.amount, Decimal):
-                        claim_record['fee_amount'] = int(fee.amount*1000)
-            elif claim.is_repost:
-                claim_record['claim_type'] = CLAIM_TYPES['repost']
-                claim_record['reposted_claim_hash'] = claim.repost.reference.claim_hash
-            elif claim.is_channel:
-                claim_record['claim_type'] = CLAIM_TYPES['channel']
-
-            languages[(language, claim_hash)] = (language, claim_hash, tx.height)
-
-            for tag in clean_tags(claim.message.tags):
+            claim_record.update(claim.metadata)
+
+            languages[(claim.language, claim_hash)] = (claim.language, claim_hash, tx.height)
+
+            for tag in claim.tags:
                 tags[(tag, claim_hash)] = (tag, claim_hash, tx.height)
 
         if clear_first:
@@ -413,8 +419,8 @@ class SQLDB:
 
         return claims
 
-    def insert_claims(self, txos: List[Output], header):
-        claims = self._upsertable_claims(txos, header)
+    def insert_claims(self, txos: List[Output], header, parsed: Dict[bytes, ParsedClaim]):
+        claims = self._upsertable_claims(txos, header, parsed)
         if claims:
             self.executemany("""
                 INSERT OR IGNORE INTO claim (
@@ -435,8 +441,8 @@ class SQLDB:
                     )
                 )""", claims)
 
-    def update_claims(self, txos: List[Output], header):
-        claims = self._upsertable_claims(txos, header, clear_first=True)
+    def update_claims(self, txos: List[Output], header, parsed: Dict[bytes, ParsedClaim]):
+        claims = self._upsertable_claims(txos, header, parsed, clear_first=True)
         if claims:
             self.executemany("""
                 UPDATE claim SET
@@ -508,16 +514,14 @@ class SQLDB:
         if txo_hashes:
             self.execute(*self._delete_sql('support', {'txo_hash__in': txo_hashes}))
 
-    def calculate_reposts(self, txos: List[Output]):
+    def calculate_reposts(self, txos: List[Output], parsed: Dict[bytes, ParsedClaim]):
         targets = set()
         for txo in txos:
-            try:
-                claim = txo.claim
-            except:
-                continue
-            if claim.is_repost:
-                targets.add((claim.repost.reference.claim_hash,))
+            claim = parsed[txo.ref.hash]
+            if claim is not None and claim.metadata.get('reposted_claim_hash') is not None:
+                targets.add((claim.metadata['reposted_claim_hash'],))
         if targets:
+            self.changed_claim_hashes.update(target for target, in targets)
             self.executemany(
                 """
                 UPDATE claim SET reposted = (
@@ -527,7 +531,8 @@ class SQLDB:
                 """, targets
             )
 
-    def validate_channel_signatures(self, height, new_claims, updated_claims, spent_claims, affected_channels, timer):
+    def validate_channel_signatures(self, height, new_claims, updated_claims, spent_claims, affected_channels,
+                                    parsed: Dict[bytes, ParsedClaim], timer):
         if not new_claims and not updated_claims and not spent_claims:
             return
 
@@ -535,23 +540,21 @@ class SQLDB:
         sub_timer.start()
         channels, new_channel_keys, signables = {}, {}, {}
         for txo in chain(new_claims, updated_claims):
-            try:
-                claim = txo.claim
-            except:
+            claim = parsed[txo.ref.hash]
+            if claim is None:
                 continue
             if claim.is_channel:
-                channels[txo.claim_hash] = txo
-                new_channel_keys[txo.claim_hash] = claim.channel.public_key_bytes
+                channels[txo.claim_hash] = claim
+                new_channel_keys[txo.claim_hash] = claim.public_key_bytes
             else:
-                signables[txo.claim_hash] = txo
+                signables[txo.claim_hash] = claim
         sub_timer.stop()
 
         sub_timer = timer.add_timer('make list of channels we need to lookup')
         sub_timer.start()
         missing_channel_keys = set()
-        for txo in signables.values():
-            claim = txo.claim
-            if claim.is_signed and claim.signing_channel_hash not in new_channel_keys:
+        for claim in signables.values():
+            if claim.signature is not None and claim.signing_channel_hash not in new_channel_keys:
                 missing_channel_keys.add(claim.signing_channel_hash)
         sub_timer.stop()
 
@@ -575,8 +578,7 @@ class SQLDB:
 
         claim_updates = []
 
-        for claim_hash, txo in signables.items():
-            claim = txo.claim
+        for claim_hash, claim in signables.items():
             update = {
                 'claim_hash': claim_hash,
                 'channel_hash': None,
@@ -584,11 +586,11 @@ class SQLDB:
                 'signature_digest': None,
                 'signature_valid': None
             }
-            if claim.is_signed:
+            if claim.signature is not None:
                 update.update({
                     'channel_hash': claim.signing_channel_hash,
-                    'signature': txo.get_encoded_signature(),
-                    'signature_digest': txo.get_signature_digest(self.ledger),
+                    'signature': claim.signature,
+                    'signature_digest': claim.signature_digest,
                     'signature_valid': 0
                 })
             claim_updates.append(update)
@@ -615,12 +617,16 @@ class SQLDB:
 
         sub_timer = timer.add_timer('verify signatures')
         sub_timer.start()
-        for update in claim_updates:
-            channel_pub_key = all_channel_keys.get(update['channel_hash'])
-            if channel_pub_key and update['signature']:
-                update['signature_valid'] = Output.is_signature_valid(
-                    bytes(update['signature']), bytes(update['signature_digest']), channel_pub_key
-                )
+        verifiable = [
+            update for update in claim_updates
+            if all_channel_keys.get(update['channel_hash']) and update['signature']
+        ]
+        signatures_valid = self.claim_parser.verify([
+            (bytes(update['signature']), bytes(update['signature_digest']), all_channel_keys[update['channel_hash']])
+            for update in verifiable
+        ])
+        for update, signature_valid in zip(verifiable, signatures_valid):
+            update['signature_valid'] = signature_valid
         sub_timer.stop()
 
         sub_timer = timer.add_timer('update claims')
@@ -673,17 +679,16 @@ class SQLDB:
                     public_key_hash=:public_key_hash
                 WHERE claim_hash=:claim_hash""", [{
                     'claim_hash': claim_hash,
-                    'public_key_bytes': txo.claim.channel.public_key_bytes,
-                    'public_key_hash': self.ledger.address_to_hash160(
-                            self.ledger.public_key_to_address(txo.claim.channel.public_key_bytes)
-                    )
-                } for claim_hash, txo in channels.items()]
+                    'public_key_bytes': claim.public_key_bytes,
+                    'public_key_hash': claim.public_key_hash
+                } for claim_hash, claim in channels.items()]
             )
         sub_timer.stop()
 
         sub_timer = timer.add_timer('update claims_in_channel counts')
         sub_timer.start()
         if all_channel_keys:
+            self.changed_claim_hashes.update(all_channel_keys)
             self.executemany(f"""
                 UPDATE claim SET
                     claims_in_channel=(
@@ -794,6 +799,49 @@ class SQLDB:
         r(self._update_effective_amount, height)
         r(self._perform_overtake, height, [], [])
 
+    def record_claim_changes(self, height, claim_hashes, deleted_names):
+        self.changed_claim_hashes.update(claim_hashes)
+        self.changed_claim_names.update(deleted_names)
+        sql = f"SELECT claim_hash, normalized FROM claim WHERE activation_height = {height}"
+        if claim_hashes:
+            sql += f" OR claim_hash IN ({','.join('?' for _ in claim_hashes)})"
+        for claim in self.execute(sql, list(claim_hashes)):
+            self.changed_claim_hashes.add(claim.claim_hash)
+            self.changed_claim_names.add(claim.normalized)
+
+    def pop_claim_changes(self) -> ClaimChanges:
+        changes = ClaimChanges(self.changed_claim_hashes, self.changed_claim_names, self.claims_changed_in_bulk)
+        self.changed_claim_hashes = set()
+        self.changed_claim_names = set()
+        self.claims_changed_in_bulk = False
+        return changes
+
+    def get_claim_cardinality_height(self) -> int:
+        row = self.execute("SELECT height FROM claim_cardinality WHERE facet = 'claim'").fetchone()
+        return row.height if row is not None else -1
+
+    def count_claim_cardinality(self) -> List[Tuple[str, str, int]]:
+        """Count the claims by type and tag on a connection of its own, the counting scans
+        the claim and tag tables and is done without blocking the writes of blocks."""
+        db = apsw.Connection(self._db_path, flags=apsw.SQLITE_OPEN_READONLY | apsw.SQLITE_OPEN_URI)
+        try:
+            return [tuple(row) for row in db.cursor().execute(self.COUNT_CLAIM_CARDINALITY)]
+        finally:
+            db.close()
+
+    def update_claim_cardinality(self, height, counts: Optional[List[Tuple[str, str, int]]] = None):
+        """Replace the claim counts with counts made at height, counting them now if not given."""
+        if counts is None:
+            counts = [tuple(row) for row in self.execute(self.COUNT_CLAIM_CARDINALITY)]
+        self.begin()
+        try:
+            self.execute("delete from claim_cardinality")
+            self.executemany(
+                "insert into claim_cardinality values (?, ?, ?, ?)", [(*count, height) for count in counts]
+            )
+        finally:
+            self.commit()
+
     def get_expiring(self, height):
         return self.execute(
             f"SELECT claim_hash, normalized FROM claim WHERE expiration_height = {height}"
@@ -872,25 +920,32 @@ class SQLDB:
         expire_timer.stop()
 
         r = timer.run
+        parsed_claims = r(self.claim_parser.parse, insert_claims + update_claims, timer_name='parse claims')
         r(update_full_text_search, 'before-delete',
           delete_claim_hashes, self.db.cursor(), self.main.first_sync)
         affected_channels = r(self.delete_claims, delete_claim_hashes)
         r(self.delete_supports, delete_support_txo_hashes)
-        r(self.insert_claims, insert_claims, header)
-        r(self.calculate_reposts, insert_claims)
+        r(self.insert_claims, insert_claims, header, parsed_claims)
+        r(self.calculate_reposts, insert_claims, parsed_claims)
         r(update_full_text_search, 'after-insert',
           [txo.claim_hash for txo in insert_claims], self.db.cursor(), self.main.first_sync)
         r(update_full_text_search, 'before-update',
           [txo.claim_hash for txo in update_claims], self.db.cursor(), self.main.first_sync)
-        r(self.update_claims, update_claims, header)
+        r(self.update_claims, update_claims, header, parsed_claims)
         r(update_full_text_search, 'after-update',
           [txo.claim_hash for txo in update_claims], self.db.cursor(), self.main.first_sync)
         r(self.validate_channel_signatures, height, insert_claims,
-          update_claims, delete_claim_hashes, affected_channels, forward_timer=True)
+          update_claims, delete_claim_hashes, affected_channels, parsed_claims, forward_timer=True)
         r(self.insert_supports, insert_supports)
         r(self.update_claimtrie, height, recalculate_claim_hashes, deleted_claim_names, forward_timer=True)
         for algorithm in self.trending:
-            r(algorithm.run, self.db.cursor(), height, daemon_height, recalculate_claim_hashes)
+            # trending algorithms return the claims whose trending values they wrote
+            self.changed_claim_hashes.update(
+                r(algorithm.run, self.db.cursor(), height, daemon_height, recalculate_claim_hashes)
+            )
+        if not self.main.first_sync:
+            r(self.record_claim_changes, height,
+              recalculate_claim_hashes | delete_claim_hashes | update_claim_hashes, deleted_claim_names)
         if not self._fts_synced and self.main.first_sync and height == daemon_height:
             r(first_sync_finished, self.db.cursor())
             self._fts_synced = True
@@ -909,7 +964,7 @@ class LBRYLevelDB(LevelDB):
             self, path,
             self.env.default('BLOCKING_CHANNEL_IDS', '').split(' '),
             self.env.default('FILTERING_CHANNEL_IDS', '').split(' '),
-            trending
+            trending, self.env.db_dir, self.env.claim_parse_workers
         )
 
     def close(self):
@@ -8,7 +8,7 @@
 
 import re
 import resource
-from os import environ
+from os import environ, cpu_count
 from collections import namedtuple
 from ipaddress import ip_address
 
@@ -41,11 +41,30 @@ class Env:
             trending for trending in set(self.default('TRENDING_ALGORITHMS', 'zscore').split(' ')) if trending
         ]
         self.max_query_workers = self.integer('MAX_QUERY_WORKERS', None)
+        self.reader_backend = self.reader_backend_enum()
+        self.block_decode_workers = self.integer('BLOCK_DECODE_WORKERS', max((cpu_count() or 1) // 2, 1))
+        self.claim_parse_workers = self.integer('CLAIM_PARSE_WORKERS', max((cpu_count() or 1) // 2, 1))
+        self.background_flush = self.boolean('BACKGROUND_FLUSH', True)
         self.individual_tag_indexes = self.boolean('INDIVIDUAL_TAG_INDEXES', True)
         self.track_metrics = self.boolean('TRACK_METRICS', False)
+        self.search_cache_MB = self.integer('SEARCH_CACHE_MB', 128)
+        self.resolve_cache_MB = self.integer('RESOLVE_CACHE_MB', 128)
+        self.query_cache_ttl = self.integer('QUERY_CACHE_TTL', 300)
+        self.front_page_queries = self.integer('FRONT_PAGE_QUERIES', 10)
+        self.front_page_pages = self.integer('FRONT_PAGE_PAGES', 3)
+        self.cardinality_sketch_blocks = self.integer('CARDINALITY_SKETCH_BLOCKS', 100)
+        self.busy_pending_queries = self.integer('BUSY_PENDING_QUERIES', 64)
+        self.expensive_query_ms = self.integer('EXPENSIVE_QUERY_MS', 100)
+        self.max_expensive_queries = self.integer('MAX_EXPENSIVE_QUERIES', 4)
+        self.max_queued_expensive_queries = self.integer('MAX_QUEUED_EXPENSIVE_QUERIES', 32)
         self.websocket_host = self.default('WEBSOCKET_HOST', self.host)
         self.websocket_port = self.integer('WEBSOCKET_PORT', None)
         self.daemon_url = self.required('DAEMON_URL')
+        self.daemon_zmq_url = self.default('DAEMON_ZMQ_URL', None)
+        self.daemon_max_connections = self.integer('DAEMON_MAX_CONNECTIONS', 10)
+        self.daemon_batch_target_ms = self.integer('DAEMON_BATCH_TARGET_MS', 500)
+        self.mempool_resync_secs = self.integer('MEMPOOL_RESYNC_SECS', 30)
+        self.front_end_processes = self.integer('FRONT_END_PROCESSES', 0)
         if coin is not None:
             assert issubclass(coin, Coin)
             self.coin = coin
@@ -54,6 +73,8 @@ class Env:
             network = self.default('NET', 'mainnet').strip()
             self.coin = Coin.lookup_coin_class(coin_name, network)
         self.cache_MB = self.integer('CACHE_MB', 1200)
+        self.tx_cache_MB = self.integer('TX_CACHE_MB', 128)
+        self.merkle_cache_MB = self.integer('MERKLE_CACHE_MB', 32)
         self.reorg_limit = self.integer('REORG_LIMIT', self.coin.REORG_LIMIT)
         # Server stuff
         self.tcp_port = self.integer('TCP_PORT', None)
@@ -255,6 +276,12 @@ class Env:
                                 'ssl_port': identity.ssl_port}
                 for identity in self.identities}
 
+    def reader_backend_enum(self):
+        backend = self.default('READER_BACKEND', 'process').strip().lower()
+        if backend not in ('process', 'thread'):
+            raise self.Error(f'unknown READER_BACKEND {backend}, expected "process" or "thread"')
+        return backend
+
     def peer_discovery_enum(self):
         pd = self.default('PEER_DISCOVERY', 'on').strip().lower()
         if pd in ('off', ''):
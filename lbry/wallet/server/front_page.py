@@ -0,0 +1,134 @@
+import time
+import base64
+import typing
+import logging
+import threading
+from collections import Counter
+
+from lbry.wallet.server.cache import canonical_cache_key
+
+log = logging.getLogger(__name__)
+
+# distinct search shapes counted between two blocks, bounds memory used by one-off queries
+MAX_TRACKED_SHAPES = 10000
+
+
+def search_shape(kwargs: dict) -> typing.Tuple[str, int, int]:
+    """Split a search into the cache key of its shape (everything but the offset), limit and offset."""
+    shape = {key: value for key, value in kwargs.items() if key != 'offset'}
+    return canonical_cache_key(shape), kwargs.get('limit', 10), kwargs.get('offset', 0)
+
+
+class FrontPage:
+    """
+    Precomputed results of the most requested claim searches.
+
+    Every search request is counted by its shape (the search arguments without the
+    offset), after each block the session manager calls `refresh` which runs the
+    `queries` most requested shapes for their first `pages` pages through the reader
+    pool, at the lowest priority. Requests for those pages are then answered from
+    memory without going through the reader pool.
+
+    Counts are halved on each refresh so the set of precomputed searches follows the
+    traffic, shapes requested only once are forgotten after the next block.
+
+    The pages are cleared as soon as a block or a reorg is notified, so results of an
+    earlier block (or of claims blocked since) are never served. A refresh started
+    before the last `clear` is abandoned without installing its pages.
+    """
+
+    def __init__(self, queries: int, pages: int, hits=None, misses=None, size=None, refresh_time=None):
+        self.queries = queries
+        self.pages = pages
+        self._lock = threading.Lock()
+        self._requests: typing.Counter[str] = Counter()
+        self._constraints: typing.Dict[str, dict] = {}
+        self._results: typing.Dict[str, typing.Tuple[str, ...]] = {}
+        # bumped by clear, a refresh only installs its pages if it is unchanged
+        self._generation = 0
+        self._hits = hits
+        self._misses = misses
+        self._size_metric = size
+        self._refresh_time_metric = refresh_time
+
+    def __len__(self):
+        return sum(len(pages) for pages in self._results.values())
+
+    def get(self, kwargs: dict) -> typing.Optional[str]:
+        """Count the request and return its base64 encoded result if it was precomputed."""
+        key, limit, offset = search_shape(kwargs)
+        with self._lock:
+            if key in self._constraints or len(self._constraints) < MAX_TRACKED_SHAPES:
+                self._requests[key] += 1
+                self._constraints.setdefault(key, {k: v for k, v in kwargs.items() if k != 'offset'})
+        pages = self._results.get(key)
+        result = None
+        if pages and isinstance(limit, int) and isinstance(offset, int) and limit > 0 and offset % limit == 0:
+            page = offset // limit
+            if page < len(pages):
+                result = pages[page]
+        if result is None:
+            if self._misses is not None:
+                self._misses.inc()
+        elif self._hits is not None:
+            self._hits.inc()
+        return result
+
+    def top_shapes(self) -> typing.List[typing.Tuple[str, dict]]:
+        """Search arguments of the most requested shapes, ages the request counts."""
+        with self._lock:
+            top = [
+                (key, self._constraints[key]) for key, _ in self._requests.most_common(self.queries)
+            ]
+            for key, count in list(self._requests.items()):
+                if count // 2:
+                    self._requests[key] = count // 2
+                else:
+                    del self._requests[key]
+                    del self._constraints[key]
+        return top
+
+    async def refresh(self, search: typing.Callable[[dict], typing.Awaitable[bytes]]) -> bool:
+        """Recompute the pages of the most requested shapes with `search`, called after each block.
+        Returns False if the pages were cleared meanwhile, the results are then dropped."""
+        start = time.perf_counter()
+        generation = self._generation
+        results = {}
+        for key, constraints in self.top_shapes():
+            if generation != self._generation:
+                return False
+            limit = constraints.get('limit', 10)
+            if not isinstance(limit, int) or limit <= 0:
+                continue
+            pages = []
+            for page in range(self.pages):
+                try:
+                    result = await search({**constraints, 'offset': page * limit})
+                    pages.append(base64.b64encode(result).decode())
+                except Exception as err:
+                    log.warning("failed to precompute search %s: %s", constraints, err)
+                    self._forget(key)
+                    break
+            if pages:
+                results[key] = tuple(pages)
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._results = results
+        if self._size_metric is not None:
+            self._size_metric.set(len(self))
+        if self._refresh_time_metric is not None:
+            self._refresh_time_metric.observe(time.perf_counter() - start)
+        return True
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._requests.pop(key, None)
+            self._constraints.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._results = {}
+        if self._size_metric is not None:
+            self._size_metric.set(0)
@@ -0,0 +1,471 @@
+"""Front-end processes serving wallet sessions.
+
+The process syncing blocks, the writer, runs every session on its own event loop,
+so parsing requests, encoding responses and notifying subscribers compete for one
+core. With FRONT_END_PROCESSES set the writer stops serving clients: it starts that
+many front-end processes, each listening on the TCP and SSL ports with SO_REUSEPORT
+so the kernel spreads new connections among them, and each running the sessions of
+its own connections with its own claim search readers.
+
+LevelDB can only be opened by one process, so a front-end asks the writer for the
+history, utxos and txs of its requests over a unix socket in the DB directory. Along
+the same socket the writer pushes what its session manager is notified of: the new
+height, the touched hashXs and the txs added to and removed from its mempool. A
+front-end keeps a replica of the mempool with those, and reads headers in place
+from the memory mapped table the writer appends to, so header and mempool requests
+never leave it.
+"""
+import os
+import time
+import types
+import pickle
+import signal
+import struct
+import hashlib
+import typing
+import asyncio
+import logging
+import itertools
+import multiprocessing
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from lbry.wallet.server import util
+from lbry.wallet.server.env import Env
+from lbry.wallet.server.hash import hash_to_hex_str
+from lbry.wallet.server.leveldb import LevelDB
+from lbry.wallet.server.mempool import MemPool, MemPoolAPI
+from lbry.wallet.server.status import RESUMABLE
+from lbry.wallet.server.table import FixedWidthTable
+from lbry.prometheus import PrometheusServer
+
+SOCKET_NAME = 'front_ends.sock'
+LENGTH = struct.Struct('<I')
+# bytes buffered for a front-end past which notifications are held until it catches up
+MAX_BUFFERED_NOTIFICATIONS = 16 * 1024 * 1024
+
+# LevelDB reads the writer does for front-ends
+WRITER_METHODS = frozenset((
+    'limited_history', 'history_page', 'confirmed_status', 'all_utxos', 'fs_transactions', 'header_branch_and_root'
+))
+
+
+def encode(message) -> bytes:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return LENGTH.pack(len(data)) + data
+
+
+async def read_message(reader: asyncio.StreamReader):
+    size, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return pickle.loads(await reader.readexactly(size))
+
+
+class FrontEndHub:
+    """
+    The writer's end of the front-end processes: starts them, does their LevelDB
+    reads and pushes them the notifications of the writer's session manager.
+
+    Every front-end is sent the same changes of the mempool since the previous
+    notification, the mempool as of that notification is kept to compute them and
+    to send it whole to front-ends connecting later.
+
+    A front-end which falls MAX_BUFFERED_NOTIFICATIONS behind is lagging: its
+    notifications are merged instead of buffered, and once its connection drains it
+    is sent one notification with everything touched and the mempool changes since
+    the last notification it was sent.
+    """
+
+    def __init__(self, env, db, bp, daemon, mempool):
+        self.logger = util.class_logger(__name__, self.__class__.__name__)
+        self.env = env
+        self.db = db
+        self.bp = bp
+        self.daemon = daemon
+        self.mempool = mempool
+        self.path = os.path.join(env.db_dir, SOCKET_NAME)
+        self.server: typing.Optional[asyncio.AbstractServer] = None
+        # the connection of each front-end, and the task serving it
+        self.front_ends: typing.Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        # the reads being done for front-ends
+        self.calls: typing.Set[asyncio.Task] = set()
+        # touched, new_touched and the mempool last sent to lagging front-ends, and the tasks waiting for them
+        self.lagging: typing.Dict[asyncio.StreamWriter, typing.Tuple[set, set, dict]] = {}
+        self.catching_up: typing.Set[asyncio.Task] = set()
+        self.processes: typing.List[multiprocessing.Process] = []
+        self.notified = asyncio.Event()
+        self.height = -1
+        self.txs = {}
+
+    async def listen(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._serve, self.path)
+        os.chmod(self.path, 0o600)
+
+    async def start(self):
+        await self.listen()
+        context = multiprocessing.get_context('spawn')
+        for index in range(self.env.front_end_processes):
+            process = context.Process(target=run_front_end, args=(self.env.coin, index), name=f'front-end-{index}')
+            process.start()
+            self.processes.append(process)
+        self.logger.info(f'started {len(self.processes)} front-end processes')
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        # front-ends shut down when their connection closes
+        tasks = list(self.front_ends.values())
+        for front_end in self.front_ends:
+            front_end.close()
+        if tasks:
+            await asyncio.wait(tasks)
+        calls = list(self.calls) + list(self.catching_up)
+        for call in calls:
+            call.cancel()
+        if calls:
+            await asyncio.wait(calls)
+        for process in self.processes:
+            await asyncio.get_event_loop().run_in_executor(None, process.join, 5)
+            if process.is_alive():
+                process.terminate()
+        self.processes.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _state(self):
+        return self.height, self.daemon.cached_height(), self.bp.blocks_received, self.mempool.cached_compact_histogram
+
+    def notify(self, height, touched, new_touched):
+        """Pass a notification of the writer's session manager on to the front-ends."""
+        txs = self.mempool.txs
+        added = {tx_hash: txs[tx_hash] for tx_hash in txs.keys() - self.txs.keys()}
+        removed = list(self.txs.keys() - txs.keys())
+        sent_txs, self.txs = self.txs, dict(txs)
+        self.height = height
+        self.notified.set()
+        if self.front_ends:
+            message = encode(('notify', self._state(), touched, new_touched, added, removed))
+            for front_end in self.front_ends:
+                lagging = self.lagging.get(front_end)
+                if lagging is not None:
+                    lagging[0].update(touched)
+                    lagging[1].update(new_touched)
+                elif front_end.transport.get_write_buffer_size() > MAX_BUFFERED_NOTIFICATIONS:
+                    self.logger.warning('a front-end is lagging, holding its notifications until it catches up')
+                    self.lagging[front_end] = (set(touched), set(new_touched), sent_txs)
+                    task = asyncio.create_task(self._catch_up(front_end))
+                    self.catching_up.add(task)
+                    task.add_done_callback(self.catching_up.discard)
+                else:
+                    front_end.write(message)
+
+    async def _catch_up(self, front_end: asyncio.StreamWriter):
+        try:
+            await front_end.drain()
+        except ConnectionError:
+            return
+        finally:
+            touched, new_touched, sent_txs = self.lagging.pop(front_end)
+        added = {tx_hash: self.txs[tx_hash] for tx_hash in self.txs.keys() - sent_txs.keys()}
+        removed = list(sent_txs.keys() - self.txs.keys())
+        if not front_end.is_closing():
+            front_end.write(encode(('notify', self._state(), touched, new_touched, added, removed)))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await self.notified.wait()
+        sql = self.db.sql
+        # the shared maps unpickle as read only views of the same files
+        block_and_filter = sql.blocked_streams, sql.blocked_channels, sql.filtered_streams, sql.filtered_channels
+        writer.write(encode(('hello', self._state(), self.txs, block_and_filter)))
+        self.front_ends[writer] = asyncio.current_task()
+        try:
+            while True:
+                message = await read_message(reader)
+                if message[0] == 'call':
+                    call = asyncio.create_task(self._call(writer, *message[1:]))
+                    self.calls.add(call)
+                    call.add_done_callback(self.calls.discard)
+                elif message[0] == 'wakeup':
+                    self.mempool.wakeup.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.front_ends.pop(writer, None)
+            writer.close()
+
+    async def _call(self, writer: asyncio.StreamWriter, call_id, method, args, kwargs):
+        try:
+            if method not in WRITER_METHODS:
+                raise ValueError(f'{method} is not a method front-ends can call')
+            data = encode(('result', call_id, await getattr(self.db, method)(*args, **kwargs)))
+        except Exception as error:
+            try:
+                data = encode(('error', call_id, error))
+            except Exception:
+                data = encode(('error', call_id, RuntimeError(repr(error))))
+        if not writer.is_closing():
+            writer.write(data)
+
+
+class WriterConnection:
+    """A front-end's connection to the writer."""
+
+    def __init__(self, path: str, on_notify: typing.Callable[..., typing.Awaitable[None]]):
+        self.path = path
+        self.on_notify = on_notify
+        self.reader: typing.Optional[asyncio.StreamReader] = None
+        self.writer: typing.Optional[asyncio.StreamWriter] = None
+        self.calls: typing.Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    async def connect(self, retry_delay=0.5):
+        """Connect to the writer, waiting for it to listen, and return its hello."""
+        while True:
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+                break
+            except (FileNotFoundError, ConnectionError):
+                await asyncio.sleep(retry_delay)
+        message = await read_message(self.reader)
+        return message[1:]
+
+    async def call(self, method, *args, **kwargs):
+        call_id = next(self._ids)
+        future = self.calls[call_id] = asyncio.get_event_loop().create_future()
+        try:
+            self.writer.write(encode(('call', call_id, method, args, kwargs)))
+            return await future
+        finally:
+            self.calls.pop(call_id, None)
+
+    def wakeup_mempool(self):
+        self.writer.write(encode(('wakeup',)))
+
+    async def receive(self):
+        """Resolve calls and pass notifications on, in the order they arrive,
+        until the writer closes the connection."""
+        try:
+            while True:
+                message = await read_message(self.reader)
+                if message[0] == 'notify':
+                    await self.on_notify(*message[1:])
+                    continue
+                future = self.calls.get(message[1])
+                if future is None or future.done():
+                    continue
+                if message[0] == 'result':
+                    future.set_result(message[2])
+                else:
+                    future.set_exception(message[2])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self.calls.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('lost the connection to the writer'))
+            self.writer.close()
+
+
+class FrontEndDB(LevelDB):
+    """
+    The writer's DB as seen by a front-end: headers are read from the table the
+    writer appends to and the header merkle branches of transactions of blocks are
+    computed here, history, utxos and txs are read by the writer.
+    """
+
+    def __init__(self, env, writer: WriterConnection):
+        super().__init__(env)
+        self.writer = writer
+        self.executor = ThreadPoolExecutor(1)
+        self.sql = None
+        self.db_height = -1
+
+    def open(self, height, block_and_filter):
+        self.headers = FixedWidthTable(
+            os.path.join(self.env.db_dir, 'headers'), self.coin.BASIC_HEADER_SIZE, height + 1, readonly=True
+        )
+        blocked_streams, blocked_channels, filtered_streams, filtered_channels = block_and_filter
+        self.sql = types.SimpleNamespace(
+            blocked_streams=blocked_streams, blocked_channels=blocked_channels,
+            filtered_streams=filtered_streams, filtered_channels=filtered_channels
+        )
+        self.db_height = height
+
+    def advance(self, height):
+        self.headers.follow(height + 1)
+        self.db_height = height
+
+    def close(self):
+        if self.headers is not None:
+            self.headers.close()
+        self.executor.shutdown(wait=True)
+
+    async def header_branch_and_root(self, length, height):
+        return await self.writer.call('header_branch_and_root', length, height)
+
+    async def fs_transactions(self, txids):
+        return await self.writer.call('fs_transactions', txids)
+
+    async def limited_history(self, hashX, *, limit=1000):
+        return await self.writer.call('limited_history', hashX, limit=limit)
+
+    async def confirmed_status(self, hashX, limit=None):
+        if RESUMABLE:
+            return await self.writer.call('confirmed_status', hashX, limit=limit, exportable=True)
+        # hashlib objects can not be pickled, hash the history here instead
+        history = await self.limited_history(hashX, limit=limit)
+        if not history:
+            return None
+        status_hash = hashlib.sha256()
+        status_hash.update(''.join(f'{hash_to_hex_str(tx_hash)}:{height:d}:' for tx_hash, height in history).encode())
+        return status_hash
+
+    async def history_page(self, hashX, start_height=0, end_height=None, offset=0, limit=1000):
+        return await self.writer.call('history_page', hashX, start_height, end_height, offset, limit)
+
+    async def all_utxos(self, hashX):
+        return await self.writer.call('all_utxos', hashX)
+
+
+class WriterBlockProcessor:
+    """Stands in for the writer's block processor in a front-end's session manager."""
+
+    def __init__(self, db: FrontEndDB):
+        self.db = db
+        self.height = -1
+        self.blocks_received = time.perf_counter()
+        self.history_cache = {}
+        self.search_cache = {}
+        self.front_page = None
+
+    def force_chain_reorg(self, count):
+        return False
+
+
+class WriterNotifications:
+    """Passes the notifications of the writer on to a front-end's session manager,
+    the writer already deferred them until both block and mempool were processed."""
+
+    def __init__(self):
+        self.notify = None
+
+    async def start(self, height, notify_func):
+        self.notify = notify_func
+        await notify_func(height, set(), set())
+
+
+class FrontEnd:
+    """A front-end process, serving the sessions of the connections it accepts."""
+
+    def __init__(self, env, index):
+        self.env = env
+        self.index = index
+        self.logger = util.class_logger(__name__, self.__class__.__name__)
+        # the writer keeps the local RPC port, the admin websocket and peer discovery
+        env.rpc_port = None
+        env.websocket_port = None
+        env.peer_discovery = env.PD_OFF
+        self.shutdown_event = asyncio.Event()
+        self.cancellable_tasks = []
+        self.writer = WriterConnection(os.path.join(env.db_dir, SOCKET_NAME), self._on_notify)
+        self.db = FrontEndDB(env, self.writer)
+        self.bp = WriterBlockProcessor(self.db)
+        self.daemon = env.coin.DAEMON(
+            env.coin, env.daemon_url, max_workqueue=env.daemon_max_connections,
+            batch_target_secs=env.daemon_batch_target_ms / 1000
+        )
+        # a replica never synchronizes with the daemon, it only asks the api for heights
+        self.mempool = MemPool(env.coin, self)
+        self.notifications = WriterNotifications()
+        self.session_mgr = env.coin.SESSION_MANAGER(
+            env, self.db, self.bp, self.daemon, self.mempool, self.shutdown_event
+        )
+        self.session_mgr.serves_clients = True
+        self.prometheus_server: typing.Optional[PrometheusServer] = None
+
+    async def height(self):
+        return self.bp.height
+
+    def cached_height(self):
+        return self.bp.height
+
+    def _update(self, state):
+        height, daemon_height, blocks_received, _ = state
+        self.bp.height = height
+        self.bp.blocks_received = blocks_received
+        # saves asking the daemon, the writer polls it
+        self.daemon.set_cached_height(daemon_height)
+
+    async def _on_notify(self, state, touched, new_touched, added, removed):
+        height = state[0]
+        self.mempool.replicate(added, removed, state[3])
+        if height != self.db.db_height:
+            self.db.advance(height)
+            self.bp.history_cache.clear()
+            for cache in self.bp.search_cache.values():
+                cache.clear()
+        self._update(state)
+        await self.notifications.notify(height, touched, new_touched)
+
+    async def _forward_mempool_wakeups(self):
+        while True:
+            await self.mempool.wakeup.wait()
+            self.mempool.wakeup.clear()
+            self.writer.wakeup_mempool()
+
+    async def _receive(self):
+        await self.writer.receive()
+        self.logger.warning('lost the connection to the writer, shutting down')
+        self.shutdown_event.set()
+
+    async def start(self):
+        state, txs, block_and_filter = await self.writer.connect()
+        self.db.open(state[0], block_and_filter)
+        self.mempool.replicate(txs, (), state[3])
+        self._update(state)
+        self.logger.info(f'front-end {self.index} synchronized with the writer at height {state[0]:,d}')
+
+        _flag = asyncio.Event()
+        self.cancellable_tasks.append(asyncio.ensure_future(self.session_mgr.serve(self.notifications, _flag)))
+        await _flag.wait()
+        self.cancellable_tasks.append(asyncio.ensure_future(self._receive()))
+        self.cancellable_tasks.append(asyncio.ensure_future(self._forward_mempool_wakeups()))
+        if self.env.prometheus_port:
+            self.prometheus_server = PrometheusServer()
+            await self.prometheus_server.start("0.0.0.0", self.env.prometheus_port + 1 + self.index)
+
+    async def stop(self):
+        for task in reversed(self.cancellable_tasks):
+            task.cancel()
+        if self.cancellable_tasks:
+            await asyncio.wait(self.cancellable_tasks)
+        if self.prometheus_server:
+            await self.prometheus_server.stop()
+            self.prometheus_server = None
+        await self.daemon.close()
+        self.db.close()
+
+    def run(self):
+        loop = asyncio.get_event_loop()
+
+        def __exit():
+            raise SystemExit()
+        try:
+            loop.add_signal_handler(signal.SIGINT, __exit)
+            loop.add_signal_handler(signal.SIGTERM, __exit)
+            loop.run_until_complete(self.start())
+            loop.run_until_complete(self.shutdown_event.wait())
+        except (SystemExit, KeyboardInterrupt):
+            pass
+        finally:
+            loop.run_until_complete(self.stop())
+
+
+MemPoolAPI.register(FrontEnd)
+
+
+def run_front_end(coin, index):
+    logging.basicConfig(level=logging.INFO)
+    FrontEnd(Env(coin), index).run()
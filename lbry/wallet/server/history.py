@@ -11,18 +11,36 @@
 import array
 import ast
 import bisect
+import threading
 import time
 from collections import defaultdict
 from functools import partial
+from struct import Struct
 
 from lbry.wallet.server import util
 from lbry.wallet.server.util import pack_be_uint16, unpack_be_uint16_from
 from lbry.wallet.server.hash import hash_to_hex_str, HASHX_LEN
 
+# Every history row hashX + suffix has an index row INDEX_PREFIX + hashX + suffix
+# holding the first and last tx_num of the row and its number of entries.
+INDEX_PREFIX = b'I'
+INDEX_ROW = Struct('<III')
+HIST_KEY_LEN = HASHX_LEN + 2
+# STATUS_PREFIX + hashX holds a saved status hash covering the first entries of the
+# history of the hashX: the number of entries, the tx_num of the last one and the state.
+STATUS_PREFIX = b'S'
+STATUS_ROW = Struct('<II')
+
+
+def index_row(hist):
+    a = array.array('I')
+    a.frombytes(hist)
+    return INDEX_ROW.pack(a[0], a[-1], len(a))
+
 
 class History:
 
-    DB_VERSIONS = [0]
+    DB_VERSIONS = [0, 1]
 
     def __init__(self):
         self.logger = util.class_logger(__name__, self.__class__.__name__)
@@ -31,11 +49,16 @@ class History:
         self.unflushed = defaultdict(partial(array.array, 'I'))
         self.unflushed_count = 0
         self.db = None
+        # Saved statuses are written by sessions, backups must not race them
+        self.status_lock = threading.Lock()
+        self.backup_count = 0
 
     def open_db(self, db_class, for_sync, utxo_flush_count, compacting):
         self.db = db_class('hist', for_sync)
         self.read_state()
         self.clear_excess(utxo_flush_count)
+        if self.db_version == 0:
+            self.upgrade_index()
         # An incomplete compaction needs to be cancelled otherwise
         # restarting it will corrupt the history
         if not compacting:
@@ -81,6 +104,10 @@ class History:
 
         keys = []
         for key, hist in self.db.iterator(prefix=b''):
+            if len(key) == HASHX_LEN + 1 and key[:1] == STATUS_PREFIX:
+                # saved statuses may cover deleted history
+                keys.append(key)
+                continue
             flush_id, = unpack_be_uint16_from(key[-2:])
             if flush_id > utxo_flush_count:
                 keys.append(key)
@@ -95,6 +122,29 @@ class History:
 
         self.logger.info('deleted excess history entries')
 
+    def upgrade_index(self):
+        """Write the index rows of a version 0 history DB."""
+        self.logger.info('DB version 0: indexing history rows...')
+        count = 0
+        batch_size = 100000
+        rows = []
+        for key, hist in self.db.iterator(prefix=b''):
+            if len(key) == HIST_KEY_LEN:
+                rows.append((INDEX_PREFIX + key, index_row(hist)))
+            if len(rows) == batch_size:
+                with self.db.write_batch() as batch:
+                    for index_key, value in rows:
+                        batch.put(index_key, value)
+                count += len(rows)
+                rows.clear()
+                self.logger.info(f'indexed {count:,d} history rows')
+        self.db_version = 1
+        with self.db.write_batch() as batch:
+            for index_key, value in rows:
+                batch.put(index_key, value)
+            self.write_state(batch)
+        self.logger.info(f'indexed {count + len(rows):,d} history rows, DB upgraded to version 1')
+
     def write_state(self, batch):
         """Write state to the history DB."""
         state = {
@@ -123,38 +173,69 @@ class History:
     def assert_flushed(self):
         assert not self.unflushed
 
-    def flush(self):
+    def take_unflushed(self):
+        """Return the unflushed history for a background flush and start
+        collecting a new generation."""
+        unflushed = self.unflushed
+        self.unflushed = defaultdict(partial(array.array, 'I'))
+        self.unflushed_count = 0
+        return unflushed
+
+    def flush(self, unflushed=None):
         start_time = time.time()
         self.flush_count += 1
         flush_id = pack_be_uint16(self.flush_count)
-        unflushed = self.unflushed
+        if unflushed is None:
+            unflushed = self.unflushed
+            self.unflushed_count = 0
 
         with self.db.write_batch() as batch:
             for hashX in sorted(unflushed):
                 key = hashX + flush_id
-                batch.put(key, unflushed[hashX].tobytes())
+                tx_nums = unflushed[hashX]
+                batch.put(key, tx_nums.tobytes())
+                batch.put(INDEX_PREFIX + key, INDEX_ROW.pack(tx_nums[0], tx_nums[-1], len(tx_nums)))
             self.write_state(batch)
 
         count = len(unflushed)
         unflushed.clear()
-        self.unflushed_count = 0
 
         if self.db.for_sync:
             elapsed = time.time() - start_time
             self.logger.info(f'flushed history in {elapsed:.1f}s '
                              f'for {count:,d} addrs')
 
+    def get_status(self, hashX):
+        """Return the saved (count, last_tx_num, state) status of a
+        hashX, or None."""
+        row = self.db.get(STATUS_PREFIX + hashX)
+        if row is None:
+            return None
+        count, last_tx_num = STATUS_ROW.unpack_from(row)
+        return count, last_tx_num, row[STATUS_ROW.size:]
+
+    def put_status(self, hashX, count, last_tx_num, state, backup_count):
+        """Save the status of a hashX unless a backup happened since
+        backup_count was read."""
+        with self.status_lock:
+            if backup_count == self.backup_count:
+                self.db.put(STATUS_PREFIX + hashX, STATUS_ROW.pack(count, last_tx_num) + state)
+
     def backup(self, hashXs, tx_count):
         # Not certain this is needed, but it doesn't hurt
         self.flush_count += 1
         nremoves = 0
         bisect_left = bisect.bisect_left
 
-        with self.db.write_batch() as batch:
+        with self.status_lock, self.db.write_batch() as batch:
+            self.backup_count += 1
             for hashX in sorted(hashXs):
+                batch.delete(STATUS_PREFIX + hashX)
                 deletes = []
                 puts = {}
                 for key, hist in self.db.iterator(prefix=hashX, reverse=True):
+                    if len(key) != HIST_KEY_LEN:
+                        continue
                     a = array.array('I')
                     a.frombytes(hist)
                     # Remove all history entries >= tx_count
@@ -167,12 +248,55 @@ class History:
 
                 for key in deletes:
                     batch.delete(key)
+                    batch.delete(INDEX_PREFIX + key)
                 for key, value in puts.items():
                     batch.put(key, value)
+                    batch.put(INDEX_PREFIX + key, index_row(value))
             self.write_state(batch)
 
         self.logger.info(f'backing up removed {nremoves:,d} history entries')
 
+    def get_txnums(self, hashX, start_tx_num=0, end_tx_num=None, offset=0, limit=None):
+        """Return the tx_nums of the history of a hashX in the range
+        [start_tx_num, end_tx_num), skipping the first offset and
+        returning at most limit, together with the number of tx_nums in
+        the range.
+
+        Only the index rows of the hashX and the history rows holding the
+        returned tx_nums or a range boundary are read, so a page costs
+        O(page) no matter how long the history is."""
+        tx_nums = []
+        count = 0
+        for index_key, index_value in self.db.iterator(prefix=INDEX_PREFIX + hashX):
+            if len(index_key) != HIST_KEY_LEN + 1:
+                continue
+            first, last, n = INDEX_ROW.unpack(index_value)
+            if last < start_tx_num:
+                continue
+            if end_tx_num is not None and first >= end_tx_num:
+                break
+            a = None
+            lo, hi = 0, n
+            if first < start_tx_num or (end_tx_num is not None and last >= end_tx_num):
+                a = self._read_row(index_key[1:])
+                lo = bisect.bisect_left(a, start_tx_num)
+                if end_tx_num is not None:
+                    hi = bisect.bisect_left(a, end_tx_num)
+            # positions of this row in the range are count to count + hi - lo
+            start = max(offset - count, 0)
+            stop = hi - lo if limit is None else min(hi - lo, offset + limit - count)
+            if start < stop:
+                if a is None:
+                    a = self._read_row(index_key[1:])
+                tx_nums.extend(a[lo + start:lo + stop])
+            count += hi - lo
+        return tx_nums, count
+
+    def _read_row(self, key):
+        a = array.array('I')
+        a.frombytes(self.db.get(key))
+        return a
+
     # def get_txnums(self, hashX, limit=1000):
     #     """Generator that returns an unpruned, sorted list of tx_nums in the
     #     history of a hashX.  Includes both spending and receiving
@@ -249,12 +373,15 @@ class History:
         # compacted.
         write_size = 0
         keys_to_delete.update(hist_map)
+        keys_to_delete.update(INDEX_PREFIX + key for key in hist_map)
         for n, chunk in enumerate(util.chunks(full_hist, max_row_size)):
             key = hashX + pack_be_uint16(n)
             if hist_map.get(key) == chunk:
                 keys_to_delete.remove(key)
+                keys_to_delete.remove(INDEX_PREFIX + key)
             else:
                 write_items.append((key, chunk))
+                write_items.append((INDEX_PREFIX + key, index_row(chunk)))
                 write_size += len(chunk)
 
         assert n + 1 == nrows
@@ -12,7 +12,9 @@
 import asyncio
 import array
 import ast
+import hashlib
 import os
+import sys
 import time
 import zlib
 import typing
@@ -24,13 +26,16 @@ from glob import glob
 from struct import pack, unpack
 from concurrent.futures.thread import ThreadPoolExecutor
 import attr
-from lbry.utils import LRUCache
+from prometheus_client import Counter, Gauge
 from lbry.wallet.server import util
+from lbry.wallet.server.cache import SizedLRUCache
 from lbry.wallet.server.hash import hash_to_hex_str, HASHX_LEN
 from lbry.wallet.server.merkle import Merkle, MerkleCache
 from lbry.wallet.server.util import formatted_time
 from lbry.wallet.server.storage import db_class
 from lbry.wallet.server.history import History
+from lbry.wallet.server.status import StatusHash, RESUMABLE
+from lbry.wallet.server.table import FixedWidthTable
 
 
 UTXO = namedtuple("UTXO", "tx_num tx_pos tx_hash height value")
@@ -40,6 +45,15 @@ TX_HASH_PREFIX = b'X'
 TX_PREFIX = b'B'
 TX_NUM_PREFIX = b'N'
 BLOCK_HASH_PREFIX = b'C'
+# Statuses of addresses with at least this many confirmed transactions are
+# saved in the history DB and extended with new transactions only
+STATUS_SAVE_MIN_TXS = 200
+
+NAMESPACE = "wallet_server"
+# memory held by a cached hash: the bytes object and its slot in a level list
+HASH_ENTRY_SIZE = sys.getsizeof(bytes(32)) + 8
+# memory held by a cached tx and merkle dict, besides the raw tx and the branch
+TX_ENTRY_OVERHEAD = 512
 
 
 
@@ -55,6 +69,8 @@ class FlushData:
     adds = attr.ib()
     deletes = attr.ib()
     tip = attr.ib()
+    # History of a background flush, None flushes History.unflushed
+    history = attr.ib(default=None)
 
 
 class LevelDB:
@@ -66,6 +82,23 @@ class LevelDB:
 
     DB_VERSIONS = [6]
 
+    cache_hit_metric = Counter(
+        "tx_cache_hit_count", "Number of tx and merkle lookups served from cache",
+        namespace=NAMESPACE, labelnames=("cache",)
+    )
+    cache_miss_metric = Counter(
+        "tx_cache_miss_count", "Number of tx and merkle lookups missing from cache",
+        namespace=NAMESPACE, labelnames=("cache",)
+    )
+    cache_eviction_metric = Counter(
+        "tx_cache_eviction_count", "Number of tx and merkle cache entries evicted to free space",
+        namespace=NAMESPACE, labelnames=("cache",)
+    )
+    cache_size_metric = Gauge(
+        "tx_cache_size", "Size in bytes of cached txs and merkle trees",
+        namespace=NAMESPACE, labelnames=("cache",)
+    )
+
     class DBError(Exception):
         """Raised on general DB errors generally indicating corruption."""
 
@@ -93,9 +126,29 @@ class LevelDB:
         self.headers_db = None
         self.tx_db = None
 
-        self._tx_and_merkle_cache = LRUCache(2**17, metric_name='tx_and_merkle', namespace="wallet_server")
+        self._tx_and_merkle_cache = self._make_cache('tx_and_merkle', self.env.tx_cache_MB, self._tx_entry_size)
+        # merkle tree levels of recently requested blocks, by (height, block hash)
+        self._block_merkle_cache = self._make_cache('block_merkle', self.env.merkle_cache_MB, self._levels_size)
         self.total_transactions = None
 
+    def _make_cache(self, name, max_MB, sizeof):
+        return SizedLRUCache(
+            max_MB * 1024 * 1024, sizeof,
+            hits=self.cache_hit_metric.labels(cache=name),
+            misses=self.cache_miss_metric.labels(cache=name),
+            evictions=self.cache_eviction_metric.labels(cache=name),
+            size=self.cache_size_metric.labels(cache=name)
+        )
+
+    @staticmethod
+    def _tx_entry_size(tx_and_merkle):
+        tx, merkle = tx_and_merkle
+        return TX_ENTRY_OVERHEAD + (len(tx) if tx else 0) + 2 * HASH_ENTRY_SIZE * len(merkle.get('merkle', ()))
+
+    @staticmethod
+    def _levels_size(levels):
+        return HASH_ENTRY_SIZE * sum(len(level) for level in levels)
+
     async def _read_tx_counts(self):
         if self.tx_counts is not None:
             return
@@ -118,30 +171,41 @@ class LevelDB:
         else:
             assert self.db_tx_count == 0
 
+    def _open_table(self, name, width, count, db, prefix) -> FixedWidthTable:
+        """Open the memory mapped table of `count` records copied from the
+        `prefix` rows of `db`. The DB is the reference, the table is rebuilt
+        from it when its last record does not match, after it was created or
+        a crash lost writes that were not synced."""
+        table = FixedWidthTable(os.path.join(self.env.db_dir, name), width, count)
+        if not count or table[count - 1] == db.get(prefix + util.pack_be_uint64(count - 1)):
+            return table
+        start = time.perf_counter()
+        self.logger.info(f'building {name} table of {count:,d} records')
+        table.truncate(0)
+        table.extend(db.iterator(prefix=prefix, include_key=False))
+        assert len(table) == count, f"{len(table)} vs {count}"
+        table.flush()
+        self.logger.info(f'built {name} table in {time.perf_counter() - start:.1f}s')
+        return table
+
     async def _read_txids(self):
-        def get_txids():
-            return list(self.tx_db.iterator(prefix=TX_HASH_PREFIX, include_key=False))
+        def open_table():
+            tx_count = self.tx_counts[-1] if self.tx_counts else 0
+            return self._open_table('tx_hashes', 32, tx_count, self.tx_db, TX_HASH_PREFIX)
 
-        start = time.perf_counter()
-        self.logger.info("loading txids")
-        txids = await asyncio.get_event_loop().run_in_executor(self.executor, get_txids)
-        assert len(txids) == len(self.tx_counts) == 0 or len(txids) == self.tx_counts[-1]
-        self.total_transactions = txids
-        ts = time.perf_counter() - start
-        self.logger.info("loaded %i txids in %ss", len(self.total_transactions), round(ts, 4))
+        self.total_transactions = await asyncio.get_event_loop().run_in_executor(self.executor, open_table)
+        self.logger.info("opened table of %i txids", len(self.total_transactions))
 
     async def _read_headers(self):
         if self.headers is not None:
             return
 
-        def get_headers():
-            return [
-                header for header in self.headers_db.iterator(prefix=HEADER_PREFIX, include_key=False)
-            ]
+        def open_table():
+            return self._open_table(
+                'headers', self.coin.BASIC_HEADER_SIZE, self.db_height + 1, self.headers_db, HEADER_PREFIX
+            )
 
-        headers = await asyncio.get_event_loop().run_in_executor(self.executor, get_headers)
-        assert len(headers) - 1 == self.db_height, f"{len(headers)} vs {self.db_height}"
-        self.headers = headers
+        self.headers = await asyncio.get_event_loop().run_in_executor(self.executor, open_table)
 
     async def _open_dbs(self, for_sync, compacting):
         if self.executor is None:
@@ -191,6 +255,11 @@ class LevelDB:
         self.tx_db.close()
         self.executor.shutdown(wait=True)
         self.executor = None
+        # closing the tables flushes them and releases their maps
+        self.total_transactions.close()
+        self.total_transactions = None
+        self.headers.close()
+        self.headers = None
 
     async def open_for_compacting(self):
         await self._open_dbs(True, True)
@@ -253,7 +322,11 @@ class LevelDB:
 
     def flush_dbs(self, flush_data, flush_utxos, estimate_txs_remaining):
         """Flush out cached state.  History is always flushed; UTXOs are
-        flushed if flush_utxos."""
+        flushed if flush_utxos.
+
+        This can run in a background thread while the block processor
+        advances past flush_data.height, in which case flush_data holds
+        a generation of state the block processor no longer changes."""
         if flush_data.height == self.db_height:
             self.assert_flushed(flush_data)
             return
@@ -266,13 +339,17 @@ class LevelDB:
         self.flush_fs(flush_data)
 
         # Then history
-        self.flush_history()
+        self.flush_history(flush_data.history)
 
         # Flush state last as it reads the wall time.
         with self.utxo_db.write_batch() as batch:
             if flush_utxos:
                 self.flush_utxo_db(batch, flush_data)
             self.flush_state(batch)
+        # The block processor may look up UTXOs of a background flush
+        # until they are committed.
+        if flush_utxos:
+            flush_data.adds.clear()
 
         # Update and put the wall time again - otherwise we drop the
         # time it took to commit the batch
@@ -305,9 +382,10 @@ class LevelDB:
                           if self.fs_height >= 0 else 0)
         assert len(flush_data.block_txs) == len(flush_data.headers)
         assert flush_data.height == self.fs_height + len(flush_data.headers)
-        assert flush_data.tx_count == (self.tx_counts[-1] if self.tx_counts
-                                       else 0)
-        assert len(self.tx_counts) == flush_data.height + 1
+        # tx_counts can be ahead when flushing in the background
+        assert flush_data.tx_count == (self.tx_counts[flush_data.height]
+                                       if self.tx_counts else 0)
+        assert len(self.tx_counts) >= flush_data.height + 1
         assert len(
             b''.join(hashes for hashes, _ in flush_data.block_txs)
         ) // 32 == flush_data.tx_count - prior_tx_count
@@ -320,6 +398,7 @@ class LevelDB:
             for i, header in enumerate(flush_data.headers):
                 batch_put(HEADER_PREFIX + util.pack_be_uint64(self.fs_height + i + 1), header)
                 self.headers.append(header)
+        self.headers.flush(self.fs_height + 1)
         flush_data.headers.clear()
 
         height_start = self.fs_height + 1
@@ -340,6 +419,8 @@ class LevelDB:
                     tx_num += 1
                     offset += 32
 
+        # the tx hashes were appended to the table when the blocks were advanced
+        self.total_transactions.flush(prior_tx_count)
         flush_data.block_txs.clear()
         flush_data.block_hashes.clear()
 
@@ -348,8 +429,8 @@ class LevelDB:
         elapsed = time.perf_counter() - start_time
         self.logger.info(f'flushed filesystem data in {elapsed:.2f}s')
 
-    def flush_history(self):
-        self.history.flush()
+    def flush_history(self, unflushed=None):
+        self.history.flush(unflushed)
 
     def flush_utxo_db(self, batch, flush_data):
         """Flush the cached DB writes and UTXO set to the batch."""
@@ -374,7 +455,6 @@ class LevelDB:
             suffix = key[-2:] + value[-12:-8]
             batch_put(b'h' + key[:4] + suffix, hashX)
             batch_put(b'u' + hashX + suffix, value[-8:])
-        flush_data.adds.clear()
 
         # New undo information
         self.flush_undo_infos(batch_put, flush_data.undo_infos)
@@ -418,6 +498,7 @@ class LevelDB:
             self.flush_utxo_db(batch, flush_data)
             # Flush state last as it reads the wall time.
             self.flush_state(batch)
+        flush_data.adds.clear()
 
         elapsed = self.last_flush - start_time
         self.logger.info(f'backup flush #{self.history.flush_count:,d} took '
@@ -456,7 +537,7 @@ class LevelDB:
 
         disk_count = max(0, min(count, self.db_height + 1 - start_height))
         if disk_count:
-            return b''.join(self.headers[start_height:start_height + disk_count]), disk_count
+            return self.headers.join(start_height, start_height + disk_count), disk_count
         return b'', 0
 
     def fs_tx_hash(self, tx_num):
@@ -496,8 +577,10 @@ class LevelDB:
                     }
                 else:
                     tx_pos = tx_num - tx_counts[tx_height - 1]
-                    branch, root = self.merkle.branch_and_root(
-                        self.total_transactions[tx_counts[tx_height - 1]:tx_counts[tx_height]], tx_pos
+                    first, last = tx_counts[tx_height - 1], tx_counts[tx_height]
+                    branch, root = self.block_merkle_branch(
+                        tx_height, self.coin.header_hash(self.headers[tx_height]),
+                        lambda: self.total_transactions[first:last], tx_pos
                     )
                     merkle = {
                         'block_height': tx_height,
@@ -512,6 +595,18 @@ class LevelDB:
             tx_infos[tx_hash] = (None if not tx else tx.hex(), merkle)
         return tx_infos
 
+    def block_merkle_branch(self, height, block_hash, get_tx_hashes, tx_pos):
+        """Return the (merkle branch, merkle root) pair of the tx at tx_pos in a
+        block. The levels of the block's merkle tree are built from
+        get_tx_hashes() once and cached, so the branches of the other txs of the
+        block are read from them. Call from the DB executor."""
+        key = height, block_hash
+        levels = self._block_merkle_cache.get(key)
+        if levels is None:
+            levels = self.merkle.levels(get_tx_hashes())
+            self._block_merkle_cache[key] = levels
+        return self.merkle.branch_and_root_from_levels(levels, tx_pos)
+
     async def fs_transactions(self, txids):
         return await asyncio.get_event_loop().run_in_executor(self.executor, self._fs_transactions, txids)
 
@@ -529,34 +624,96 @@ class LevelDB:
         """
 
         def read_history():
-            db_height = self.db_height
             tx_counts = self.tx_counts
+            tx_nums, _ = self.history.get_txnums(hashX, end_tx_num=self.db_tx_count, limit=limit or None)
+            return [(tx_num, bisect_right(tx_counts, tx_num)) for tx_num in tx_nums]
+
+        history = await asyncio.get_event_loop().run_in_executor(self.executor, read_history)
+        return [(self.total_transactions[tx_num], tx_height) for (tx_num, tx_height) in history]
+
+    async def confirmed_status(self, hashX, limit=None, exportable=False):
+        """Return a sha256 hash object fed with the `tx_hash:height:`
+        entries of the confirmed history of an address, or None if it has
+        no confirmed history.
+
+        Only the first limit entries are hashed, the history sessions can
+        fetch is limited the same way.  Big addresses resume a saved hash
+        state so only transactions since the last call are read and hashed.
+        With exportable a `StatusHash` is returned for small addresses too,
+        it can be pickled to a front-end while hashlib objects can not.
+        """
 
-            cnt = 0
-            txs = []
+        def entries(tx_nums):
+            tx_counts = self.tx_counts
+            total_transactions = self.total_transactions
+            return ''.join(
+                f'{hash_to_hex_str(total_transactions[tx_num])}:{bisect_right(tx_counts, tx_num):d}:'
+                for tx_num in tx_nums
+            ).encode()
+
+        def read_status():
+            end_tx_num = self.db_tx_count
+            backup_count = self.history.backup_count
+            saved = self.history.get_status(hashX) if RESUMABLE else None
+            if saved is not None and limit is not None and saved[0] > limit:
+                saved = None
+            if saved is not None:
+                count, last_tx_num, state = saved
+                tx_nums, total = self.history.get_txnums(
+                    hashX, end_tx_num=end_tx_num, offset=count - 1,
+                    limit=None if limit is None else limit - count + 1
+                )
+                if tx_nums[:1] == [last_tx_num]:
+                    status_hash = StatusHash(state)
+                    tx_nums = tx_nums[1:]
+                    hashed = count
+                else:
+                    saved = None
+            if saved is None:
+                tx_nums, total = self.history.get_txnums(hashX, end_tx_num=end_tx_num, limit=limit)
+                if not total:
+                    return None
+                big = total >= STATUS_SAVE_MIN_TXS
+                status_hash = StatusHash() if RESUMABLE and (big or exportable) else hashlib.sha256()
+                hashed = 0
+            if tx_nums:
+                for tx_nums_chunk in util.chunks(tx_nums, 10000):
+                    status_hash.update(entries(tx_nums_chunk))
+                if isinstance(status_hash, StatusHash) and total >= STATUS_SAVE_MIN_TXS:
+                    self.history.put_status(
+                        hashX, hashed + len(tx_nums), tx_nums[-1], status_hash.state(), backup_count
+                    )
+            return status_hash
 
-            for hist in self.history.db.iterator(prefix=hashX, include_key=False):
-                a = array.array('I')
-                a.frombytes(hist)
-                for tx_num in a:
-                    tx_height = bisect_right(tx_counts, tx_num)
-                    if tx_height > db_height:
-                        return
-                    txs.append((tx_num, tx_height))
-                    cnt += 1
-                    if limit and cnt >= limit:
-                        break
-                if limit and cnt >= limit:
-                    break
-            return txs
+        return await asyncio.get_event_loop().run_in_executor(self.executor, read_status)
 
-        while True:
-            history = await asyncio.get_event_loop().run_in_executor(self.executor, read_history)
-            if history is not None:
-                return [(self.total_transactions[tx_num], tx_height) for (tx_num, tx_height) in history]
-            self.logger.warning(f'limited_history: tx hash '
-                                f'not found (reorg?), retrying...')
-            await sleep(0.25)
+    async def history_page(self, hashX, start_height=0, end_height=None, offset=0, limit=1000):
+        """Return a page of the history of an address in the height range
+        [start_height, end_height] as a list of (tx_hash, height) tuples,
+        earliest first, and the number of transactions in the range.
+
+        The page starts after the first offset transactions in the range
+        and has at most limit entries.  end_height defaults to the DB
+        height.
+        """
+
+        def read_page():
+            db_height = self.db_height
+            tx_counts = self.tx_counts
+            if end_height is not None:
+                last_height = min(end_height, db_height)
+            else:
+                last_height = db_height
+            if start_height > last_height:
+                return [], 0
+            start_tx_num = tx_counts[start_height - 1] if start_height > 0 else 0
+            tx_nums, count = self.history.get_txnums(
+                hashX, start_tx_num, tx_counts[last_height], offset, limit
+            )
+            return [(tx_num, bisect_right(tx_counts, tx_num)) for tx_num in tx_nums], count
+
+        page, count = await asyncio.get_event_loop().run_in_executor(self.executor, read_page)
+        return [(self.total_transactions[tx_num], tx_height) for tx_num, tx_height in page], count
 
     # -- Undo information
 
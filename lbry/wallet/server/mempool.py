@@ -7,10 +7,9 @@
 
 """Mempool handling."""
 import asyncio
-import itertools
 import time
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import defaultdict, deque
 from prometheus_client import Histogram
 
 import attr
@@ -63,6 +62,14 @@ class MemPoolAPI(ABC):
 
         hex_hashes is an iterable of hexadecimal hash strings."""
 
+    @abstractmethod
+    async def mempool_entries(self, hex_hashes):
+        """Query bitcoind for its mempool entries of the transactions with
+        the given hashes.  Transactions not in its mempool are returned as
+        None.
+
+        hex_hashes is an iterable of hexadecimal hash strings."""
+
     @abstractmethod
     async def lookup_utxos(self, prevouts):
         """Return a list of (hashX, value) pairs each prevout if unspent,
@@ -98,8 +105,14 @@ class MemPool:
     response to the calls in the external interface.  To that end we
     maintain the following maps:
 
-       tx:     tx_hash -> MemPoolTx
-       hashXs: hashX   -> set of all hashes of txs touching the hashX
+       tx:        tx_hash -> MemPoolTx
+       hashXs:    hashX   -> set of all hashes of txs touching the hashX
+       deltas:    hashX   -> unconfirmed balance change of the hashX
+       outputs:   hashX   -> {(tx_hash, tx_pos): value} of outputs paying to the hashX
+       prevouts:  hashX   -> set of prevouts spent by txs touching the hashX
+
+    The last three are updated as txs are accepted and evicted, so
+    lookups for an address don't have to go through its txs.
     """
 
     def __init__(self, coin, api, refresh_secs=1.0, log_status_secs=120.0):
@@ -109,6 +122,9 @@ class MemPool:
         self.logger = class_logger(__name__, self.__class__.__name__)
         self.txs = {}
         self.hashXs = defaultdict(set)  # None can be a key
+        self.deltas = defaultdict(int)
+        self.outputs = defaultdict(dict)
+        self.prevouts = defaultdict(set)
         self.cached_compact_histogram = []
         self.refresh_secs = refresh_secs
         self.log_status_secs = log_status_secs
@@ -117,6 +133,13 @@ class MemPool:
         self.wakeup = asyncio.Event()
         self.mempool_process_time_metric = mempool_process_time_metric
         self.notified_mempool_txs = set()
+        # With push notifications of new txs the daemon's mempool is only
+        # fetched when a block arrives or every `resync_secs`, other
+        # refreshes process the pushed hashes
+        self.push_mode = False
+        self.resync_secs = 30.0
+        self.resync_needed = True
+        self.pushed_hashes = set()
 
     async def _logging(self, synchronized_event):
         """Print regular logs of mempool stats."""
@@ -166,6 +189,89 @@ class MemPool:
         self.logger.info(f'compact fee histogram: {compact}')
         self.cached_compact_histogram = compact
 
+    def _add_tx(self, tx_hash, tx):
+        """Add an accepted tx to the mempool and the per hashX indexes."""
+        self.txs[tx_hash] = tx
+        for hashX, value in tx.in_pairs:
+            self.deltas[hashX] -= value
+        for tx_pos, (hashX, value) in enumerate(tx.out_pairs):
+            self.deltas[hashX] += value
+            self.outputs[hashX][(tx_hash, tx_pos)] = value
+        tx_hashXs = self._tx_hashXs(tx)
+        for hashX in tx_hashXs:
+            self.hashXs[hashX].add(tx_hash)
+            self.prevouts[hashX].update(tx.prevouts)
+        return tx_hashXs
+
+    def _remove_tx(self, tx_hash):
+        """Remove a tx from the mempool and undo its changes to the per hashX indexes."""
+        tx = self.txs.pop(tx_hash)
+        for hashX, value in tx.in_pairs:
+            self.deltas[hashX] += value
+        for tx_pos, (hashX, value) in enumerate(tx.out_pairs):
+            self.deltas[hashX] -= value
+            del self.outputs[hashX][(tx_hash, tx_pos)]
+        tx_hashXs = self._tx_hashXs(tx)
+        for hashX in tx_hashXs:
+            self.hashXs[hashX].remove(tx_hash)
+            # a prevout is spent by a single mempool tx
+            self.prevouts[hashX].difference_update(tx.prevouts)
+            if not self.hashXs[hashX]:
+                del self.hashXs[hashX]
+                del self.deltas[hashX]
+                self.outputs.pop(hashX, None)
+                del self.prevouts[hashX]
+            elif hashX in self.outputs and not self.outputs[hashX]:
+                del self.outputs[hashX]
+        return tx_hashXs
+
+    def replicate(self, added, removed, compact_histogram):
+        """Apply the txs added to and removed from the mempool of another
+        process since the last call, keeping a copy of it that is never
+        synchronized with the daemon."""
+        for tx_hash in removed:
+            self._remove_tx(tx_hash)
+        for tx_hash, tx in added.items():
+            self._add_tx(tx_hash, tx)
+        self.cached_compact_histogram = compact_histogram
+
+    @staticmethod
+    def _tx_hashXs(tx):
+        tx_hashXs = {hashX for hashX, value in tx.in_pairs}
+        tx_hashXs.update(hashX for hashX, value in tx.out_pairs)
+        return tx_hashXs
+
+    def _accept_transaction(self, tx_hash, tx, utxo_map, touched):
+        """Accept a transaction to the mempool if all its inputs can be
+        found in the existing mempool or a utxo_map from the DB.  The
+        prevouts it spends are removed from utxo_map, so a conflicting
+        transaction can't spend them again.
+
+        Returns True if it was accepted.
+        """
+        txs = self.txs
+        in_pairs = []
+        for prevout in tx.prevouts:
+            utxo = utxo_map.get(prevout)
+            if not utxo:
+                prev_hash, prev_index = prevout
+                prev_tx = txs.get(prev_hash)
+                if prev_tx is None or prev_index >= len(prev_tx.out_pairs):
+                    return False
+                utxo = prev_tx.out_pairs[prev_index]
+            in_pairs.append(utxo)
+
+        # Save the in_pairs, compute the fee and accept the TX
+        tx.in_pairs = tuple(in_pairs)
+        # Avoid negative fees if dealing with generation-like transactions
+        # because some in_parts would be missing
+        tx.fee = max(0, (sum(v for _, v in tx.in_pairs) -
+                         sum(v for _, v in tx.out_pairs)))
+        for prevout in tx.prevouts:
+            utxo_map.pop(prevout, None)
+        touched.update(self._add_tx(tx_hash, tx))
+        return True
+
     def _accept_transactions(self, tx_map, utxo_map, touched):
         """Accept transactions in tx_map to the mempool if all their inputs
         can be found in the existing mempool or a utxo_map from the
@@ -173,89 +279,108 @@ class MemPool:
 
         Returns an (unprocessed tx_map, unspent utxo_map) pair.
         """
-        hashXs = self.hashXs
-        txs = self.txs
-
         deferred = {}
-        unspent = set(utxo_map)
-        # Try to find all prevouts so we can accept the TX
+        # Try to find all prevouts so we can accept the TX, accepting it spends them
         for hash, tx in tx_map.items():
-            in_pairs = []
-            try:
-                for prevout in tx.prevouts:
-                    utxo = utxo_map.get(prevout)
-                    if not utxo:
-                        prev_hash, prev_index = prevout
-                        # Raises KeyError if prev_hash is not in txs
-                        utxo = txs[prev_hash].out_pairs[prev_index]
-                    in_pairs.append(utxo)
-            except KeyError:
+            if not self._accept_transaction(hash, tx, utxo_map, touched):
                 deferred[hash] = tx
-                continue
 
-            # Spend the prevouts
-            unspent.difference_update(tx.prevouts)
+        return deferred, utxo_map
 
-            # Save the in_pairs, compute the fee and accept the TX
-            tx.in_pairs = tuple(in_pairs)
-            # Avoid negative fees if dealing with generation-like transactions
-            # because some in_parts would be missing
-            tx.fee = max(0, (sum(v for _, v in tx.in_pairs) -
-                             sum(v for _, v in tx.out_pairs)))
-            txs[hash] = tx
+    def _accept_dependent_transactions(self, tx_map, utxo_map, touched):
+        """Accept deferred transactions spending outputs of other deferred
+        transactions, parents before children.
 
-            for hashX, value in itertools.chain(tx.in_pairs, tx.out_pairs):
-                touched.add(hashX)
-                hashXs[hashX].add(hash)
+        A tx becomes ready once all its parents in tx_map are accepted, so
+        each tx is tried once however long the chains of unconfirmed txs are.
 
-        return deferred, {prevout: utxo_map[prevout] for prevout in unspent}
+        Returns the number of transactions that could not be accepted.
+        """
+        children = defaultdict(list)
+        waiting = {}
+        ready = deque()
+        for tx_hash, tx in tx_map.items():
+            parents = {prev_hash for prev_hash, _ in tx.prevouts if prev_hash in tx_map}
+            for parent in parents:
+                children[parent].append(tx_hash)
+            waiting[tx_hash] = len(parents)
+            if not parents:
+                ready.append(tx_hash)
+
+        accepted = 0
+        while ready:
+            tx_hash = ready.popleft()
+            # the children of a tx that is not accepted never become ready
+            if not self._accept_transaction(tx_hash, tx_map[tx_hash], utxo_map, touched):
+                continue
+            accepted += 1
+            for child in children.pop(tx_hash, ()):
+                waiting[child] -= 1
+                if not waiting[child]:
+                    ready.append(child)
+        return len(tx_map) - accepted
 
     async def _refresh_hashes(self, synchronized_event):
         """Refresh our view of the daemon's mempool."""
         while True:
             start = time.perf_counter()
             height = self.api.cached_height()
-            hex_hashes = await self.api.mempool_hashes()
+            resync = self.resync_needed or not self.push_mode
+            if resync:
+                # hashes pushed so far are in the daemon's mempool, or left it
+                self.pushed_hashes.clear()
+                self.resync_needed = False
+                hex_hashes = await self.api.mempool_hashes()
             if height != await self.api.height():
+                self.resync_needed = self.resync_needed or resync
                 continue
-            hashes = {hex_str_to_hash(hh) for hh in hex_hashes}
+            pushed, self.pushed_hashes = self.pushed_hashes, set()
+            if resync:
+                hashes = {hex_str_to_hash(hh) for hh in hex_hashes}
+                hashes.update(await self._unconfirmed(pushed.difference(hashes)))
+            else:
+                hashes = (await self._unconfirmed(pushed.difference(self.txs))).union(self.txs)
             async with self.lock:
                 new_hashes = hashes.difference(self.notified_mempool_txs)
                 touched = await self._process_mempool(hashes)
                 self.notified_mempool_txs.update(new_hashes)
-                new_touched = {
-                    touched_hashx for touched_hashx, txs in self.hashXs.items() if txs.intersection(new_hashes)
-                }
+                new_touched = set()
+                for tx_hash in new_hashes:
+                    tx = self.txs.get(tx_hash)
+                    if tx is not None:
+                        new_touched.update(self._tx_hashXs(tx))
             synchronized_event.set()
             synchronized_event.clear()
             await self.api.on_mempool(touched, new_touched, height)
             duration = time.perf_counter() - start
             self.mempool_process_time_metric.observe(duration)
             try:
-                # we wait up to `refresh_secs` but go early if a broadcast happens (which triggers wakeup event)
-                await asyncio.wait_for(self.wakeup.wait(), timeout=self.refresh_secs)
+                # we wait up to `refresh_secs` but go early if a broadcast or a push happens (which triggers wakeup event)
+                await asyncio.wait_for(
+                    self.wakeup.wait(), timeout=self.resync_secs if self.push_mode else self.refresh_secs
+                )
             except asyncio.TimeoutError:
-                pass
+                self.resync_needed = True
             finally:
                 self.wakeup.clear()
 
+    async def _unconfirmed(self, pushed):
+        """The pushed txs which are in the daemon's mempool.  The daemon also
+        pushes the txs of a block it connects, they must not be added back."""
+        if not pushed:
+            return set()
+        pushed = list(pushed)
+        entries = await self.api.mempool_entries(hash_to_hex_str(tx_hash) for tx_hash in pushed)
+        return {tx_hash for tx_hash, entry in zip(pushed, entries) if entry is not None}
+
     async def _process_mempool(self, all_hashes):
         # Re-sync with the new set of hashes
         txs = self.txs
-
-        hashXs = self.hashXs  # hashX: [tx_hash, ...]
         touched = set()
 
         # First handle txs that have disappeared
         for tx_hash in set(txs).difference(all_hashes):
-            tx = txs.pop(tx_hash)
-            tx_hashXs = {hashX for hashX, value in tx.in_pairs}
-            tx_hashXs.update(hashX for hashX, value in tx.out_pairs)
-            for hashX in tx_hashXs:
-                hashXs[hashX].remove(tx_hash)
-                if not hashXs[hashX]:
-                    del hashXs[hashX]
-            touched.update(tx_hashXs)
+            touched.update(self._remove_tx(tx_hash))
 
         # Process new transactions
         new_hashes = list(all_hashes.difference(txs))
@@ -270,14 +395,9 @@ class MemPool:
                 tx_map.update(deferred)
                 utxo_map.update(unspent)
 
-            prior_count = 0
-            # FIXME: this is not particularly efficient
-            while tx_map and len(tx_map) != prior_count:
-                prior_count = len(tx_map)
-                tx_map, utxo_map = self._accept_transactions(tx_map, utxo_map, touched)
-
-            if tx_map:
-                self.logger.info(f'{len(tx_map)} txs dropped')
+            dropped = self._accept_dependent_transactions(tx_map, utxo_map, touched) if tx_map else 0
+            if dropped:
+                self.logger.info(f'{dropped} txs dropped')
 
         return touched
 
@@ -331,18 +451,22 @@ class MemPool:
             self._logging(synchronized_event)
         ])
 
+    def push_tx_hashes(self, tx_hashes):
+        """Process transactions the daemon pushed without waiting for the next refresh."""
+        self.pushed_hashes.update(tx_hashes)
+        self.wakeup.set()
+
+    def resync(self):
+        """Fetch the daemon's whole mempool on the next refresh, after a block or missed pushes."""
+        self.resync_needed = True
+        self.wakeup.set()
+
     async def balance_delta(self, hashX):
         """Return the unconfirmed amount in the mempool for hashX.
 
         Can be positive or negative.
         """
-        value = 0
-        if hashX in self.hashXs:
-            for hash in self.hashXs[hashX]:
-                tx = self.txs[hash]
-                value -= sum(v for h168, v in tx.in_pairs if h168 == hashX)
-                value += sum(v for h168, v in tx.out_pairs if h168 == hashX)
-        return value
+        return self.deltas.get(hashX, 0)
 
     async def compact_fee_histogram(self):
         """Return a compact fee histogram of the current mempool."""
@@ -355,11 +479,7 @@ class MemPool:
         None, some or all of these may be spends of the hashX, but all
         actual spends of it (in the DB or mempool) will be included.
         """
-        result = set()
-        for tx_hash in self.hashXs.get(hashX, ()):
-            tx = self.txs[tx_hash]
-            result.update(tx.prevouts)
-        return result
+        return set(self.prevouts.get(hashX, ()))
 
     def transaction_summaries(self, hashX):
         """Return a list of MemPoolTxSummary objects for the hashX."""
@@ -377,13 +497,10 @@ class MemPool:
         This does not consider if any other mempool transactions spend
         the outputs.
         """
-        utxos = []
-        for tx_hash in self.hashXs.get(hashX, ()):
-            tx = self.txs.get(tx_hash)
-            for pos, (hX, value) in enumerate(tx.out_pairs):
-                if hX == hashX:
-                    utxos.append(UTXO(-1, pos, tx_hash, 0, value))
-        return utxos
+        return [
+            UTXO(-1, pos, tx_hash, 0, value)
+            for (tx_hash, pos), value in self.outputs.get(hashX, {}).items()
+        ]
 
     def get_mempool_height(self, tx_hash):
         # Height Progression
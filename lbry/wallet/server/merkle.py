@@ -114,6 +114,36 @@ class Merkle:
             raise ValueError('index out of range for branch')
         return hash
 
+    def levels(self, hashes):
+        """Return every level of the merkle tree of hashes, the hashes first
+        and the root last. Levels of odd length are padded with their last
+        hash, as when calculating the next level up."""
+        hash_func = self.hash_func
+        level = list(hashes)
+        if not level:
+            raise ValueError('hashes must not be empty')
+        levels = []
+        while len(level) > 1:
+            if len(level) & 1:
+                level.append(level[-1])
+            levels.append(level)
+            level = [hash_func(level[n] + level[n + 1])
+                     for n in range(0, len(level), 2)]
+        levels.append(level)
+        return levels
+
+    @staticmethod
+    def branch_and_root_from_levels(levels, index):
+        """Return a (merkle branch, merkle_root) pair from the levels of a
+        tree built with levels(), without hashing anything."""
+        if not 0 <= index < len(levels[0]):
+            raise ValueError(f"index '{index}/{len(levels[0])}' out of range")
+        branch = []
+        for level in levels[:-1]:
+            branch.append(level[index ^ 1])
+            index >>= 1
+        return branch, levels[-1][0]
+
     def level(self, hashes, depth_higher):
         """Return a level of the merkle tree of hashes the given depth
         higher than the bottom row of the original tree."""
@@ -0,0 +1,179 @@
+import time
+import typing
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class NotificationBatch:
+    """The sessions still to be sent the statuses of one set of touched addresses."""
+
+    __slots__ = ('started', 'sessions', 'sealed', 'latency_metric')
+
+    def __init__(self, started: float, latency_metric=None):
+        self.started = started
+        self.sessions = 0
+        self.sealed = False
+        self.latency_metric = latency_metric
+
+    def seal(self):
+        """Called once all statuses of the batch were queued."""
+        self.sealed = True
+        self._maybe_done()
+
+    def session_done(self):
+        self.sessions -= 1
+        self._maybe_done()
+
+    def _maybe_done(self):
+        if self.sealed and self.sessions == 0 and self.latency_metric is not None:
+            self.latency_metric.observe(time.perf_counter() - self.started)
+            self.latency_metric = None
+
+
+class AddressNotifier:
+    """
+    Sends address status notifications to the subscribed sessions.
+
+    `notify` queues touched addresses, a single task computes the status of each of them
+    once and fans it out to every session subscribed to the address. Statuses are queued
+    per session and a session's queue is sent as one write, so a session subscribed to
+    many touched addresses gets one burst instead of a task and a write per address.
+
+    While a session's transport is paused its sender waits, and newer statuses of the same
+    addresses replace the queued ones, so a slow client holds at most one pending status
+    per subscription. A session paused for longer than its `max_send_delay` is aborted.
+
+    The latency metric observes the time from `started` (when the block began processing)
+    to the last write of the statuses it touched.
+    """
+
+    def __init__(self, get_status: typing.Callable[[bytes], typing.Awaitable[typing.Optional[str]]],
+                 subscribers: typing.Callable[[bytes], typing.Iterable[int]],
+                 get_session: typing.Callable[[int], typing.Any],
+                 latency_metric=None, status_time_metric=None, send_time_metric=None, in_flight_metric=None):
+        self.get_status = get_status
+        self.subscribers = subscribers
+        self.get_session = get_session
+        self.latency_metric = latency_metric
+        self.status_time_metric = status_time_metric
+        self.send_time_metric = send_time_metric
+        self.in_flight_metric = in_flight_metric
+        self._touched: typing.Set[bytes] = set()
+        self._started: typing.Optional[float] = None
+        self._event = asyncio.Event()
+        self._pending: typing.Dict[int, typing.Dict[bytes, typing.Optional[str]]] = {}
+        self._pending_batches: typing.Dict[int, typing.Set[NotificationBatch]] = {}
+        self._senders: typing.Dict[int, asyncio.Task] = {}
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for sender in self._senders.values():
+            sender.cancel()
+        self._senders.clear()
+
+    def notify(self, touched: typing.Iterable[bytes], started: float):
+        """Queue touched addresses, their statuses are computed and sent in the background."""
+        before = len(self._touched)
+        self._touched.update(touched)
+        if len(self._touched) == before:
+            return
+        if self._started is None or started < self._started:
+            self._started = started
+        self._event.set()
+
+    def pending_count(self) -> int:
+        return sum(len(pending) for pending in self._pending.values())
+
+    async def _run(self):
+        while True:
+            await self._event.wait()
+            self._event.clear()
+            touched, self._touched = self._touched, set()
+            batch = NotificationBatch(self._started, self.latency_metric)
+            self._started = None
+            try:
+                await self._fan_out(touched, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception('failed to notify touched addresses')
+            finally:
+                batch.seal()
+
+    async def _fan_out(self, touched: typing.Set[bytes], batch: NotificationBatch):
+        notified_hashxs = notified_sessions = 0
+        for hashX in touched:
+            if not self.subscribers(hashX):
+                continue
+            start = time.perf_counter()
+            try:
+                status = await self.get_status(hashX)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # the other touched addresses are still notified
+                log.exception('failed to get the status of touched address %s', hashX.hex())
+                continue
+            if self.status_time_metric is not None:
+                self.status_time_metric.observe(time.perf_counter() - start)
+            # the subscribers are read again, sessions may have left while the status was computed
+            session_ids = tuple(self.subscribers(hashX))
+            for session_id in session_ids:
+                self._queue(session_id, hashX, status, batch)
+            notified_sessions += len(session_ids)
+            notified_hashxs += 1
+        if notified_sessions:
+            log.info('notified %i sessions/%i touched addresses', notified_sessions, notified_hashxs)
+
+    def _queue(self, session_id: int, hashX: bytes, status: typing.Optional[str], batch: NotificationBatch):
+        pending = self._pending.setdefault(session_id, {})
+        if hashX not in pending and self.in_flight_metric is not None:
+            self.in_flight_metric.inc()
+        pending[hashX] = status
+        batches = self._pending_batches.setdefault(session_id, set())
+        if batch not in batches:
+            batches.add(batch)
+            batch.sessions += 1
+        if session_id not in self._senders:
+            self._senders[session_id] = asyncio.create_task(self._send(session_id))
+
+    def _take(self, session_id: int):
+        pending = self._pending.pop(session_id, {})
+        batches = self._pending_batches.pop(session_id, set())
+        if pending and self.in_flight_metric is not None:
+            self.in_flight_metric.dec(len(pending))
+        return pending, batches
+
+    async def _send(self, session_id: int):
+        try:
+            while self._pending.get(session_id):
+                session = self.get_session(session_id)
+                if session is None or session.is_closing():
+                    break
+                # statuses keep coalescing in the queue while the transport is paused
+                await session.wait_until_writable()
+                pending, batches = self._take(session_id)
+                start = time.perf_counter()
+                try:
+                    await session.send_history_notifications(pending)
+                finally:
+                    for batch in batches:
+                        batch.session_done()
+                if self.send_time_metric is not None:
+                    self.send_time_metric.observe(time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if self._senders.get(session_id) is asyncio.current_task():
+                self._senders.pop(session_id)
+            if session_id not in self._senders:
+                for batch in self._take(session_id)[1]:
+                    batch.session_done()
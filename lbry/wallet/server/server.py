@@ -6,6 +6,9 @@ import typing
 
 import lbry
 from lbry.wallet.server.mempool import MemPool, MemPoolAPI
+from lbry.wallet.server.hash import hash_to_hex_str
+from lbry.wallet.server.zmtp import ZMQSubscriber
+from lbry.wallet.server.frontend import FrontEndHub
 from lbry.prometheus import PrometheusServer
 
 
@@ -74,7 +77,10 @@ class Server:
         self.cancellable_tasks = []
 
         self.notifications = notifications = Notifications()
-        self.daemon = daemon = env.coin.DAEMON(env.coin, env.daemon_url)
+        self.daemon = daemon = env.coin.DAEMON(
+            env.coin, env.daemon_url, max_workqueue=env.daemon_max_connections,
+            batch_target_secs=env.daemon_batch_target_ms / 1000
+        )
         self.db = db = env.coin.DB(env)
         self.bp = bp = env.coin.BLOCK_PROCESSOR(env, db, daemon, notifications)
         self.prometheus_server: typing.Optional[PrometheusServer] = None
@@ -84,6 +90,7 @@ class Server:
         notifications.cached_height = daemon.cached_height
         notifications.mempool_hashes = daemon.mempool_hashes
         notifications.raw_transactions = daemon.getrawtransactions
+        notifications.mempool_entries = daemon.mempool_entries
         notifications.lookup_utxos = db.lookup_utxos
 
         MemPoolAPI.register(Notifications)
@@ -95,6 +102,46 @@ class Server:
             env, db, bp, daemon, mempool, self.shutdown_event
         )
 
+        # Optional front-end processes serving the sessions
+        self.front_ends: typing.Optional[FrontEndHub] = None
+        if env.front_end_processes:
+            self.front_ends = self.session_mgr.front_end_hub = FrontEndHub(env, db, bp, daemon, mempool)
+
+        # Optional push notifications of new txs and blocks, polling is the fallback
+        self.push_subscriber: typing.Optional[ZMQSubscriber] = None
+        self.push_sequences = {}
+        self.raw_blocks_pushed = False
+        if env.daemon_zmq_url:
+            self.push_subscriber = ZMQSubscriber(
+                env.daemon_zmq_url, (b'hashtx', b'hashblock', b'rawblock'), self._on_push, self._on_push_connection
+            )
+            mempool.resync_secs = env.mempool_resync_secs
+
+    def _on_push_connection(self, connected):
+        self.mempool.push_mode = connected
+        self.push_sequences.clear()
+        self.mempool.resync()
+        self.bp.prefetcher.wakeup.set()
+
+    def _on_push(self, topic, body, sequence):
+        last = self.push_sequences.get(topic)
+        self.push_sequences[topic] = sequence
+        if None not in (last, sequence) and sequence != (last + 1) & 0xffffffff:
+            self.log.warning(f'missed {topic.decode()} notifications, resyncing the mempool')
+            self.mempool.resync()
+        if topic == b'hashtx':
+            # also pushed for the txs of a connected block (before the block), the mempool
+            # only adds the pushed txs which are still in the daemon's mempool
+            self.mempool.push_tx_hashes((body[::-1],))
+        elif topic == b'rawblock':
+            self.raw_blocks_pushed = True
+            header = self.env.coin.block_header(body, 0)
+            self.bp.prefetcher.push_block(hash_to_hex_str(self.env.coin.header_hash(header)), body)
+            self.mempool.resync()
+        elif topic == b'hashblock' and not self.raw_blocks_pushed:
+            self.bp.prefetcher.push_block(body.hex())
+            self.mempool.resync()
+
     async def start(self):
         env = self.env
         min_str, max_str = env.coin.SESSIONCLS.protocol_min_max_strings()
@@ -113,10 +160,16 @@ class Server:
         await _start_cancellable(self.bp.fetch_and_process_blocks)
         await self.db.populate_header_merkle_cache()
         await _start_cancellable(self.mempool.keep_synchronized)
+        if self.push_subscriber is not None:
+            self.cancellable_tasks.append(asyncio.ensure_future(self.push_subscriber.run()))
         await _start_cancellable(self.session_mgr.serve, self.notifications)
+        if self.front_ends is not None:
+            await self.front_ends.start()
         await self.start_prometheus()
 
     async def stop(self):
+        if self.front_ends is not None:
+            await self.front_ends.stop()
         for task in reversed(self.cancellable_tasks):
             task.cancel()
         await asyncio.wait(self.cancellable_tasks)
@@ -3,9 +3,9 @@ import ssl
 import math
 import time
 import json
-import zlib
 import base64
 import codecs
+import hashlib
 import typing
 import asyncio
 import logging
@@ -21,13 +21,18 @@ from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from prometheus_client import Counter, Info, Histogram, Gauge
 
 import lbry
-from lbry.utils import LRUCache
 from lbry.build_info import BUILD, COMMIT_HASH, DOCKER_TAG
 from lbry.wallet.server.block_processor import LBRYBlockProcessor
 from lbry.wallet.server.db.writer import LBRYLevelDB
 from lbry.wallet.server.db import reader
+from lbry.wallet.server.db.reader_pool import ReaderThreadPool, QUERY_PRIORITIES, DEFAULT_PRIORITY, to_base64
 from lbry.wallet.server.websocket import AdminWebSocket
 from lbry.wallet.server.metrics import ServerLoadData, APICallMetrics
+from lbry.wallet.server.front_page import FrontPage
+from lbry.wallet.server.admission import SearchAdmission, QueryRejectedError
+from lbry.wallet.server.cache import ResultCache, ResultCacheItem, canonical_cache_key
+from lbry.wallet.server.notifier import AddressNotifier
+from lbry.wallet.server.chunks import HeaderChunks
 from lbry.wallet.rpc.framing import NewlineFramer
 import lbry.wallet.server.version as VERSION
 
@@ -37,13 +42,14 @@ from lbry.wallet.rpc import (
 )
 from lbry.wallet.server import text
 from lbry.wallet.server import util
-from lbry.wallet.server.hash import sha256, hash_to_hex_str, hex_str_to_hash, HASHX_LEN, Base58Error
+from lbry.wallet.server.hash import hash_to_hex_str, hex_str_to_hash, HASHX_LEN, Base58Error
 from lbry.wallet.server.daemon import DaemonError
 from lbry.wallet.server.peers import PeerManager
 if typing.TYPE_CHECKING:
     from lbry.wallet.server.env import Env
     from lbry.wallet.server.mempool import MemPool
     from lbry.wallet.server.daemon import Daemon
+    from lbry.wallet.server.frontend import FrontEndHub
 
 BAD_REQUEST = 1
 DAEMON_ERROR = 2
@@ -159,6 +165,10 @@ class SessionManager:
     pending_query_metric = Gauge(
         "pending_queries_count", "Number of pending and running sqlite queries", namespace=NAMESPACE
     )
+    abandoned_query_metric = Counter(
+        "abandoned_query_count", "Number of running queries interrupted after their request was cancelled",
+        namespace=NAMESPACE
+    )
 
     client_version_metric = Counter(
         "clients", "Number of connections received per client version",
@@ -173,7 +183,44 @@ class SessionManager:
         namespace=NAMESPACE
     )
     notifications_sent_metric = Histogram(
-        "notifications_sent", "Time to send an address notification",
+        "notifications_sent", "Time to send the address notifications queued for a session",
+        namespace=NAMESPACE, buckets=HISTOGRAM_BUCKETS
+    )
+    notification_latency_metric = Histogram(
+        "notification_latency", "Time from a block arriving to the last notification of its touched addresses",
+        namespace=NAMESPACE, buckets=HISTOGRAM_BUCKETS
+    )
+    query_cache_hit_metric = Counter(
+        "query_cache_hit_count", "Number of query results served from cache",
+        namespace=NAMESPACE, labelnames=("query",)
+    )
+    query_cache_miss_metric = Counter(
+        "query_cache_miss_count", "Number of query results missing from cache",
+        namespace=NAMESPACE, labelnames=("query",)
+    )
+    query_cache_eviction_metric = Counter(
+        "query_cache_eviction_count", "Number of query results evicted from cache to free space",
+        namespace=NAMESPACE, labelnames=("query",)
+    )
+    query_cache_size_metric = Gauge(
+        "query_cache_size", "Size in bytes of cached query results",
+        namespace=NAMESPACE, labelnames=("query",)
+    )
+    query_admission_metric = Counter(
+        "query_admission_count", "Number of expensive searches degraded, queued or rejected while busy",
+        namespace=NAMESPACE, labelnames=("action",)
+    )
+    front_page_hit_metric = Counter(
+        "front_page_hit_count", "Number of searches answered with precomputed results", namespace=NAMESPACE
+    )
+    front_page_miss_metric = Counter(
+        "front_page_miss_count", "Number of searches without precomputed results", namespace=NAMESPACE
+    )
+    front_page_size_metric = Gauge(
+        "front_page_pages", "Number of precomputed search result pages", namespace=NAMESPACE
+    )
+    front_page_refresh_metric = Histogram(
+        "front_page_refresh_time", "Time to precompute search results after a block",
         namespace=NAMESPACE, buckets=HISTOGRAM_BUCKETS
     )
 
@@ -201,6 +248,17 @@ class SessionManager:
         self.subs_room = 0
 
         self.session_event = Event()
+        self.address_notifier = AddressNotifier(
+            self.address_status, self._subscribed_sessions, self.sessions.get,
+            latency_metric=self.notification_latency_metric, status_time_metric=self.address_history_metric,
+            send_time_metric=self.notifications_sent_metric, in_flight_metric=self.notifications_in_flight_metric
+        )
+        self.header_chunks = HeaderChunks(self.db.read_headers, self.env.coin.BASIC_HEADER_SIZE)
+        self._header_chunks_task: typing.Optional[asyncio.Future] = None
+        # with front-end processes the writer's sessions are only local RPC ones,
+        # the hub passes its notifications on to the front-ends
+        self.serves_clients = not self.env.front_end_processes
+        self.front_end_hub: typing.Optional['FrontEndHub'] = None
 
     async def _start_server(self, kind, *args, **kw_args):
         loop = asyncio.get_event_loop()
@@ -226,12 +284,14 @@ class SessionManager:
         """
         env = self.env
         host = env.cs_host(for_rpc=False)
+        # front-end processes share the ports, the kernel spreads connections among them
+        reuse_port = bool(env.front_end_processes)
         if env.tcp_port is not None:
-            await self._start_server('TCP', host, env.tcp_port)
+            await self._start_server('TCP', host, env.tcp_port, reuse_port=reuse_port)
         if env.ssl_port is not None:
             sslc = ssl.SSLContext(ssl.PROTOCOL_TLS)
             sslc.load_cert_chain(env.ssl_certfile, keyfile=env.ssl_keyfile)
-            await self._start_server('SSL', host, env.ssl_port, ssl=sslc)
+            await self._start_server('SSL', host, env.ssl_port, ssl=sslc, reuse_port=reuse_port)
 
     async def _close_servers(self, kinds):
         """Close the servers of the given kinds (TCP etc.)."""
@@ -426,6 +486,14 @@ class SessionManager:
         electrum, raw = await self._electrum_and_raw_headers(height)
         self.hsub_results = (electrum, {'hex': raw.hex(), 'height': height})
         self.notified_height = height
+        if self.serves_clients:
+            self._extend_header_chunks()
+
+    def _extend_header_chunks(self):
+        """Compress the header chunks completed by new blocks in a thread,
+        unless it is already running, the next block picks up what it missed."""
+        if self._header_chunks_task is None or self._header_chunks_task.done():
+            self._header_chunks_task = asyncio.get_event_loop().run_in_executor(None, self.header_chunks.extend)
 
     # --- LocalRPC command handlers
 
@@ -568,9 +636,11 @@ class SessionManager:
             if self.env.drop_client is not None:
                 self.logger.info(f'drop clients matching: {self.env.drop_client.pattern}')
             # Start notifications; initialize hsub_results
+            self.address_notifier.start()
             await notifications.start(self.db.db_height, self._notify_sessions)
             await self.start_other()
-            await self._start_external_servers()
+            if self.serves_clients:
+                await self._start_external_servers()
             server_listening_event.set()
             # Peer discovery should start after the external servers
             # because we connect to ourself
@@ -581,6 +651,7 @@ class SessionManager:
                 self._manage_servers()
             ])
         finally:
+            self.address_notifier.stop()
             await self._close_servers(list(self.servers.keys()))
             if self.sessions:
                 await asyncio.wait([
@@ -623,19 +694,24 @@ class SessionManager:
         self.txs_sent += 1
         return hex_hash
 
+    @property
+    def history_limit(self) -> int:
+        # History DoS limit.  Each element of history is about 99
+        # bytes when encoded as JSON.  This limits resource usage
+        # on bloated history requests, and uses a smaller divisor
+        # so large requests are logged before refusing them.
+        return self.env.max_send // 97
+
     async def limited_history(self, hashX):
         """A caching layer."""
         if hashX not in self.history_cache:
-            # History DoS limit.  Each element of history is about 99
-            # bytes when encoded as JSON.  This limits resource usage
-            # on bloated history requests, and uses a smaller divisor
-            # so large requests are logged before refusing them.
-            limit = self.env.max_send // 97
-            self.history_cache[hashX] = await self.db.limited_history(hashX, limit=limit)
+            self.history_cache[hashX] = await self.db.limited_history(hashX, limit=self.history_limit)
         return self.history_cache[hashX]
 
     async def _notify_sessions(self, height, touched, new_touched):
         """Notify sessions about height changes and touched addresses."""
+        if self.front_end_hub is not None:
+            self.front_end_hub.notify(height, touched, new_touched)
         height_changed = height != self.notified_height
         if height_changed:
             await self._refresh_hsub_results(height)
@@ -657,16 +733,40 @@ class SessionManager:
         touched.intersection_update(self.hashx_subscriptions_by_session.keys())
 
         if touched or (height_changed and self.mempool_statuses):
-            notified_hashxs = 0
-            notified_sessions = 0
             to_notify = touched if height_changed else new_touched
-            for hashX in to_notify:
-                for session_id in self.hashx_subscriptions_by_session[hashX]:
-                    asyncio.create_task(self.sessions[session_id].send_history_notification(hashX))
-                    notified_sessions += 1
-                notified_hashxs += 1
-            if notified_sessions:
-                self.logger.info(f'notified {notified_sessions} sessions/{notified_hashxs:,d} touched addresses')
+            started = self.bp.blocks_received if height_changed else time.perf_counter()
+            self.address_notifier.notify(to_notify, started)
+
+    def _subscribed_sessions(self, hashX) -> typing.Set[int]:
+        return self.hashx_subscriptions_by_session.get(hashX, set())
+
+    async def address_status(self, hashX):
+        """Returns an address status.
+
+        Status is a hex string, but must be None if there is no history.
+        """
+        # Note history is ordered and mempool unordered in electrum-server
+        # For mempool, height is -1 if it has unconfirmed inputs, otherwise 0
+
+        # The confirmed part is hashed by the DB, which resumes saved
+        # hash states of big addresses.  It covers the same history as
+        # limited_history so clients can check it.
+        status_hash = await self.db.confirmed_status(hashX, limit=self.history_limit)
+        mempool = self.mempool.transaction_summaries(hashX)
+
+        if mempool:
+            if status_hash is None:
+                status_hash = hashlib.sha256()
+            status_hash.update(''.join(f'{hash_to_hex_str(tx.hash)}:'
+                                       f'{-tx.has_unconfirmed_inputs:d}:'
+                                       for tx in mempool).encode())
+        status = status_hash.hexdigest() if status_hash is not None else None
+
+        if mempool:
+            self.mempool_statuses[hashX] = status
+        else:
+            self.mempool_statuses.pop(hashX, None)
+        return status
 
     def add_session(self, session):
         self.sessions[id(session)] = session
@@ -803,6 +903,7 @@ class LBRYSessionManager(SessionManager):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.query_executor = None
+        self.explain_executor = None
         self.websocket = None
         self.metrics = ServerLoadData()
         self.metrics_loop = None
@@ -810,8 +911,63 @@ class LBRYSessionManager(SessionManager):
         if self.env.websocket_host is not None and self.env.websocket_port is not None:
             self.websocket = AdminWebSocket(self)
         self.search_cache = self.bp.search_cache
-        self.search_cache['search'] = LRUCache(2**14, metric_name='search', namespace=NAMESPACE)
-        self.search_cache['resolve'] = LRUCache(2**16, metric_name='resolve', namespace=NAMESPACE)
+        self.search_cache['search'] = self._make_query_cache('search', self.env.search_cache_MB)
+        self.search_cache['resolve'] = self._make_query_cache('resolve', self.env.resolve_cache_MB)
+        self.pending_queries = 0
+        self.admission = SearchAdmission(
+            self.env.busy_pending_queries, self.env.expensive_query_ms / 1000.0,
+            self.env.max_expensive_queries, self.env.max_queued_expensive_queries,
+            actions=self.query_admission_metric
+        )
+        self.front_page = None
+        # front-end processes can't share the pages precomputed by the writer
+        if self.env.front_page_queries and self.env.front_page_pages and not self.env.front_end_processes:
+            self.front_page = self.bp.front_page = FrontPage(
+                self.env.front_page_queries, self.env.front_page_pages,
+                hits=self.front_page_hit_metric, misses=self.front_page_miss_metric,
+                size=self.front_page_size_metric, refresh_time=self.front_page_refresh_metric
+            )
+        self._front_page_task: typing.Optional[asyncio.Task] = None
+        self._front_page_stale = asyncio.Event()
+
+    def _make_query_cache(self, query_name, max_MB):
+        return ResultCache(
+            max_MB * 1024 * 1024, self.env.query_cache_ttl,
+            hits=self.query_cache_hit_metric.labels(query=query_name),
+            misses=self.query_cache_miss_metric.labels(query=query_name),
+            evictions=self.query_cache_eviction_metric.labels(query=query_name),
+            size=self.query_cache_size_metric.labels(query=query_name)
+        )
+
+    async def run_reader(self, func, arg, priority: int = DEFAULT_PRIORITY):
+        if isinstance(self.query_executor, ReaderThreadPool):
+            return await self.query_executor.run(func, arg, priority=priority)
+        return await asyncio.get_running_loop().run_in_executor(self.query_executor, func, arg)
+
+    async def explain_search(self, constraints: dict) -> typing.List[str]:
+        # asked for when the reader pool is busy, so the plans are made on a connection of their own
+        return await asyncio.get_running_loop().run_in_executor(
+            self.explain_executor, reader.explain_search, constraints
+        )
+
+    async def search_front_page(self, constraints: dict) -> bytes:
+        # behind the searches of sessions, the pages only need to be ready before the next block
+        result = await self.run_reader(reader.search_to_bytes, constraints, DEFAULT_PRIORITY)
+        return result[0] if self.env.track_metrics else result
+
+    async def _refresh_hsub_results(self, height):
+        await super()._refresh_hsub_results(height)
+        if self.front_page is not None:
+            # pages of the previous block are not served, they are recomputed by _refresh_front_page
+            self.front_page.clear()
+            self._front_page_stale.set()
+
+    async def _refresh_front_page(self):
+        while True:
+            await self._front_page_stale.wait()
+            self._front_page_stale.clear()
+            # a block notified during the refresh clears the pages and sets the event again
+            await self.front_page.refresh(self.search_front_page)
 
     async def process_metrics(self):
         while self.running:
@@ -823,8 +979,25 @@ class LBRYSessionManager(SessionManager):
                 self.websocket.send_message(data)
             await asyncio.sleep(1)
 
+    @property
+    def query_workers(self) -> int:
+        """The number of readers, with front-end processes each gets its share of them."""
+        workers = self.env.max_query_workers
+        if workers is None:
+            workers = max(os.cpu_count(), 4)
+        if self.env.front_end_processes and workers:
+            workers = max(workers // self.env.front_end_processes, 1)
+        return workers
+
     async def start_other(self):
         self.running = True
+        if self.websocket is not None:
+            await self.websocket.start()
+        if self.env.track_metrics:
+            self.metrics_loop = asyncio.create_task(self.process_metrics())
+        if not self.serves_clients:
+            # the writer of front-end processes runs no searches
+            return
         path = os.path.join(self.env.db_dir, 'claims.db')
         args = dict(
             initializer=reader.initializer,
@@ -836,24 +1009,30 @@ class LBRYSessionManager(SessionManager):
                 )
             )
         )
-        if self.env.max_query_workers is not None and self.env.max_query_workers == 0:
+        if self.env.reader_backend == 'thread':
+            self.query_executor = ReaderThreadPool(
+                max_workers=self.query_workers or max(os.cpu_count(), 4),
+                interrupted=self.abandoned_query_metric, **args
+            )
+        elif self.query_workers == 0:
             self.query_executor = ThreadPoolExecutor(max_workers=1, **args)
         else:
-            self.query_executor = ProcessPoolExecutor(
-                max_workers=self.env.max_query_workers or max(os.cpu_count(), 4), **args
-            )
-        if self.websocket is not None:
-            await self.websocket.start()
-        if self.env.track_metrics:
-            self.metrics_loop = asyncio.create_task(self.process_metrics())
+            self.query_executor = ProcessPoolExecutor(max_workers=self.query_workers, **args)
+        self.explain_executor = ThreadPoolExecutor(max_workers=1, **args)
+        if self.front_page is not None:
+            self._front_page_task = asyncio.create_task(self._refresh_front_page())
 
     async def stop_other(self):
         self.running = False
         if self.env.track_metrics:
             self.metrics_loop.cancel()
+        if self._front_page_task is not None:
+            self._front_page_task.cancel()
         if self.websocket is not None:
             await self.websocket.stop()
-        self.query_executor.shutdown()
+        if self.query_executor is not None:
+            self.query_executor.shutdown()
+            self.explain_executor.shutdown()
 
 
 class LBRYElectrumX(SessionBase):
@@ -874,6 +1053,7 @@ class LBRYElectrumX(SessionBase):
             'blockchain.relayfee': cls.relayfee,
             'blockchain.scripthash.get_balance': cls.scripthash_get_balance,
             'blockchain.scripthash.get_history': cls.scripthash_get_history,
+            'blockchain.scripthash.get_history_page': cls.scripthash_get_history_page,
             'blockchain.scripthash.get_mempool': cls.scripthash_get_mempool,
             'blockchain.scripthash.listunspent': cls.scripthash_listunspent,
             'blockchain.scripthash.subscribe': cls.scripthash_subscribe,
@@ -900,6 +1080,7 @@ class LBRYElectrumX(SessionBase):
             'blockchain.headers.subscribe': cls.headers_subscribe_False,
             'blockchain.address.get_balance': cls.address_get_balance,
             'blockchain.address.get_history': cls.address_get_history,
+            'blockchain.address.get_history_page': cls.address_get_history_page,
             'blockchain.address.get_mempool': cls.address_get_mempool,
             'blockchain.address.listunspent': cls.address_listunspent,
             'blockchain.address.subscribe': cls.address_subscribe,
@@ -959,22 +1140,20 @@ class LBRYElectrumX(SessionBase):
     def sub_count(self):
         return len(self.hashX_subs)
 
-    async def send_history_notification(self, hashX):
-        start = time.perf_counter()
-        alias = self.hashX_subs[hashX]
-        if len(alias) == 64:
-            method = 'blockchain.scripthash.subscribe'
-        else:
-            method = 'blockchain.address.subscribe'
-        try:
-            self.session_mgr.notifications_in_flight_metric.inc()
-            status = await self.address_status(hashX)
-            self.session_mgr.address_history_metric.observe(time.perf_counter() - start)
-            start = time.perf_counter()
-            await self.send_notification(method, (alias, status))
-            self.session_mgr.notifications_sent_metric.observe(time.perf_counter() - start)
-        finally:
-            self.session_mgr.notifications_in_flight_metric.dec()
+    async def send_history_notifications(self, statuses):
+        """Send the statuses of subscribed addresses, a dict of hashX to status, in one write."""
+        notifications = []
+        for hashX, status in statuses.items():
+            alias = self.hashX_subs.get(hashX)
+            if alias is None:  # unsubscribed while the notification was queued
+                continue
+            if len(alias) == 64:
+                method = 'blockchain.scripthash.subscribe'
+            else:
+                method = 'blockchain.address.subscribe'
+            notifications.append((method, (alias, status)))
+        if notifications:
+            await self.send_notifications(notifications)
 
     def get_metrics_or_placeholder_for_api(self, query_name):
         """ Do not hold on to a reference to the metrics
@@ -990,8 +1169,9 @@ class LBRYElectrumX(SessionBase):
         start = time.perf_counter()
         try:
             self.session_mgr.pending_query_metric.inc()
-            result = await asyncio.get_running_loop().run_in_executor(
-                self.session_mgr.query_executor, func, kwargs
+            self.session_mgr.pending_queries += 1
+            result = await self.session_mgr.run_reader(
+                func, kwargs, QUERY_PRIORITIES.get(query_name, DEFAULT_PRIORITY)
             )
         except asyncio.CancelledError:
             raise
@@ -1000,6 +1180,8 @@ class LBRYElectrumX(SessionBase):
             metrics.query_interrupt(start, error.metrics)
             self.session_mgr.interrupt_count_metric.inc()
             raise RPCError(JSONRPC.QUERY_TIMEOUT, 'sqlite query timed out')
+        except reader.InvalidContinuationError as error:
+            raise RPCError(BAD_REQUEST, str(error))
         except reader.SQLiteOperationalError as error:
             metrics = self.get_metrics_or_placeholder_for_api(query_name)
             metrics.query_error(start, error.metrics)
@@ -1012,20 +1194,29 @@ class LBRYElectrumX(SessionBase):
             self.session_mgr.db_error_metric.inc()
             raise RPCError(JSONRPC.INTERNAL_ERROR, 'unknown server error')
         else:
+            if func is reader.timed_search_to_bytes:
+                result, elapsed = result
+                self.session_mgr.admission.observe(kwargs, elapsed)
             if self.env.track_metrics:
                 metrics = self.get_metrics_or_placeholder_for_api(query_name)
                 (result, metrics_data) = result
                 metrics.query_response(start, metrics_data)
-            return base64.b64encode(result).decode()
+            return to_base64(result)
         finally:
+            self.session_mgr.pending_queries -= 1
             self.session_mgr.pending_query_metric.dec()
             self.session_mgr.executor_time_metric.observe(time.perf_counter() - start)
 
-    async def run_and_cache_query(self, query_name, function, kwargs):
+    async def run_and_cache_query(self, query_name, function, kwargs, admit=None):
+        """Return the cached result of a query or run it. `admit`, given for searches, is
+        entered only when the query has to run."""
         metrics = self.get_metrics_or_placeholder_for_api(query_name)
         metrics.start()
+        return await self._run_and_cache_query(metrics, query_name, function, kwargs, admit)
+
+    async def _run_and_cache_query(self, metrics, query_name, function, kwargs, admit):
         cache = self.session_mgr.search_cache[query_name]
-        cache_key = str(kwargs)
+        cache_key = canonical_cache_key(kwargs)
         cache_item = cache.get(cache_key)
         if cache_item is None:
             cache_item = cache[cache_key] = ResultCacheItem()
@@ -1034,9 +1225,19 @@ class LBRYElectrumX(SessionBase):
             return cache_item.result
         async with cache_item.lock:
             if cache_item.result is None:
-                cache_item.result = await self.run_in_executor(
-                    query_name, function, kwargs
-                )
+                if admit is None:
+                    result = await self.run_in_executor(query_name, function, kwargs)
+                else:
+                    async with admit(kwargs) as admitted:
+                        if admitted is not kwargs:
+                            # a degraded search is cached under its own key
+                            cache.discard(cache_key, cache_item)
+                            return await self._run_and_cache_query(metrics, query_name, function, admitted, None)
+                        result = await self.run_in_executor(query_name, function, kwargs)
+                claim_hashes = names = None
+                if isinstance(result, tuple):
+                    result, claim_hashes, names = result
+                cache.set_result(cache_key, cache_item, result, claim_hashes, names)
             else:
                 metrics = self.get_metrics_or_placeholder_for_api(query_name)
                 metrics.cache_response()
@@ -1047,14 +1248,29 @@ class LBRYElectrumX(SessionBase):
 
     async def claimtrie_search(self, **kwargs):
         if kwargs:
-            return await self.run_and_cache_query('search', reader.search_to_bytes, kwargs)
+            front_page = self.session_mgr.front_page
+            if front_page is not None:
+                result = front_page.get(kwargs)
+                if result is not None:
+                    metrics = self.get_metrics_or_placeholder_for_api('search')
+                    metrics.start()
+                    metrics.cache_response()
+                    return result
+            session_mgr = self.session_mgr
+
+            def admit(constraints):
+                return session_mgr.admission.admit(constraints, session_mgr.pending_queries, session_mgr.explain_search)
+            try:
+                return await self.run_and_cache_query('search', reader.timed_search_to_bytes, kwargs, admit)
+            except QueryRejectedError:
+                raise RPCError(JSONRPC.QUERY_TIMEOUT, 'server is too busy for this search, try again later')
 
     async def claimtrie_resolve(self, *urls):
         if urls:
             count = len(urls)
             try:
                 self.session_mgr.urls_to_resolve_count_metric.inc(count)
-                return await self.run_and_cache_query('resolve', reader.resolve_to_bytes, urls)
+                return await self.run_and_cache_query('resolve', reader.resolve_to_bytes_and_dependencies, urls)
             finally:
                 self.session_mgr.resolved_url_count_metric.inc(count)
 
@@ -1076,17 +1292,30 @@ class LBRYElectrumX(SessionBase):
         return dict(zip(claim_ids, claims))
 
     async def batched_formatted_claims_from_daemon(self, claim_ids):
-        claims = await self.daemon.getclaimsbyids(claim_ids)
+        claims = [claim for claim in await self.daemon.getclaimsbyids(claim_ids) if claim and claim.get('value')]
+        # only indexed claims are returned, the claims DB is read by the reader pool
+        indexed = await self.session_mgr.run_reader(
+            reader.indexed_claim_ids, [claim['claimId'] for claim in claims]
+        )
+        outputs_by_txid = {}
+        txids = list({claim['txid'] for claim in claims if claim['claimId'] in indexed})
+        for txid, raw_tx in zip(txids, await self.daemon.getrawtransactions(txids)):
+            if raw_tx:
+                outputs_by_txid[txid] = self.coin.DESERIALIZER(raw_tx).read_tx().outputs
         result = []
         for claim in claims:
-            if claim and claim.get('value'):
-                result.append(self.format_claim_from_daemon(claim))
+            outputs = outputs_by_txid.get(claim['txid']) if claim['claimId'] in indexed else None
+            address = None
+            if outputs is not None and claim['n'] < len(outputs):
+                address = self.coin.address_from_script(outputs[claim['n']].pk_script)
+            result.append(self.format_claim_from_daemon(claim, address))
         return result
 
-    def format_claim_from_daemon(self, claim, name=None):
+    def format_claim_from_daemon(self, claim, address, name=None):
         """Changes the returned claim data to the format expected by lbry and adds missing fields."""
 
-        if not claim:
+        if not claim or address is None:
+            #  raise RPCError("Lbrycrd has {} but not lbryumx, please submit a bug report.".format(claim_id))
             return {}
 
         # this ISO-8859 nonsense stems from a nasty form of encoding extended characters in lbrycrd
@@ -1095,11 +1324,6 @@ class LBRYElectrumX(SessionBase):
 
         if 'name' in claim:
             name = claim['name'].encode('ISO-8859-1').decode()
-        info = self.db.sql.get_claims(claim_id=claim['claimId'])
-        if not info:
-            #  raise RPCError("Lbrycrd has {} but not lbryumx, please submit a bug report.".format(claim_id))
-            return {}
-        address = info.address.decode()
         # fixme: temporary
         #supports = self.format_supports_from_daemon(claim.get('supports', []))
         supports = []
@@ -1187,28 +1411,7 @@ class LBRYElectrumX(SessionBase):
 
         Status is a hex string, but must be None if there is no history.
         """
-        # Note history is ordered and mempool unordered in electrum-server
-        # For mempool, height is -1 if it has unconfirmed inputs, otherwise 0
-
-        db_history = await self.session_mgr.limited_history(hashX)
-        mempool = self.mempool.transaction_summaries(hashX)
-
-        status = ''.join(f'{hash_to_hex_str(tx_hash)}:'
-                         f'{height:d}:'
-                         for tx_hash, height in db_history)
-        status += ''.join(f'{hash_to_hex_str(tx.hash)}:'
-                          f'{-tx.has_unconfirmed_inputs:d}:'
-                          for tx in mempool)
-        if status:
-            status = sha256(status.encode()).hex()
-        else:
-            status = None
-
-        if mempool:
-            self.session_mgr.mempool_statuses[hashX] = status
-        else:
-            self.session_mgr.mempool_statuses.pop(hashX, None)
-        return status
+        return await self.session_mgr.address_status(hashX)
 
     async def hashX_listunspent(self, hashX):
         """Return the list of UTXOs of a script hash, including mempool
@@ -1252,6 +1455,11 @@ class LBRYElectrumX(SessionBase):
         hashX = self.address_to_hashX(address)
         return await self.confirmed_and_unconfirmed_history(hashX)
 
+    async def address_get_history_page(self, address, from_height=0, to_height=-1, offset=0, limit=1000):
+        """Return a page of the confirmed history of an address."""
+        hashX = self.address_to_hashX(address)
+        return await self.confirmed_history_page(hashX, from_height, to_height, offset, limit)
+
     async def address_get_mempool(self, address):
         """Return the mempool transactions touching an address."""
         hashX = self.address_to_hashX(address)
@@ -1306,11 +1514,31 @@ class LBRYElectrumX(SessionBase):
                 for tx_hash, height in history]
         return conf + self.unconfirmed_history(hashX)
 
+    async def confirmed_history_page(self, hashX, from_height, to_height, offset, limit):
+        """Return the confirmed history between from_height and to_height
+        (the tip if -1) after skipping offset transactions, at most
+        limit of them, with the number of transactions in the range."""
+        from_height = non_negative_integer(from_height)
+        to_height = None if to_height == -1 else non_negative_integer(to_height)
+        offset = non_negative_integer(offset)
+        # same DoS limit as limited_history
+        limit = min(non_negative_integer(limit), self.session_mgr.history_limit)
+        history, count = await self.db.history_page(hashX, from_height, to_height, offset, limit)
+        return {
+            'history': [{'tx_hash': hash_to_hex_str(tx_hash), 'height': height} for tx_hash, height in history],
+            'count': count
+        }
+
     async def scripthash_get_history(self, scripthash):
         """Return the confirmed and unconfirmed history of a scripthash."""
         hashX = scripthash_to_hashX(scripthash)
         return await self.confirmed_and_unconfirmed_history(hashX)
 
+    async def scripthash_get_history_page(self, scripthash, from_height=0, to_height=-1, offset=0, limit=1000):
+        """Return a page of the confirmed history of a scripthash."""
+        hashX = scripthash_to_hashX(scripthash)
+        return await self.confirmed_history_page(hashX, from_height, to_height, offset, limit)
+
     async def scripthash_get_mempool(self, scripthash):
         """Return the mempool transactions touching a scripthash."""
         hashX = scripthash_to_hashX(scripthash)
@@ -1357,8 +1585,7 @@ class LBRYElectrumX(SessionBase):
         headers, count = self.db.read_headers(start_height, count)
 
         if b64:
-            compressobj = zlib.compressobj(wbits=-15, level=1, memLevel=9)
-            headers = base64.b64encode(compressobj.compress(headers) + compressobj.flush()).decode()
+            headers = base64.b64encode(self.session_mgr.header_chunks.compress(start_height, headers)).decode()
         else:
             headers = headers.hex()
         result = {
@@ -1545,14 +1772,14 @@ class LBRYElectrumX(SessionBase):
                 except ValueError:
                     raise RPCError(BAD_REQUEST, f'tx hash {tx_hash} not in '
                                                 f'block {block_hash} at height {height:,d}')
-                needed_merkles[tx_hash] = raw_tx, block['tx'], pos, height
+                needed_merkles[tx_hash] = raw_tx, block_hash, block['tx'], pos, height
             else:
                 batch_result[tx_hash] = [raw_tx, {'block_height': -1}]
 
         def threaded_get_merkle():
-            for tx_hash, (raw_tx, block_txs, pos, block_height) in needed_merkles.items():
+            for tx_hash, (raw_tx, block_hash, block_txs, pos, block_height) in needed_merkles.items():
                 batch_result[tx_hash] = raw_tx, {
-                    'merkle': self._get_merkle_branch(block_txs, pos),
+                    'merkle': self._get_merkle_branch(block_height, block_hash, block_txs, pos),
                     'pos': pos,
                     'block_height': block_height
                 }
@@ -1574,14 +1801,17 @@ class LBRYElectrumX(SessionBase):
 
         return await self.daemon_request('getrawtransaction', tx_hash, verbose)
 
-    def _get_merkle_branch(self, tx_hashes, tx_pos):
+    def _get_merkle_branch(self, height, block_hash, tx_hashes, tx_pos):
         """Return a merkle branch to a transaction.
 
-        tx_hashes: ordered list of hex strings of tx hashes in a block
+        height: height of the block
+        block_hash: hex string of the block hash
+        tx_hashes: ordered list of hex strings of tx hashes in the block
         tx_pos: index of transaction in tx_hashes to create branch for
         """
-        hashes = [hex_str_to_hash(hash) for hash in tx_hashes]
-        branch, root = self.db.merkle.branch_and_root(hashes, tx_pos)
+        branch, root = self.db.block_merkle_branch(
+            height, hex_str_to_hash(block_hash), lambda: [hex_str_to_hash(hash) for hash in tx_hashes], tx_pos
+        )
         branch = [hash_to_hex_str(hash) for hash in branch]
         return branch
 
@@ -1612,25 +1842,6 @@ class LocalRPC(SessionBase):
         return 'RPC'
 
 
-class ResultCacheItem:
-    __slots__ = '_result', 'lock', 'has_result'
-
-    def __init__(self):
-        self.has_result = asyncio.Event()
-        self.lock = asyncio.Lock()
-        self._result = None
-
-    @property
-    def result(self) -> str:
-        return self._result
-
-    @result.setter
-    def result(self, result: str):
-        self._result = result
-        if result is not None:
-            self.has_result.set()
-
-
 def get_from_possible_keys(dictionary, *keys):
     for key in keys:
         if key in dictionary:
@@ -0,0 +1,104 @@
+"""Resumable sha256 for address statuses.
+
+An address status is the sha256 of the concatenated `tx_hash:height:` entries of its
+history. hashlib can not export the state of a hash, so `StatusHash` calls the SHA256_*
+functions of OpenSSL's libcrypto through ctypes, its state can be saved to the history
+DB and extended with new entries later. RESUMABLE is False when libcrypto can not be
+loaded, then statuses are computed from the full history.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import typing
+
+log = logging.getLogger(__name__)
+
+
+class SHA256_CTX(ctypes.Structure):
+    _fields_ = [
+        ('h', ctypes.c_uint32 * 8),
+        ('Nl', ctypes.c_uint32),
+        ('Nh', ctypes.c_uint32),
+        ('data', ctypes.c_uint32 * 16),
+        ('num', ctypes.c_uint32),
+        ('md_len', ctypes.c_uint32),
+    ]
+
+
+STATE_SIZE = ctypes.sizeof(SHA256_CTX)
+
+
+def _load_libcrypto():
+    for name in (ctypes.util.find_library('crypto'), 'libcrypto.so.3', 'libcrypto.so.1.1', 'libcrypto-3-x64'):
+        if not name:
+            continue
+        try:
+            lib = ctypes.CDLL(name)
+            for func in (lib.SHA256_Init, lib.SHA256_Update, lib.SHA256_Final):
+                func.restype = ctypes.c_int
+            lib.SHA256_Init.argtypes = [ctypes.POINTER(SHA256_CTX)]
+            lib.SHA256_Update.argtypes = [ctypes.POINTER(SHA256_CTX), ctypes.c_char_p, ctypes.c_size_t]
+            lib.SHA256_Final.argtypes = [ctypes.c_char_p, ctypes.POINTER(SHA256_CTX)]
+            return lib
+        except (OSError, AttributeError):
+            continue
+    return None
+
+
+_libcrypto = _load_libcrypto()
+
+
+class StatusHash:
+    """sha256 with a state that can be saved with `state` and resumed with `StatusHash(state)`."""
+
+    __slots__ = ('_ctx',)
+
+    def __init__(self, state: typing.Optional[bytes] = None):
+        if state is None:
+            self._ctx = SHA256_CTX()
+            _libcrypto.SHA256_Init(ctypes.byref(self._ctx))
+        elif len(state) != STATE_SIZE:
+            raise ValueError(f'status hash state should be {STATE_SIZE} bytes, not {len(state)}')
+        else:
+            self._ctx = SHA256_CTX.from_buffer_copy(state)
+
+    def update(self, data: bytes):
+        _libcrypto.SHA256_Update(ctypes.byref(self._ctx), data, len(data))
+
+    def state(self) -> bytes:
+        return bytes(self._ctx)
+
+    def copy(self) -> 'StatusHash':
+        return StatusHash(self.state())
+
+    def __reduce__(self):
+        # pickled by state so the writer can send statuses to front-ends
+        return StatusHash, (self.state(),)
+
+    def digest(self) -> bytes:
+        ctx = SHA256_CTX.from_buffer_copy(self._ctx)
+        digest = ctypes.create_string_buffer(32)
+        _libcrypto.SHA256_Final(digest, ctypes.byref(ctx))
+        return digest.raw
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+
+def _self_test() -> bool:
+    if _libcrypto is None:
+        return False
+    try:
+        data = b'0123456789abcdef:123:' * 7
+        status_hash = StatusHash()
+        status_hash.update(data[:50])
+        resumed = StatusHash(status_hash.state())
+        resumed.update(data[50:])
+        return resumed.digest() == hashlib.sha256(data).digest()
+    except Exception:
+        log.exception('libcrypto sha256 self test failed')
+        return False
+
+
+RESUMABLE = _self_test()
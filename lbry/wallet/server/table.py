@@ -0,0 +1,115 @@
+import os
+import mmap
+import typing
+
+# the file grows by at least this many bytes at a time, so appends rarely remap it
+GROWTH_BYTES = 16 * 1024 * 1024
+
+
+class FixedWidthTable:
+    """
+    Append-only table of fixed width records in a memory mapped file.
+
+    Used instead of lists of bytes objects for the tx hashes and block headers: the
+    records live in the page cache rather than in the Python heap, and opening the
+    table costs nothing however many records it holds. Indexing returns a record and
+    slicing a list of records, like the lists it replaces.
+
+    The file is grown ahead of the records, so its size is not the record count. The
+    count is given when the table is opened (it is known from the DB), records past
+    it are leftovers of unflushed blocks and are overwritten by the next appends.
+    Readers in other threads keep using the map they picked up while the file grows,
+    the file is never shrunk. Other processes open the table read only and follow()
+    the count of records the writing process told them about.
+    """
+
+    def __init__(self, path: str, width: int, count: int = 0, readonly: bool = False):
+        self.path = path
+        self.width = width
+        self.readonly = readonly
+        self._fd = os.open(path, os.O_RDONLY if readonly else os.O_RDWR | os.O_CREAT, 0o644)
+        self._count = 0
+        self._map = None
+        self._capacity = 0
+        self._reserve(max(count, 1))
+        self._count = count
+
+    def _reserve(self, count: int):
+        size = os.fstat(self._fd).st_size
+        needed = count * self.width
+        if needed > size:
+            if self.readonly:
+                raise ValueError(f'{self.path} holds less than {count:,d} records')
+            size = max(needed, size + GROWTH_BYTES - GROWTH_BYTES % self.width)
+            os.ftruncate(self._fd, size)
+        if self._map is None or size > len(self._map):
+            if self.readonly:
+                self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+            else:
+                self._map = mmap.mmap(self._fd, size)
+            self._capacity = size // self.width
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, item) -> typing.Union[bytes, typing.List[bytes]]:
+        width, data = self.width, self._map
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._count)
+            if step == 1:
+                return [data[i:i + width] for i in range(start * width, max(start, stop) * width, width)]
+            return [data[i * width:(i + 1) * width] for i in range(start, stop, step)]
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError('table index out of range')
+        return data[item * width:(item + 1) * width]
+
+    def join(self, start: int, stop: int) -> bytes:
+        """The records from start to stop as one bytes object, like b''.join(table[start:stop])."""
+        start, stop, _ = slice(start, stop).indices(self._count)
+        return self._map[start * self.width:max(start, stop) * self.width]
+
+    def append(self, record: bytes):
+        if len(record) != self.width:
+            raise ValueError(f'table records are {self.width} bytes, not {len(record)}')
+        count = self._count
+        if count == self._capacity:
+            self._reserve(count + 1)
+        self._map[count * self.width:(count + 1) * self.width] = record
+        self._count = count + 1
+
+    def extend(self, records: typing.Iterable[bytes]):
+        for record in records:
+            self.append(record)
+
+    def pop(self) -> bytes:
+        if not self._count:
+            raise IndexError('pop from empty table')
+        record = self[self._count - 1]
+        self._count -= 1
+        return record
+
+    def truncate(self, count: int):
+        self._count = min(count, self._count)
+
+    def follow(self, count: int):
+        """Set the count of records of a table another process appends to."""
+        if count > self._capacity:
+            self._reserve(count)
+        self._count = count
+
+    def flush(self, start: int = 0):
+        """Write the records from start on to disk."""
+        offset = start * self.width // mmap.PAGESIZE * mmap.PAGESIZE
+        size = self._count * self.width - offset
+        if size > 0:
+            self._map.flush(offset, size)
+
+    def close(self):
+        if self._fd is not None:
+            if not self.readonly:
+                self._map.flush()
+            self._map = None
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,181 @@
+"""Push notifications of new blocks and transactions from lbrycrd.
+
+lbrycrd publishes `hashtx`, `hashblock`, `rawtx` and `rawblock` messages on ZeroMQ PUB
+sockets (the `-zmqpub<topic>=tcp://host:port` options). This module speaks enough of
+ZMTP 3.0, the ZeroMQ wire protocol, over asyncio streams to subscribe to them without
+a libzmq binding: the NULL security mechanism, SUB and PUB sockets and multipart
+messages. `ZMQPublisher` is a stand-in for lbrycrd's publisher, used by the tests.
+"""
+import struct
+import typing
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+SIGNATURE = b'\xff' + bytes(8) + b'\x7f'
+VERSION = b'\x03\x00'
+MECHANISM = b'NULL'.ljust(20, b'\x00')
+GREETING = SIGNATURE + VERSION + MECHANISM + b'\x00' + bytes(31)
+
+FLAG_MORE, FLAG_LONG, FLAG_COMMAND = 1, 2, 4
+
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class ZMTPError(Exception):
+    """Raised when the peer breaks the protocol."""
+
+
+def parse_url(url: str) -> typing.Tuple[str, int]:
+    parsed = urlparse(url)
+    if parsed.scheme != 'tcp' or not parsed.hostname or not parsed.port:
+        raise ValueError(f'expected a tcp://host:port ZMQ url, not {url}')
+    return parsed.hostname, parsed.port
+
+
+def frame(body: bytes, more=False, command=False) -> bytes:
+    flags = (FLAG_MORE if more else 0) | (FLAG_COMMAND if command else 0)
+    if len(body) > 255:
+        return struct.pack('>BQ', flags | FLAG_LONG, len(body)) + body
+    return struct.pack('>BB', flags, len(body)) + body
+
+
+def ready_command(socket_type: bytes) -> bytes:
+    name = b'Socket-Type'
+    body = b'\x05READY' + bytes([len(name)]) + name + struct.pack('>I', len(socket_type)) + socket_type
+    return frame(body, command=True)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> typing.Tuple[int, bytes]:
+    flags, size = await reader.readexactly(2)
+    if flags & FLAG_LONG:
+        size = struct.unpack('>Q', bytes([size]) + await reader.readexactly(7))[0]
+    if size > MAX_FRAME_SIZE:
+        raise ZMTPError(f'frame of {size} bytes is too big')
+    return flags, await reader.readexactly(size)
+
+
+async def read_message(reader: asyncio.StreamReader) -> typing.List[bytes]:
+    """Read the frames of the next multipart message, skipping commands."""
+    parts = []
+    while True:
+        flags, body = await read_frame(reader)
+        if flags & FLAG_COMMAND:
+            continue
+        parts.append(body)
+        if not flags & FLAG_MORE:
+            return parts
+
+
+async def handshake(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, socket_type: bytes):
+    writer.write(GREETING)
+    greeting = await reader.readexactly(len(GREETING))
+    if greeting[:1] != SIGNATURE[:1] or greeting[9:10] != SIGNATURE[9:10]:
+        raise ZMTPError('peer is not speaking ZMTP')
+    if greeting[10] < 3 or greeting[12:32] != MECHANISM:
+        raise ZMTPError('peer needs ZMTP 3 with the NULL mechanism')
+    writer.write(ready_command(socket_type))
+    flags, body = await read_frame(reader)
+    if not flags & FLAG_COMMAND or not body.startswith(b'\x05READY'):
+        raise ZMTPError('expected a READY command')
+
+
+class ZMQSubscriber:
+    """
+    SUB socket connected to a publisher, calls `on_message(topic, body, sequence)`
+    for each message of the subscribed topics. The connection is retried every
+    `retry_delay` seconds. `on_connection(connected)` is called when the connection
+    is made or lost, the caller should resynchronize then as messages may have been
+    missed.
+    """
+
+    def __init__(self, url: str, topics: typing.Iterable[bytes],
+                 on_message: typing.Callable[[bytes, bytes, typing.Optional[int]], None],
+                 on_connection: typing.Optional[typing.Callable[[bool], None]] = None, retry_delay=5.0):
+        self.host, self.port = parse_url(url)
+        self.topics = tuple(topics)
+        self.on_message = on_message
+        self.on_connection = on_connection
+        self.retry_delay = retry_delay
+        self.connected = asyncio.Event()
+
+    async def run(self):
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                await handshake(reader, writer, b'SUB')
+                for topic in self.topics:
+                    writer.write(frame(b'\x01' + topic))
+                await writer.drain()
+                log.info('subscribed to %s on %s:%i', b', '.join(self.topics).decode(), self.host, self.port)
+                self.connected.set()
+                if self.on_connection:
+                    self.on_connection(True)
+                while True:
+                    parts = await read_message(reader)
+                    if len(parts) < 2:
+                        continue
+                    sequence = struct.unpack('<I', parts[2])[0] if len(parts) > 2 and len(parts[2]) == 4 else None
+                    self.on_message(parts[0], parts[1], sequence)
+            except (OSError, asyncio.IncompleteReadError, ZMTPError) as err:
+                log.warning('ZMQ connection to %s:%i failed: %s', self.host, self.port, err)
+            finally:
+                if self.connected.is_set():
+                    self.connected.clear()
+                    if self.on_connection:
+                        self.on_connection(False)
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.retry_delay)
+
+
+class ZMQPublisher:
+    """PUB socket sending lbrycrd style (topic, body, sequence) messages to its subscribers."""
+
+    def __init__(self):
+        self.server: typing.Optional[asyncio.AbstractServer] = None
+        self.subscribers: typing.Dict[asyncio.StreamWriter, typing.Set[bytes]] = {}
+        self.sequences: typing.Dict[bytes, int] = {}
+        self.subscribed = asyncio.Event()
+
+    async def start(self, host='127.0.0.1', port=0) -> str:
+        self.server = await asyncio.start_server(self._serve, host, port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f'tcp://{host}:{port}'
+
+    async def stop(self):
+        for writer in self.subscribers:
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        topics = set()
+        try:
+            await handshake(reader, writer, b'PUB')
+            self.subscribers[writer] = topics
+            while True:
+                parts = await read_message(reader)
+                if parts[0][:1] == b'\x01':
+                    topics.add(parts[0][1:])
+                    self.subscribed.set()
+                elif parts[0][:1] == b'\x00':
+                    topics.discard(parts[0][1:])
+        except (OSError, asyncio.IncompleteReadError, ZMTPError):
+            pass
+        finally:
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+    def publish(self, topic: bytes, body: bytes):
+        sequence = self.sequences.get(topic, 0)
+        self.sequences[topic] = (sequence + 1) & 0xffffffff
+        message = frame(topic, more=True) + frame(body, more=True) + frame(struct.pack('<I', sequence))
+        for writer, topics in self.subscribers.items():
+            if any(topic.startswith(prefix) for prefix in topics):
+                writer.write(message)
@@ -0,0 +1,93 @@
+import os
+import time
+import random
+import logging
+import argparse
+from hashlib import sha256
+
+from lbry.schema.result import Outputs, Censor
+from lbry.wallet.server.db import reader
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.StreamHandler())
+log.setLevel(logging.CRITICAL)
+
+SEARCH_COLUMNS = (
+    'is_controlling', 'last_take_over_height', 'claim_hash', 'txo_hash', 'claims_in_channel', 'reposted',
+    'height', 'creation_height', 'activation_height', 'expiration_height', 'effective_amount',
+    'support_amount', 'trending_group', 'trending_mixed', 'trending_local', 'trending_global',
+    'short_url', 'canonical_url', 'channel_hash', 'reposted_claim_hash', 'signature_valid'
+)
+
+
+def generate_page(page_size, channels=10):
+    """ Rows shaped like the results of `reader.search()` for one page of claims. """
+    make_row = reader.row_class([(column, None) for column in SEARCH_COLUMNS])
+
+    def row(name, channel=None):
+        claim_hash = sha256(name.encode()).digest()[:20]
+        height = random.randint(1, 800_000)
+        return make_row((
+            claim_hash if random.random() > 0.5 else None, height, claim_hash,
+            sha256(claim_hash).digest() + random.randint(0, 10).to_bytes(4, 'little'),
+            None if channel else random.randint(0, 1000), random.randint(0, 10),
+            height, height, height, height + 2_102_400, random.randint(1, 10**12), random.randint(0, 10**10),
+            random.randint(0, 4), random.random(), random.random(), random.random(),
+            f'{name}#{claim_hash.hex()[:2]}',
+            f'@{channel[0]}#{channel[1].hex()[:2]}/{name}#{claim_hash.hex()[:2]}' if channel else None,
+            channel[1] if channel else None, None, 1 if channel else None
+        ))
+
+    extra_txo_rows = [row(f'@channel-{i}') for i in range(channels)]
+    channel_hashes = [(f'channel-{i}', txo['claim_hash']) for i, txo in enumerate(extra_txo_rows)]
+    txo_rows = [row(f'some-claim-name-{i}', random.choice(channel_hashes)) for i in range(page_size)]
+    return txo_rows, extra_txo_rows, 0, None, Censor()
+
+
+def load_pages(db_path, page_size, pages):
+    reader.initializer(log, db_path, 'mainnet', 30)
+    try:
+        return [
+            reader.search({'order_by': ['trending_mixed'], 'offset': i * page_size, 'limit': page_size,
+                           'no_totals': True})
+            for i in range(pages)
+        ]
+    finally:
+        reader.cleanup()
+
+
+def measure(encode, pages, iterations):
+    encoded_bytes = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for page in pages:
+            encoded_bytes += len(encode(*page))
+    elapsed = time.perf_counter() - start
+    return encoded_bytes / elapsed, elapsed / (iterations * len(pages))
+
+
+def main(db_path, iterations, pages):
+    for page_size in (20, 50):
+        if db_path:
+            search_pages = load_pages(db_path, page_size, pages)
+        else:
+            search_pages = [generate_page(page_size) for _ in range(pages)]
+        print(f"-- {page_size} claims per page, {len(search_pages)} pages x {iterations} iterations")
+        for label, encode in (
+                ('protobuf message', lambda *page: Outputs.to_message(*page).SerializeToString()),
+                ('streaming encoder', Outputs.to_bytes)):
+            bytes_per_second, seconds_per_page = measure(encode, search_pages, iterations)
+            print(f"   {label:>17}: {bytes_per_second / 1024 / 1024:8.2f} MB/s, "
+                  f"{seconds_per_page * 1_000_000:8.1f} us/page")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare search result page encoding throughput.")
+    parser.add_argument('--db_path', dest='db_path', default=None, type=str,
+                        help="claims.db to take pages from, synthetic pages are used if not given")
+    parser.add_argument('--iterations', dest='iterations', default=200, type=int)
+    parser.add_argument('--pages', dest='pages', default=50, type=int)
+    args = parser.parse_args()
+    if args.db_path:
+        args.db_path = os.path.expanduser(args.db_path)
+    main(args.db_path, args.iterations, args.pages)
@@ -0,0 +1,72 @@
+import time
+import asyncio
+import argparse
+
+from lbry.wallet.rpc import jsonrpc
+from lbry.wallet.rpc.framing import NewlineFramer
+from lbry.wallet.rpc.jsonrpc import JSONRPCv2
+
+
+def transaction_batch_response(txs=100):
+    """ A blockchain.transaction.get_batch response shaped payload. """
+    return {'jsonrpc': '2.0', 'id': 1, 'result': {
+        f'{n:064x}': [f'{n:02x}' * 300, {'block_height': 800_000, 'merkle': [f'{n:064x}'] * 12, 'pos': n}]
+        for n in range(txs)
+    }}
+
+
+def request_stream(messages, read_size):
+    """ Requests of a client pipelining `messages` calls, chopped into reads of `read_size` bytes. """
+    data = b''.join(
+        JSONRPCv2.encode_payload({'jsonrpc': '2.0', 'id': n, 'method': 'blockchain.address.subscribe',
+                                  'params': ['bTZito1AqSyrGdrrzrbQtfDR2aNWvvC5GV']}) + b'\n'
+        for n in range(messages)
+    )
+    return [data[i:i + read_size] for i in range(0, len(data), read_size)]
+
+
+async def measure_framing(reads, messages):
+    framer = NewlineFramer()
+    start = time.perf_counter()
+    for data in reads:
+        framer.received_bytes(data)
+    received = [await framer.receive_message() for _ in range(messages)]
+    return messages / (time.perf_counter() - start), received
+
+
+def measure_decoding(received):
+    start = time.perf_counter()
+    for message in received:
+        JSONRPCv2._message_to_payload(message)
+    return len(received) / (time.perf_counter() - start)
+
+
+def measure_encoding(payload, iterations):
+    start = time.perf_counter()
+    encoded_bytes = 0
+    for _ in range(iterations):
+        encoded_bytes += len(JSONRPCv2.encode_payload(payload))
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, encoded_bytes / elapsed
+
+
+def main(messages, read_size, iterations):
+    reads = request_stream(messages, read_size)
+    payload = transaction_batch_response()
+    framed, received = asyncio.run(measure_framing(reads, messages))
+    print(f"framing: {framed:10,.0f} requests/s in {read_size:,d} byte reads")
+    for backend in jsonrpc.JSON_BACKENDS:
+        jsonrpc.set_json_backend(backend)
+        decoded = measure_decoding(received)
+        responses, bytes_per_second = measure_encoding(payload, iterations)
+        print(f"{backend:>7}: {decoded:10,.0f} requests/s decoded, {responses:8,.0f} get_batch responses/s "
+              f"encoded ({bytes_per_second / 1024 / 1024:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure RPC message framing, decoding and encoding throughput.")
+    parser.add_argument('--messages', dest='messages', default=100_000, type=int)
+    parser.add_argument('--read_size', dest='read_size', default=65536, type=int)
+    parser.add_argument('--iterations', dest='iterations', default=1000, type=int)
+    args = parser.parse_args()
+    main(args.messages, args.read_size, args.iterations)
@@ -0,0 +1,103 @@
+import unittest
+from hashlib import sha256
+
+from lbry.error import ResolveCensoredError
+from lbry.schema.result import Outputs, Censor, encode_varint
+
+
+def claim_hash(name):
+    return sha256(name.encode()).digest()[:20]
+
+
+def get_row(name, nout=0, height=100, **kwargs):
+    row = {
+        'claim_hash': claim_hash(name), 'txo_hash': sha256(name.encode()).digest() + nout.to_bytes(4, 'little'),
+        'height': height, 'short_url': f'{name}#a', 'canonical_url': None, 'is_controlling': None,
+        'last_take_over_height': None, 'creation_height': height, 'activation_height': height,
+        'expiration_height': height + 1000, 'claims_in_channel': None, 'reposted': 0,
+        'effective_amount': 10**10, 'support_amount': 0, 'trending_group': 0, 'trending_mixed': 0.0,
+        'trending_local': 0.0, 'trending_global': 0.0, 'channel_hash': None, 'reposted_claim_hash': None,
+    }
+    row.update(kwargs)
+    return row
+
+
+class TestOutputsEncoding(unittest.TestCase):
+
+    def assertEncodedLikeProtobuf(self, *args, **kwargs):
+        encoded = Outputs.to_bytes(*args, **kwargs)
+        self.assertEqual(Outputs.to_message(*args, **kwargs).SerializeToString(), encoded)
+        return encoded
+
+    def test_varint(self):
+        self.assertEqual(b'\x00', encode_varint(0))
+        self.assertEqual(b'\x7f', encode_varint(127))
+        self.assertEqual(b'\x80\x01', encode_varint(128))
+        self.assertEqual(b'\xac\x02', encode_varint(300))
+        self.assertEqual(b'\xff\xff\xff\xff\x0f', encode_varint(2**32-1))
+        with self.assertRaises(ValueError):
+            encode_varint(-1)
+
+    def test_empty_page(self):
+        self.assertEqual(b'', self.assertEncodedLikeProtobuf([], []))
+        self.assertEncodedLikeProtobuf([], [], offset=20, total=0)
+        self.assertEncodedLikeProtobuf([], [], offset=0, total=300)
+        self.assertTrue(Outputs.from_bytes(
+            self.assertEncodedLikeProtobuf([], [], total=300, total_estimated=True)
+        ).total_estimated)
+
+    def test_continuation(self):
+        encoded = self.assertEncodedLikeProtobuf([get_row('one')], [], total=5, continuation=b'\x01[]')
+        self.assertEqual(b'\x01[]', Outputs.from_bytes(encoded).continuation)
+        self.assertEqual(b'', Outputs.from_bytes(self.assertEncodedLikeProtobuf([], [])).continuation)
+
+    def test_claims_with_references(self):
+        channel = get_row('@chan', nout=1, canonical_url='@chan#a', claims_in_channel=2, is_controlling=b'x')
+        reposted = get_row('original', nout=0, height=0, channel_hash=channel['claim_hash'], reposted=1)
+        rows = [
+            get_row('one', channel_hash=channel['claim_hash'], canonical_url='@chan#a/one#b',
+                    last_take_over_height=90, trending_group=3, trending_mixed=1.25,
+                    trending_local=-0.5, trending_global=1e30, support_amount=2**40),
+            get_row('two', nout=300, reposted_claim_hash=reposted['claim_hash']),
+            get_row('three', channel_hash=claim_hash('missing'), short_url='thrée#c'),
+        ]
+        encoded = self.assertEncodedLikeProtobuf(rows, [channel, reposted, channel], offset=40, total=100)
+        outputs = Outputs.from_bytes(encoded)
+        self.assertEqual(3, len(outputs.txos))
+        self.assertEqual(channel['txo_hash'][:32], outputs.txos[0].claim.channel.tx_hash)
+        self.assertEqual(1, outputs.txos[0].claim.channel.nout)
+        self.assertEqual(300, outputs.txos[1].nout)
+        self.assertTrue(outputs.txos[1].claim.HasField('repost'))
+        self.assertFalse(outputs.txos[2].claim.HasField('channel'))
+
+    def test_errors_and_censored(self):
+        channel = get_row('@censor')
+        censor = Censor()
+        censor.censored = {channel['claim_hash']: 2, claim_hash('missing'): 1}
+        censor.total = 3
+        rows = [
+            ValueError('invalid url'),
+            LookupError('not found'),
+            ResolveCensoredError('lbry://blocked', channel['claim_hash']),
+            ResolveCensoredError('lbry://blocked', claim_hash('missing')),
+            Exception('other'),
+            get_row('one'),
+        ]
+        self.assertEncodedLikeProtobuf(rows, [channel], blocked=censor)
+        self.assertEncodedLikeProtobuf([], [], blocked=Censor())
+
+    def test_tuple_rows(self):
+        row = get_row('one', channel_hash=claim_hash('@chan'), trending_mixed=2.5)
+        channel = get_row('@chan')
+
+        class Row(tuple):
+            columns = {name: i for i, name in enumerate(reversed(list(row)))}
+
+            def __getitem__(self, key):
+                return tuple.__getitem__(self, self.columns[key] if isinstance(key, str) else key)
+
+        tuple_rows = [Row(reversed(list(r.values()))) for r in (row, channel)]
+        self.assertEqual(
+            Outputs.to_bytes([row], [channel]),
+            Outputs.to_bytes(tuple_rows[:1], tuple_rows[1:])
+        )
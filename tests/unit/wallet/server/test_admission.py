@@ -0,0 +1,93 @@
+import asyncio
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.admission import (
+    SearchAdmission, QueryCostModel, QueryRejectedError, query_shape, plan_cost, EXPENSIVE_OFFSET
+)
+
+
+class TestQueryCost(AsyncioTestCase):
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape({'any_tags': ['a', 'b', 'c'], 'limit': 20, 'offset': 50, 'height': '>=100'}),
+            query_shape({'any_tags': ['x', 'y', 'z', 'w'], 'limit': 10, 'offset': 60, 'height': '>=5'}),
+        )
+        self.assertNotEqual(query_shape({'any_tags': ['a']}), query_shape({'any_tags': ['a', 'b', 'c']}))
+        self.assertNotEqual(query_shape({'offset': 10}), query_shape({'offset': 500}))
+        self.assertNotEqual(query_shape({'height': '>5'}), query_shape({'height': '5'}))
+        self.assertNotEqual(query_shape({'order_by': ['height']}), query_shape({'order_by': ['^height']}))
+        self.assertNotEqual(query_shape({'text': 'a'}), query_shape({'text': 'a', 'no_totals': True}))
+
+    def test_plan_cost(self):
+        self.assertEqual(0, plan_cost([]))
+        self.assertEqual(1, plan_cost(['SEARCH claim USING INDEX claim_id_idx (claim_id>? AND claim_id<?)']))
+        self.assertEqual(120, plan_cost(['SCAN claim', 'USE TEMP B-TREE FOR ORDER BY']))
+        self.assertEqual(50, plan_cost(['SCAN claim USING COVERING INDEX claim_type_release_idx']))
+
+    def test_timings_override_plan(self):
+        costs = QueryCostModel(expensive_seconds=0.1)
+        self.assertFalse(costs.is_known('a'))
+        self.assertFalse(costs.is_expensive('a', {}))
+        costs.set_plan('a', ['SCAN claim'])
+        self.assertTrue(costs.is_known('a'))
+        self.assertTrue(costs.is_expensive('a', {}))
+        costs.observe('a', 0.01)
+        self.assertFalse(costs.is_expensive('a', {}))
+        for _ in range(20):
+            costs.observe('a', 0.5)
+        self.assertTrue(costs.is_expensive('a', {}))
+        self.assertTrue(costs.is_expensive('b', {'offset': EXPENSIVE_OFFSET}))
+
+
+class TestSearchAdmission(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.explained = []
+        self.admission = SearchAdmission(
+            busy_pending=10, expensive_seconds=0.1, max_expensive=1, max_waiting=1
+        )
+
+    async def explain(self, constraints):
+        self.explained.append(constraints)
+        return ['SCAN claim'] if 'text' in constraints else ['SEARCH claim USING INDEX claim_id_idx']
+
+    async def test_everything_goes_through_when_not_busy(self):
+        async with self.admission.admit({'text': 'a'}, 9, self.explain) as constraints:
+            self.assertEqual({'text': 'a'}, constraints)
+        self.assertEqual([], self.explained)
+
+    async def test_cheap_searches_go_through_when_busy(self):
+        async with self.admission.admit({'claim_id': 'ab'}, 10, self.explain) as constraints:
+            self.assertEqual({'claim_id': 'ab'}, constraints)
+        async with self.admission.admit({'claim_id': 'cd'}, 10, self.explain):
+            pass
+        self.assertEqual(1, len(self.explained))
+
+    async def test_expensive_searches_are_degraded_queued_and_rejected(self):
+        admit = self.admission.admit
+        async with admit({'text': 'a'}, 10, self.explain) as constraints:
+            self.assertEqual({'text': 'a', 'no_totals': True}, constraints)
+            release = asyncio.Event()
+
+            async def queued():
+                async with admit({'text': 'b'}, 10, self.explain):
+                    await release.wait()
+
+            task = asyncio.ensure_future(queued())
+            await asyncio.sleep(0)
+            self.assertEqual(1, self.admission.waiting)
+            with self.assertRaises(QueryRejectedError):
+                async with admit({'text': 'c', 'no_totals': True}, 10, self.explain):
+                    pass
+            async with admit({'claim_id': 'ab'}, 10, self.explain):
+                pass
+        await asyncio.sleep(0)
+        self.assertEqual(0, self.admission.waiting)
+        release.set()
+        await task
+
+    async def test_learned_timings_are_used(self):
+        self.admission.observe({'claim_id': 'ab'}, 1.0)
+        async with self.admission.admit({'claim_id': 'cd'}, 10, self.explain) as constraints:
+            self.assertTrue(constraints['no_totals'])
+        self.assertEqual([], self.explained)
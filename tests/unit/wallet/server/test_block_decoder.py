@@ -0,0 +1,65 @@
+from lbry.testcase import AsyncioTestCase
+from lbry.schema.claim import Claim
+from lbry.wallet.constants import COIN, NULL_HASH32
+from lbry.wallet.transaction import Transaction, Input, Output
+from lbry.wallet.server.coin import LBCRegTest
+from lbry.wallet.server.hash import double_sha256
+from lbry.wallet.server.block_decoder import BlockDecoder, decode_block, split_blocks
+
+
+def get_tx(n):
+    spent = Transaction().add_outputs([Output.pay_pubkey_hash(COIN, NULL_HASH32)]).outputs[0]
+    claim = Claim()
+    claim.stream.title = f'claim {n}'
+    return Transaction().add_inputs([Input.spend(spent)]).add_outputs([
+        Output.pay_pubkey_hash(n, bytes([n % 256]) * 20),
+        Output.pay_claim_name_pubkey_hash(COIN, f'claim-{n}', claim, b'a' * 20),
+    ])
+
+
+def get_raw_block(height, txs):
+    header = height.to_bytes(4, 'little') * (LBCRegTest.BASIC_HEADER_SIZE // 4)
+    return header + bytes([len(txs)]) + b''.join(tx.raw for tx in txs)
+
+
+class TestBlockDecoder(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.raw_blocks = [get_raw_block(height, [get_tx(height * 3 + i) for i in range(3)]) for height in range(10)]
+
+    def test_decode_block(self):
+        txs = [get_tx(i) for i in range(2)]
+        block = decode_block(LBCRegTest, get_raw_block(1, txs), 1)
+        self.assertEqual(LBCRegTest.BASIC_HEADER_SIZE, len(block.header))
+        self.assertEqual(2, len(block.transactions))
+        for tx, (decoded, tx_hash) in zip(txs, block.transactions):
+            self.assertEqual(tx.raw, decoded.raw)
+            self.assertEqual(double_sha256(tx.raw), tx_hash)
+            self.assertEqual(((tx.inputs[0].txo_ref.tx_ref.hash, 0),), decoded.prevouts)
+            self.assertEqual(tuple(
+                (idx, LBCRegTest.hashX_from_script(txo.script.source), txo.amount)
+                for idx, txo in enumerate(tx.outputs)
+            ), decoded.outputs)
+
+    def test_split_blocks(self):
+        self.assertEqual([[b'aa', b'b'], [b'ccc'], [b'd']], split_blocks([b'aa', b'b', b'ccc', b'd'], 3))
+        self.assertEqual([], split_blocks([], 3))
+
+    async def decode(self, decoder):
+        return [chunk async for chunk in decoder.decode(self.raw_blocks, 0)]
+
+    async def test_decoded_in_process(self):
+        chunks = await self.decode(BlockDecoder(LBCRegTest, workers=0, chunk_bytes=1))
+        self.assertEqual([[decode_block(LBCRegTest, raw, height) for height, raw in enumerate(self.raw_blocks)]], chunks)
+
+    async def test_decoded_by_workers_in_order(self):
+        decoder = BlockDecoder(LBCRegTest, workers=2, chunk_bytes=len(self.raw_blocks[0]) * 3)
+        self.addCleanup(decoder.shutdown)
+        chunks = await self.decode(decoder)
+        self.assertEqual([3, 3, 3, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual(
+            [decode_block(LBCRegTest, raw, height) for height, raw in enumerate(self.raw_blocks)],
+            [block for chunk in chunks for block in chunk]
+        )
+        # a single chunk is not sent to the workers
+        self.assertEqual(1, len([chunk async for chunk in decoder.decode(self.raw_blocks[:1], 0)]))
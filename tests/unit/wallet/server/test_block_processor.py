@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from struct import pack
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.coin import LBCRegTest
+from lbry.wallet.server.history import History
+from lbry.wallet.server.block_processor import BlockProcessor
+
+
+class TestBackgroundFlushGenerations(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        env = SimpleNamespace(coin=LBCRegTest, block_decode_workers=0)
+        db = SimpleNamespace(history=History())
+        self.bp = BlockProcessor(env, db, None, None)
+        self.addCleanup(self.bp.executor.shutdown)
+        self.addCleanup(self.bp.flush_executor.shutdown)
+        self.bp.height, self.bp.tx_count, self.bp.tip = 1, 2, b'\x01' * 32
+
+    async def take_flush_data(self, flush_utxos):
+        async with self.bp.state_lock:
+            return self.bp.take_flush_data(flush_utxos)
+
+    async def test_spend_utxo_of_flushing_generation(self):
+        hashX, tx_num, value = b'x' * 11, pack('<I', 1), pack('<Q', 5)
+        self.bp.utxo_cache[b'a' * 32 + pack('<H', 3)] = hashX + tx_num + value
+        self.bp.db.history.add_unflushed([[hashX]], 1)
+        flush_data = await self.take_flush_data(True)
+        self.assertEqual(1, len(flush_data.adds))
+        self.assertEqual([1], list(flush_data.history[hashX]))
+        self.assertEqual(0, len(self.bp.utxo_cache))
+        self.assertFalse(self.bp.db.history.unflushed)
+
+        self.bp.flushing = flush_data
+        self.assertEqual(hashX + tx_num + value, self.bp.spend_utxo(b'a' * 32, 3))
+        # the spent UTXO is still written by the flush and deleted by the next one
+        self.assertEqual(1, len(flush_data.adds))
+        self.assertEqual(
+            [b'h' + b'a' * 4 + pack('<H', 3) + tx_num, b'u' + hashX + pack('<H', 3) + tx_num], self.bp.db_deletes
+        )
+
+    async def test_keep_utxos_when_not_flushing_them(self):
+        self.bp.utxo_cache[b'a' * 32 + pack('<H', 3)] = b'x' * 23
+        utxo_cache = self.bp.utxo_cache
+        flush_data = await self.take_flush_data(False)
+        self.assertIs(utxo_cache, flush_data.adds)
+        self.assertIs(utxo_cache, self.bp.utxo_cache)
+        self.assertEqual([], self.bp.headers)
+
+    async def test_failed_flush_keeps_its_utxos_and_stops_block_processing(self):
+        def flush_dbs(*_):
+            raise OSError('disk full')
+        self.bp.db.flush_dbs = flush_dbs
+        hashX, tx_num, value = b'x' * 11, pack('<I', 1), pack('<Q', 5)
+        self.bp.utxo_cache[b'a' * 32 + pack('<H', 3)] = hashX + tx_num + value
+        self.assertFalse(self.bp.background_flush_failed())
+        with self.assertLogs(level='ERROR'):
+            await self.bp.background_flush(True)
+            with self.assertRaisesRegex(OSError, 'disk full'):
+                await self.bp.wait_for_background_flush()
+        self.assertTrue(self.bp.background_flush_failed())
+        with self.assertRaisesRegex(OSError, 'disk full'):
+            self.bp.check_background_flush()
+        # the UTXOs which were not written can still be spent
+        self.assertEqual(hashX + tx_num + value, self.bp.spend_utxo(b'a' * 32, 3))
@@ -0,0 +1,134 @@
+import time
+import unittest
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.cache import ResultCache, ResultCacheItem, SizedLRUCache, canonical_cache_key, ENTRY_OVERHEAD
+from lbry.wallet.server.merkle import Merkle
+from lbry.wallet.server.db.writer import ClaimChanges
+
+
+class TestCanonicalCacheKey(unittest.TestCase):
+
+    def test_constraint_order_is_ignored(self):
+        self.assertEqual(canonical_cache_key({'a': 1, 'b': 2}), canonical_cache_key({'b': 2, 'a': 1}))
+
+    def test_unordered_values_are_sorted(self):
+        self.assertEqual(
+            canonical_cache_key({'any_tags': ['b', 'a'], 'claim_type': ['stream', 'repost']}),
+            canonical_cache_key({'claim_type': ['repost', 'stream'], 'any_tags': ['a', 'b', 'a']})
+        )
+
+    def test_ordered_values_are_kept(self):
+        self.assertNotEqual(
+            canonical_cache_key({'order_by': ['release_time', 'height']}),
+            canonical_cache_key({'order_by': ['height', 'release_time']})
+        )
+        self.assertNotEqual(canonical_cache_key(('lbry://a', 'lbry://b')), canonical_cache_key(('lbry://b', 'lbry://a')))
+
+
+class TestSizedLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = SizedLRUCache(10, len)
+        cache['a'] = b'aaaa'
+        cache['b'] = b'bbbb'
+        self.assertEqual(cache.get('a'), b'aaaa')
+        cache['c'] = b'cccc'
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.size, 8)
+        cache['a'] = b'a'
+        self.assertEqual(cache.size, 5)
+        cache['d'] = b'd' * 11
+        self.assertNotIn('d', cache)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(len(cache), 2)
+
+    def test_block_merkle_levels(self):
+        merkle = Merkle()
+        for count in (1, 2, 3, 7, 8, 33):
+            hashes = [bytes([n]) * 32 for n in range(count)]
+            levels = merkle.levels(hashes)
+            for index in range(count):
+                self.assertEqual(
+                    merkle.branch_and_root_from_levels(levels, index), merkle.branch_and_root(hashes, index)
+                )
+        with self.assertRaises(ValueError):
+            merkle.levels([])
+
+
+class TestResultCache(AsyncioTestCase):
+
+    def add(self, cache, key, result, claim_hashes=None, names=None):
+        item = cache[key] = ResultCacheItem()
+        cache.set_result(key, item, result, claim_hashes, names)
+        return item
+
+    def test_hit_and_miss(self):
+        cache = ResultCache(10000)
+        self.assertIsNone(cache.get('a'))
+        item = self.add(cache, 'a', 'result')
+        self.assertIs(cache.get('a'), item)
+        self.assertEqual(cache.size, ENTRY_OVERHEAD + len('a') + len('result'))
+
+    def test_evicts_least_recently_used_by_size(self):
+        entry_size = ENTRY_OVERHEAD + 1 + 100
+        cache = ResultCache(entry_size * 3)
+        for key in 'abc':
+            self.add(cache, key, 'x' * 100)
+        cache.get('a')
+        self.add(cache, 'd', 'x' * 100)
+        self.assertEqual(3, len(cache))
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_expired_results_are_misses(self):
+        cache = ResultCache(10000, ttl=60)
+        item = self.add(cache, 'a', 'result')
+        self.assertIs(cache.get('a'), item)
+        item.created = time.perf_counter() - 61
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, cache.size)
+
+    def test_result_of_invalidated_item_is_not_cached(self):
+        cache = ResultCache(10000)
+        item = cache['a'] = ResultCacheItem()
+        cache.invalidate(ClaimChanges({b'claim'}, set(), False))
+        cache.set_result('a', item, 'stale')
+        self.assertEqual('stale', item.result)
+        self.assertNotIn('a', cache)
+        self.assertEqual(0, cache.size)
+
+    def test_discard_pending_item(self):
+        cache = ResultCache(10000)
+        item = cache['a'] = ResultCacheItem()
+        cache.discard('a', ResultCacheItem())
+        self.assertIn('a', cache)
+        cache.discard('a', item)
+        self.assertNotIn('a', cache)
+        self.assertEqual(0, cache.size)
+
+    def test_blocks_without_claim_changes_keep_results(self):
+        cache = ResultCache(10000)
+        self.add(cache, 'a', 'result')
+        cache.invalidate(ClaimChanges(set(), set(), False))
+        self.assertIn('a', cache)
+        cache.invalidate(ClaimChanges(set(), set(), True))
+        self.assertNotIn('a', cache)
+
+    def test_invalidates_only_dependent_results(self):
+        cache = ResultCache(10000)
+        self.add(cache, 'search', 'result')
+        self.add(cache, 'foo', 'result', {b'foo'}, {'foo'})
+        self.add(cache, '@chan/bar', 'result', {b'bar', b'chan'}, {'@chan', 'bar'})
+        self.add(cache, 'baz', 'result', {b'baz', b'chan'}, {'baz'})
+        cache.invalidate(ClaimChanges({b'unrelated'}, {'unrelated'}, False))
+        self.assertEqual(3, len(cache))
+        self.assertNotIn('search', cache)
+        cache.invalidate(ClaimChanges(set(), {'foo'}, False))
+        self.assertNotIn('foo', cache)
+        self.assertEqual(2, len(cache))
+        cache.invalidate(ClaimChanges({b'chan'}, set(), False))
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.size)
+        self.assertEqual({}, cache._by_claim_hash)
+        self.assertEqual({}, cache._by_name)
@@ -0,0 +1,46 @@
+import zlib
+import unittest
+from lbry.wallet.server.chunks import HeaderChunks, CHUNK_SIZE
+
+HEADER_SIZE = 112
+
+
+def header(height, fork=0):
+    return (height * 7 + fork).to_bytes(4, 'little') * (HEADER_SIZE // 4)
+
+
+class TestHeaderChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = [header(height) for height in range(2 * CHUNK_SIZE + 500)]
+        self.chunks = HeaderChunks(self.read_headers, HEADER_SIZE)
+
+    def read_headers(self, start, count):
+        headers = self.chain[start:start + count]
+        return b''.join(headers), len(headers)
+
+    def assertCompresses(self, start, count):
+        headers, _ = self.read_headers(start, count)
+        compressed = self.chunks.compress(start, headers)
+        self.assertEqual(zlib.decompress(compressed, wbits=-15), headers)
+        return compressed
+
+    def test_ranges_copy_whole_chunks(self):
+        self.assertEqual(self.chunks.extend(), 2)
+        self.assertEqual(self.chunks.extend(), 0)
+        aligned = self.assertCompresses(CHUNK_SIZE, CHUNK_SIZE)
+        self.assertTrue(aligned.startswith(self.chunks.chunks[1][1]))
+        for start, count in ((0, 2 * CHUNK_SIZE), (10, 2 * CHUNK_SIZE), (999, 1500), (0, 10), (2400, 10000), (0, 0)):
+            self.assertCompresses(start, count)
+
+    def test_reorged_chunks_are_replaced(self):
+        self.chunks.extend()
+        self.chain[CHUNK_SIZE + 10:] = [header(height, 1) for height in range(CHUNK_SIZE + 10, 2 * CHUNK_SIZE + 20)]
+        # until extend() runs the compressed headers of the second chunk are stale
+        self.assertCompresses(0, 2 * CHUNK_SIZE)
+        self.assertEqual(self.chunks.extend(), 1)
+        self.assertEqual(len(self.chunks), 2)
+        self.assertTrue(self.assertCompresses(CHUNK_SIZE, CHUNK_SIZE).startswith(self.chunks.chunks[1][1]))
+        del self.chain[2 * CHUNK_SIZE - 1:]
+        self.assertEqual(self.chunks.extend(), 0)
+        self.assertEqual(len(self.chunks), 1)
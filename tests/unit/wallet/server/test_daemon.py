@@ -0,0 +1,52 @@
+import json
+from aiohttp import web
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.coin import LBCRegTest
+from lbry.wallet.server.daemon import Daemon
+
+
+class TestDaemonBatches(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.batches = []
+        app = web.Application()
+        app.router.add_post('/', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.addCleanup(self.runner.cleanup)
+        self.daemon = Daemon(LBCRegTest, f'rpcuser:rpcpass@127.0.0.1:{port}', init_batch_size=10)
+        self.addCleanup(self.daemon.close)
+
+    async def handle(self, request):
+        payload = await request.json()
+        self.batches.append(len(payload))
+        result = [
+            {'id': item['id'], 'error': None, 'result': bytes([item['params'][0] % 256]).hex() * 1000}
+            for item in payload
+        ]
+        return web.Response(body=json.dumps(result), content_type='application/json')
+
+    async def test_vector_split_in_batches_keeps_order(self):
+        blocks = await self.daemon._send_vector('getblock', ((n, False) for n in range(25)), convert=bytes.fromhex)
+        self.assertListEqual(blocks, [bytes([n]) * 1000 for n in range(25)])
+        self.assertListEqual(sorted(self.batches), [5, 10, 10])
+
+    async def test_batch_size_follows_response_time(self):
+        self.daemon.batch_target_secs = 1000
+        await self.daemon._send_vector('getblockhash', ((n,) for n in range(10)))
+        self.assertGreater(self.daemon.batch_size('getblockhash'), 10)
+        self.daemon.batch_target_secs = 0
+        await self.daemon._send_vector('getblockhash', ((n,) for n in range(1000)))
+        self.assertEqual(self.daemon.batch_size('getblockhash'), 500)
+        self.assertEqual(self.daemon.batch_size('getblock'), 10)
+
+    async def test_big_responses_decoded_in_thread(self):
+        await self.daemon._send_vector('getblock', ((n, False) for n in range(10)), convert=bytes.fromhex)
+        self.assertEqual(len(self.daemon.decode_executor._threads), 0)
+        self.daemon.batch_sizes['getblock'] = 200
+        blocks = await self.daemon._send_vector('getblock', ((n, False) for n in range(200)), convert=bytes.fromhex)
+        self.assertEqual(len(blocks), 200)
+        self.assertEqual(len(self.daemon.decode_executor._threads), 1)
@@ -0,0 +1,46 @@
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.rpc import jsonrpc
+from lbry.wallet.rpc.framing import NewlineFramer
+from lbry.wallet.rpc.jsonrpc import JSONRPCv2, ProtocolError
+
+
+class TestNewlineFramer(AsyncioTestCase):
+
+    async def test_messages_split_and_joined_across_reads(self):
+        framer = NewlineFramer()
+        framer.received_bytes(b'{"id": 1}\n{"id"')
+        framer.received_bytes(b': 2}')
+        framer.received_bytes(b'\n\n{"id": 3}\n{"id": 4')
+        self.assertEqual(await framer.receive_message(), b'{"id": 1}')
+        self.assertEqual(await framer.receive_message(), b'{"id": 2}')
+        self.assertEqual(await framer.receive_message(), b'')
+        self.assertEqual(await framer.receive_message(), b'{"id": 3}')
+        self.assertEqual(framer.buffer, b'{"id": 4')
+        self.loop.call_soon(framer.received_bytes, b'}\n')
+        self.assertEqual(await framer.receive_message(), b'{"id": 4}')
+        self.assertEqual(framer.buffer, b'')
+
+    async def test_oversized_message_is_dropped(self):
+        framer = NewlineFramer(max_size=10)
+        framer.received_bytes(b'0123456789abc')
+        with self.assertRaises(MemoryError):
+            await framer.receive_message()
+        framer.received_bytes(b'def\nok\n')
+        self.assertEqual(await framer.receive_message(), b'ok')
+
+
+class TestJSONBackends(AsyncioTestCase):
+
+    def tearDown(self):
+        jsonrpc.set_json_backend('orjson' if jsonrpc.orjson is not None else 'json')
+
+    def test_backends_agree(self):
+        payload = {'jsonrpc': '2.0', 'id': 7, 'result': {'hex': 'ab' * 100, 'merkle': ['cd'] * 3, 'pos': 2**70}}
+        for backend in jsonrpc.JSON_BACKENDS:
+            jsonrpc.set_json_backend(backend)
+            message = JSONRPCv2.encode_payload(payload)
+            self.assertEqual(JSONRPCv2._message_to_payload(message), payload)
+            with self.assertRaises(ProtocolError):
+                JSONRPCv2._message_to_payload(message[:-1])
+            with self.assertRaises(ProtocolError):
+                JSONRPCv2.encode_payload({'result': b'bytes'})
@@ -0,0 +1,91 @@
+import base64
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.front_page import FrontPage, search_shape
+
+
+class TestFrontPage(AsyncioTestCase):
+
+    def setUp(self):
+        self.searches = []
+
+    @staticmethod
+    def result(constraints):
+        return repr(sorted(constraints.items())).encode()
+
+    async def search(self, constraints):
+        self.searches.append(constraints)
+        if constraints.get('invalid'):
+            raise ValueError('invalid search')
+        return self.result(constraints)
+
+    def request(self, front_page, times=1, **kwargs):
+        for _ in range(times):
+            result = front_page.get(kwargs)
+        return result if result is None else base64.b64decode(result).decode()
+
+    def test_shape_ignores_offset_and_argument_order(self):
+        self.assertEqual(
+            search_shape({'any_tags': ['a', 'b'], 'limit': 20, 'offset': 40})[0],
+            search_shape({'limit': 20, 'any_tags': ['b', 'a']})[0]
+        )
+        self.assertEqual((20, 40), search_shape({'limit': 20, 'offset': 40})[1:])
+        self.assertEqual((10, 0), search_shape({'any_tags': ['a']})[1:])
+
+    async def test_most_requested_shapes_are_precomputed(self):
+        front_page = FrontPage(queries=2, pages=2)
+        self.assertIsNone(self.request(front_page, 3, any_tags=['art'], limit=20))
+        self.assertIsNone(self.request(front_page, 2, order_by=['release_time']))
+        self.assertIsNone(self.request(front_page, 1, not_tags=['mature']))
+        await front_page.refresh(self.search)
+        self.assertEqual(4, len(self.searches))
+        self.assertEqual(4, len(front_page))
+        self.assertEqual(
+            self.result({'any_tags': ['art'], 'limit': 20, 'offset': 20}).decode(),
+            self.request(front_page, any_tags=['art'], limit=20, offset=20)
+        )
+        self.assertIsNotNone(self.request(front_page, order_by=['release_time'], offset=10))
+        self.assertIsNone(self.request(front_page, order_by=['release_time'], offset=5))
+        self.assertIsNone(self.request(front_page, order_by=['release_time'], offset=20))
+        self.assertIsNone(self.request(front_page, not_tags=['mature']))
+
+    async def test_request_counts_decay(self):
+        front_page = FrontPage(queries=1, pages=1)
+        self.request(front_page, 4, any_tags=['art'])
+        await front_page.refresh(self.search)
+        self.assertIsNotNone(self.request(front_page, any_tags=['art']))
+        self.request(front_page, 4, any_tags=['news'])
+        await front_page.refresh(self.search)
+        self.assertIsNone(self.request(front_page, any_tags=['art']))
+        self.assertIsNotNone(self.request(front_page, any_tags=['news']))
+
+    async def test_failing_searches_are_forgotten(self):
+        front_page = FrontPage(queries=2, pages=3)
+        self.request(front_page, 5, invalid=True)
+        self.request(front_page, 1, any_tags=['art'])
+        with self.assertLogs('lbry.wallet.server.front_page', 'WARNING'):
+            await front_page.refresh(self.search)
+        self.assertEqual(3, len(front_page))
+        self.searches.clear()
+        await front_page.refresh(self.search)
+        self.assertEqual([], self.searches)
+        front_page.clear()
+        self.assertEqual(0, len(front_page))
+
+    async def test_refresh_cleared_by_a_block_is_dropped(self):
+        front_page = FrontPage(queries=2, pages=1)
+        self.request(front_page, 2, any_tags=['art'])
+        self.request(front_page, 1, any_tags=['news'])
+
+        async def search(constraints):
+            # a block is notified while the refresh is running
+            front_page.clear()
+            return await self.search(constraints)
+
+        self.assertFalse(await front_page.refresh(search))
+        self.assertEqual(1, len(self.searches))
+        self.assertEqual(0, len(front_page))
+        self.request(front_page, 2, any_tags=['art'])
+        self.assertTrue(await front_page.refresh(self.search))
+        self.assertIsNotNone(self.request(front_page, any_tags=['art']))
+        front_page.clear()
+        self.assertIsNone(self.request(front_page, any_tags=['art']))
@@ -0,0 +1,133 @@
+import shutil
+import pickle
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+from collections import defaultdict
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.hash import hash_to_hex_str
+from lbry.wallet.server.history import History
+from lbry.wallet.server.leveldb import LevelDB
+from lbry.wallet.server.status import StatusHash, RESUMABLE
+from lbry.wallet.server.storage import db_class
+
+
+def hashX(i):
+    return bytes([i]) * 11
+
+
+class TestHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.history = History()
+        self.history.open_db(db_class(self.tmp, 'leveldb'), True, 0, False)
+        self.addCleanup(self.history.close_db)
+        self.expected = defaultdict(list)
+
+    def flush(self, first_tx_num, count, every=1):
+        hashXs_by_tx = [[hashX(1)] if n % every == 0 else [hashX(2)] for n in range(count)]
+        for tx_num, hashXs in enumerate(hashXs_by_tx, start=first_tx_num):
+            self.expected[hashXs[0]].append(tx_num)
+        self.history.add_unflushed(hashXs_by_tx, first_tx_num)
+        self.history.flush()
+
+    def assertPages(self, start, end, page_size):
+        expected = [n for n in self.expected[hashX(1)] if start <= n and (end is None or n < end)]
+        for offset in range(0, len(expected) + page_size, page_size):
+            self.assertEqual(
+                (expected[offset:offset + page_size], len(expected)),
+                self.history.get_txnums(hashX(1), start, end, offset, page_size)
+            )
+
+    def test_pages_and_ranges(self):
+        self.flush(0, 100)
+        self.flush(100, 100, every=3)
+        self.flush(200, 50)
+        self.assertEqual((self.expected[hashX(2)], 66), self.history.get_txnums(hashX(2)))
+        self.assertEqual(([], 0), self.history.get_txnums(hashX(3)))
+        for start, end in ((0, None), (0, 100), (50, 150), (99, 201), (150, 151), (300, None)):
+            for page_size in (1, 7, 100):
+                self.assertPages(start, end, page_size)
+
+    def test_index_follows_compaction_and_backup(self):
+        self.history.max_hist_row_entries = 30
+        for first in range(0, 200, 40):
+            self.flush(first, 40, every=2)
+        self.history.comp_cursor = 0
+        self.history.comp_flush_count = max(self.history.comp_flush_count, 1)
+        while self.history.comp_cursor != -1:
+            self.history._compact_history(1000000)
+        self.assertPages(0, None, 11)
+        self.assertPages(45, 155, 11)
+        self.history.backup({hashX(1), hashX(2)}, 150)
+        self.expected[hashX(1)] = [n for n in self.expected[hashX(1)] if n < 150]
+        self.assertPages(0, None, 11)
+
+    def test_upgrade_version_0(self):
+        self.flush(0, 50, every=2)
+        self.flush(50, 50, every=2)
+        with self.history.db.write_batch() as batch:
+            for key, _ in self.history.db.iterator(prefix=b'I'):
+                batch.delete(key)
+        self.assertEqual(([], 0), self.history.get_txnums(hashX(1)))
+        self.history.db_version = 0
+        self.history.upgrade_index()
+        self.assertEqual(1, self.history.db_version)
+        self.assertPages(0, None, 9)
+
+    def test_saved_status_dropped_by_backup(self):
+        self.flush(0, 50)
+        backup_count = self.history.backup_count
+        self.history.put_status(hashX(1), 50, 49, b'state', backup_count)
+        self.assertEqual((50, 49, b'state'), self.history.get_status(hashX(1)))
+        self.history.backup({hashX(1)}, 40)
+        self.assertIsNone(self.history.get_status(hashX(1)))
+        # a status read before the backup is not saved
+        self.history.put_status(hashX(1), 50, 49, b'state', backup_count)
+        self.assertIsNone(self.history.get_status(hashX(1)))
+        self.history.put_status(hashX(1), 40, 39, b'state', self.history.backup_count)
+        self.assertEqual((40, 39, b'state'), self.history.get_status(hashX(1)))
+
+
+class TestConfirmedStatus(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.db = LevelDB.__new__(LevelDB)
+        self.db.executor = None
+        self.db.history = History()
+        self.db.history.open_db(db_class(tmp, 'leveldb'), True, 0, False)
+        self.addCleanup(self.db.history.close_db)
+        # one tx per block
+        self.db.tx_counts = list(range(1, 301))
+        self.db.total_transactions = [tx_num.to_bytes(32, 'big') for tx_num in range(300)]
+        self.db.db_tx_count = 300
+        self.db.history.add_unflushed([[hashX(1)]] * 300, 0)
+        self.db.history.flush()
+
+    def status(self, count):
+        tx_hashes = self.db.total_transactions
+        return hashlib.sha256(b''.join(
+            f'{hash_to_hex_str(tx_hashes[tx_num])}:{tx_num:d}:'.encode() for tx_num in range(count)
+        )).hexdigest()
+
+    async def test_status_covers_the_limited_history(self):
+        self.assertIsNone(await self.db.confirmed_status(hashX(2)))
+        for limit in (250, 250, None, 250, 300, 1000):
+            status_hash = await self.db.confirmed_status(hashX(1), limit=limit)
+            self.assertEqual(self.status(min(limit or 300, 300)), status_hash.hexdigest())
+        if RESUMABLE:
+            self.assertEqual(300, self.db.history.get_status(hashX(1))[0])
+
+    @unittest.skipUnless(RESUMABLE, 'libcrypto sha256 is not available')
+    async def test_exportable_status_of_small_address(self):
+        with mock.patch('lbry.wallet.server.leveldb.STATUS_SAVE_MIN_TXS', 1000):
+            status_hash = await self.db.confirmed_status(hashX(1), limit=100, exportable=True)
+        self.assertIsInstance(status_hash, StatusHash)
+        self.assertEqual(self.status(100), pickle.loads(pickle.dumps(status_hash)).hexdigest())
+        # small addresses are not saved
+        self.assertIsNone(self.db.history.get_status(hashX(1)))
@@ -0,0 +1,131 @@
+import asyncio
+
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.coin import LBCRegTest
+from lbry.wallet.server.hash import hash_to_hex_str
+from lbry.wallet.server.mempool import MemPool, MemPoolAPI, MemPoolTx
+
+
+class API(MemPoolAPI):
+
+    async def height(self):
+        return 0
+
+    def cached_height(self):
+        return 0
+
+    async def mempool_hashes(self):
+        return []
+
+    async def raw_transactions(self, hex_hashes):
+        return []
+
+    async def mempool_entries(self, hex_hashes):
+        return []
+
+    async def lookup_utxos(self, prevouts):
+        return []
+
+    async def on_mempool(self, touched, new_touched, height):
+        pass
+
+
+def tx_hash(n):
+    return bytes([n]) * 32
+
+
+class TestMemPoolDependencies(AsyncioTestCase):
+
+    def setUp(self):
+        self.mempool = MemPool(LBCRegTest, API())
+        # a chain of txs, each spending the first output of the previous one
+        self.utxo_map = {(b'\xff' * 32, 0): (b'alice', 1000)}
+        self.tx_map = {
+            tx_hash(1): MemPoolTx(((b'\xff' * 32, 0),), None, ((b'bob', 900), (b'alice', 90)), 0, 100),
+            tx_hash(2): MemPoolTx(((tx_hash(1), 0),), None, ((b'carol', 800),), 0, 100),
+            tx_hash(3): MemPoolTx(((tx_hash(2), 0),), None, ((b'bob', 700),), 0, 100),
+            tx_hash(4): MemPoolTx(((tx_hash(9), 0),), None, ((b'bob', 1),), 0, 100),  # parent is missing
+        }
+
+    def accept(self):
+        touched = set()
+        # children listed first, they are accepted once their parents are
+        tx_map = dict(reversed(list(self.tx_map.items())))
+        dropped = self.mempool._accept_dependent_transactions(tx_map, self.utxo_map, touched)
+        return dropped, touched
+
+    def test_chain_accepted_parents_first(self):
+        dropped, touched = self.accept()
+        self.assertEqual(dropped, 1)
+        self.assertSetEqual(set(self.mempool.txs), {tx_hash(1), tx_hash(2), tx_hash(3)})
+        self.assertSetEqual(touched, {b'alice', b'bob', b'carol'})
+        self.assertEqual(self.mempool.txs[tx_hash(2)].fee, 100)
+
+    def test_conflicting_spend_accepted_once(self):
+        self.tx_map[tx_hash(5)] = MemPoolTx(((b'\xff' * 32, 0),), None, ((b'dave', 990),), 0, 100)
+        dropped, touched = self.accept()
+        # listed first, the double spend wins and the chain of the other one is dropped
+        self.assertEqual(dropped, 4)
+        self.assertSetEqual(set(self.mempool.txs), {tx_hash(5)})
+        self.assertSetEqual(touched, {b'alice', b'dave'})
+        self.assertDictEqual(self.utxo_map, {})
+
+    def test_indexes_follow_accept_and_evict(self):
+        self.accept()
+        self.assertEqual(self.mempool.deltas, {b'alice': -910, b'bob': 700, b'carol': 0})
+        self.assertSetEqual(self.mempool.prevouts[b'bob'], {(b'\xff' * 32, 0), (tx_hash(1), 0), (tx_hash(2), 0)})
+        self.assertDictEqual(self.mempool.outputs[b'bob'], {(tx_hash(1), 0): 900, (tx_hash(3), 0): 700})
+
+        self.mempool._remove_tx(tx_hash(3))
+        self.assertEqual(self.mempool.deltas[b'bob'], 0)
+        self.assertEqual(self.mempool.deltas[b'carol'], 800)
+        self.assertDictEqual(self.mempool.outputs[b'bob'], {(tx_hash(1), 0): 900})
+        self.assertSetEqual(self.mempool.prevouts[b'bob'], {(b'\xff' * 32, 0), (tx_hash(1), 0)})
+
+        self.mempool._remove_tx(tx_hash(2))
+        self.mempool._remove_tx(tx_hash(1))
+        for index in (self.mempool.hashXs, self.mempool.deltas, self.mempool.outputs, self.mempool.prevouts):
+            self.assertDictEqual(index, {})
+
+    def test_replica_indexes_match(self):
+        self.accept()
+        replica = MemPool(LBCRegTest, API())
+        replica.replicate(dict(self.mempool.txs), (), [(1, 100)])
+        self.mempool._remove_tx(tx_hash(3))
+        replica.replicate({}, [tx_hash(3)], [])
+        for index in ('txs', 'hashXs', 'deltas', 'outputs', 'prevouts'):
+            self.assertEqual(getattr(replica, index), getattr(self.mempool, index))
+        self.assertEqual(replica.cached_compact_histogram, [])
+
+
+class PushAPI(API):
+
+    def __init__(self, unconfirmed):
+        self.unconfirmed = unconfirmed
+        self.refreshed = asyncio.Event()
+
+    async def mempool_entries(self, hex_hashes):
+        return [{} if hex_hash in self.unconfirmed else None for hex_hash in hex_hashes]
+
+    async def on_mempool(self, touched, new_touched, height):
+        self.refreshed.set()
+
+
+class TestMemPoolPushes(AsyncioTestCase):
+
+    async def test_pushed_txs_of_a_block_are_not_added(self):
+        api = PushAPI({hash_to_hex_str(tx_hash(1))})
+        mempool = MemPool(LBCRegTest, api)
+        mempool.push_mode, mempool.resync_needed = True, False
+        processed = []
+
+        async def process_mempool(hashes):
+            processed.append(hashes)
+            return set()
+        mempool._process_mempool = process_mempool
+        # the daemon pushes the txs of a block it connects, tx 2 is confirmed
+        mempool.push_tx_hashes((tx_hash(1), tx_hash(2)))
+        refresh = asyncio.ensure_future(mempool._refresh_hashes(asyncio.Event()))
+        self.addCleanup(refresh.cancel)
+        await asyncio.wait_for(api.refreshed.wait(), 1)
+        self.assertEqual([{tx_hash(1)}], processed)
@@ -0,0 +1,103 @@
+import asyncio
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.notifier import AddressNotifier
+
+
+class FakeSession:
+
+    def __init__(self):
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.writes = []
+
+    def is_closing(self):
+        return False
+
+    async def wait_until_writable(self):
+        await self.writable.wait()
+
+    async def send_history_notifications(self, statuses):
+        self.writes.append(dict(statuses))
+
+
+class FakeLatency:
+
+    def __init__(self):
+        self.observed = []
+
+    def observe(self, value):
+        self.observed.append(value)
+
+
+class TestAddressNotifier(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.status_requests = []
+        self.statuses = {}
+        self.sessions = {1: FakeSession(), 2: FakeSession()}
+        self.subscriptions = {b'a': {1, 2}, b'b': {1}}
+        self.latency = FakeLatency()
+        self.notifier = AddressNotifier(
+            self.get_status, lambda hashX: self.subscriptions.get(hashX, set()), self.sessions.get,
+            latency_metric=self.latency
+        )
+        self.notifier.start()
+        self.addCleanup(self.notifier.stop)
+
+    async def get_status(self, hashX):
+        self.status_requests.append(hashX)
+        status = self.statuses.get(hashX)
+        if isinstance(status, Exception):
+            raise status
+        return status
+
+    async def settle(self):
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    async def test_status_computed_once_and_sent_in_one_write(self):
+        self.statuses = {b'a': 'status a', b'b': 'status b', b'c': 'status c'}
+        self.notifier.notify({b'a', b'b', b'c'}, 0)
+        await self.settle()
+        self.assertEqual(sorted(self.status_requests), [b'a', b'b'])
+        self.assertEqual(self.sessions[1].writes, [{b'a': 'status a', b'b': 'status b'}])
+        self.assertEqual(self.sessions[2].writes, [{b'a': 'status a'}])
+        self.assertEqual(len(self.latency.observed), 1)
+
+    async def test_paused_session_gets_latest_statuses(self):
+        self.sessions[1].writable.clear()
+        self.statuses = {b'a': 'old', b'b': 'old'}
+        self.notifier.notify({b'a', b'b'}, 0)
+        await self.settle()
+        self.assertEqual(self.sessions[2].writes, [{b'a': 'old'}])
+        self.assertEqual(self.sessions[1].writes, [])
+        self.assertEqual(self.latency.observed, [])
+        self.statuses = {b'a': 'new'}
+        self.notifier.notify({b'a'}, 0)
+        await self.settle()
+        self.assertEqual(self.notifier.pending_count(), 2)
+        self.sessions[1].writable.set()
+        await self.settle()
+        self.assertEqual(self.sessions[1].writes, [{b'a': 'new', b'b': 'old'}])
+        self.assertEqual(self.notifier.pending_count(), 0)
+        self.assertEqual(len(self.latency.observed), 2)
+
+    async def test_statuses_of_a_closed_session_are_dropped(self):
+        del self.sessions[1]
+        self.statuses = {b'a': 'status a', b'b': 'status b'}
+        self.notifier.notify({b'a', b'b'}, 0)
+        await self.settle()
+        self.assertEqual(self.sessions[2].writes, [{b'a': 'status a'}])
+        self.assertEqual(self.notifier.pending_count(), 0)
+        self.assertEqual(len(self.latency.observed), 1)
+
+    async def test_failed_status_does_not_drop_the_others(self):
+        self.subscriptions[b'c'] = {2}
+        self.statuses = {b'a': ValueError('bad address'), b'b': 'status b', b'c': 'status c'}
+        with self.assertLogs('lbry.wallet.server.notifier', 'ERROR'):
+            self.notifier.notify({b'a', b'b', b'c'}, 0)
+            await self.settle()
+        self.assertEqual(sorted(self.status_requests), [b'a', b'b', b'c'])
+        self.assertEqual(self.sessions[1].writes, [{b'b': 'status b'}])
+        self.assertEqual(self.sessions[2].writes, [{b'c': 'status c'}])
+        self.assertEqual(len(self.latency.observed), 1)
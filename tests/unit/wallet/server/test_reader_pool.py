@@ -0,0 +1,111 @@
+import os
+import apsw
+import base64
+import asyncio
+import logging
+import tempfile
+import threading
+
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.db import reader
+from lbry.wallet.server.db.reader_pool import ReaderThreadPool, to_base64
+
+# counts forever, only stops when interrupted
+ENDLESS_QUERY = "with recursive n(i) as (select 1 union all select i+1 from n) select count(*) from n"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self):
+        self.value += 1
+
+
+def select(value):
+    return reader.ctx.get().db.cursor().execute("select ? as value", (value,)).fetchone()['value']
+
+
+def wait(event: threading.Event, value):
+    event.wait()
+    return value
+
+
+def run_endless_query(started: threading.Event):
+    started.set()
+    return reader.ctx.get().db.cursor().execute(ENDLESS_QUERY).fetchone()
+
+
+class TestReaderThreadPool(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'claims.db')
+        apsw.Connection(path).cursor().execute("create table claim (claim_hash bytes)")
+        self.interrupted = Counter()
+        self.pool = ReaderThreadPool(
+            2, reader.initializer, (logging.getLogger(__name__), path, 'regtest', 0), interrupted=self.interrupted
+        )
+        self.addCleanup(self.pool.shutdown)
+
+    def test_to_base64(self):
+        self.assertEqual('YWJj', to_base64(b'abc'))
+        self.assertEqual('YWJj', to_base64('YWJj'))
+        self.assertEqual(('YWJj', {b'claim'}, {'name'}), to_base64((b'abc', {b'claim'}, {'name'})))
+        self.assertEqual((('YWJj', set(), set()), {}), to_base64(((b'abc', set(), set()), {})))
+
+    async def test_results_are_base64_encoded_in_worker(self):
+        self.assertEqual(base64.b64encode(b'abc').decode(), await self.pool.run(select, b'abc'))
+        self.assertEqual(7, await self.pool.run(select, 7))
+        with self.assertRaises(apsw.SQLError):
+            await self.pool.run(lambda: reader.ctx.get().db.cursor().execute("select * from missing"))
+
+    async def test_queries_run_by_priority(self):
+        order = []
+
+        def record(value):
+            order.append(value)
+            return value
+
+        release = threading.Event()
+        blocked = [asyncio.ensure_future(self.pool.run(wait, release, i, priority=0)) for i in range(2)]
+        await asyncio.sleep(0.1)
+        queued = [
+            asyncio.ensure_future(self.pool.run(record, 'search', priority=1)),
+            asyncio.ensure_future(self.pool.run(record, 'other', priority=2)),
+            asyncio.ensure_future(self.pool.run(record, 'resolve', priority=0)),
+        ]
+        await asyncio.sleep(0.1)
+        release.set()
+        await asyncio.gather(*blocked, *queued)
+        self.assertEqual(['resolve', 'search', 'other'], order)
+
+    async def test_cancelled_query_is_interrupted(self):
+        started = threading.Event()
+        task = asyncio.ensure_future(self.pool.run(run_endless_query, started))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(1, self.interrupted.value)
+        # both workers are free again
+        self.assertEqual([1, 2], await asyncio.wait_for(
+            asyncio.gather(self.pool.run(select, 1), self.pool.run(select, 2)), 5
+        ))
+
+    async def test_cancelled_queued_query_is_skipped(self):
+        release = threading.Event()
+        blocked = [asyncio.ensure_future(self.pool.run(wait, release, i)) for i in range(2)]
+        await asyncio.sleep(0.1)
+        ran = []
+        queued = asyncio.ensure_future(self.pool.run(ran.append, 'queued'))
+        await asyncio.sleep(0.1)
+        queued.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await queued
+        release.set()
+        await asyncio.gather(*blocked)
+        self.assertEqual(3, await self.pool.run(select, 3))
+        self.assertEqual([], ran)
+        self.assertEqual(0, self.interrupted.value)
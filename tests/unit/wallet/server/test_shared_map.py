@@ -0,0 +1,114 @@
+import os
+import pickle
+import shutil
+import tempfile
+import logging
+import unittest
+from hashlib import sha256
+
+import apsw
+
+from lbry.wallet.server.db import reader
+from lbry.wallet.server.db.shared_map import SharedHashMap, MIN_CAPACITY, MAX_DELETED_FRACTION
+
+
+def key(i):
+    return sha256(b'key%i' % i).digest()[:20]
+
+
+def value(i):
+    return sha256(b'value%i' % i).digest()[:20]
+
+
+class TestSharedHashMap(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.writer = SharedHashMap(os.path.join(self.tmp, 'test.map'), writable=True)
+        self.addCleanup(self.writer.close)
+        self.reader = pickle.loads(pickle.dumps(self.writer))
+        self.addCleanup(self.reader.close)
+
+    def test_reader_sees_changes_in_place(self):
+        self.assertFalse(self.reader.writable)
+        self.assertIsNone(self.reader.get(key(1)))
+        self.assertIsNone(self.reader.get(None))
+        self.assertTrue(self.writer.replace({key(1): value(1), key(2): value(2)}))
+        self.assertEqual(value(1), self.reader.get(key(1)))
+        self.assertEqual({key(1): value(1), key(2): value(2)}, dict(self.reader))
+        self.assertFalse(self.writer.replace({key(1): value(1), key(2): value(2)}))
+        self.assertTrue(self.writer.replace({key(2): value(3), key(4): value(4)}))
+        self.assertEqual({key(2): value(3), key(4): value(4)}, dict(self.reader))
+        self.assertNotIn(key(1), self.reader)
+        self.assertEqual(2, len(self.reader))
+        self.writer.clear()
+        self.assertEqual({}, dict(self.reader))
+        with self.assertRaises(AssertionError):
+            self.reader.replace({})
+
+    def test_deleted_slots_are_compacted(self):
+        for i in range(MIN_CAPACITY):
+            self.writer.replace({key(i): value(i)})
+            self.reader.refresh()
+            self.assertEqual({key(i): value(i)}, dict(self.reader))
+        self.assertEqual(1, len(self.reader))
+
+    def test_deleted_slots_trigger_rebuild(self):
+        deleted = int(MIN_CAPACITY * MAX_DELETED_FRACTION) + 1
+        self.writer.replace({key(i): value(i) for i in range(deleted + 1)})
+        self.assertEqual(deleted + 1, len(self.reader))
+        # far from full, but the deleted slots would lengthen every probe
+        self.writer.replace({key(0): value(0)})
+        self.assertEqual(1, self.writer._used)
+        self.reader.refresh()
+        self.assertEqual({key(0): value(0)}, dict(self.reader))
+
+    def test_refresh_leaves_replaced_table_open(self):
+        table, _ = self.reader._table
+        self.writer.replace({key(i): value(i) for i in range(MIN_CAPACITY)})
+        self.reader.refresh()
+        # a thread sharing the reader may still be probing the replaced table
+        self.assertFalse(table.closed)
+        self.assertEqual(0, len(self.reader._table[0][:0]))
+        self.assertEqual(MIN_CAPACITY, len(self.reader))
+
+    def test_growing_replaces_file(self):
+        items = {key(i): value(i) for i in range(MIN_CAPACITY)}
+        self.writer.replace(items)
+        # the old mapping stays readable until the reader refreshes
+        self.assertEqual(0, len(self.reader))
+        self.reader.refresh()
+        self.assertEqual(items, dict(self.reader))
+        self.assertEqual(value(10), self.reader.get(key(10)))
+        self.writer.update({key(-1): value(-1)})
+        self.assertEqual(value(-1), self.reader[key(-1)])
+        self.assertEqual(MIN_CAPACITY + 1, len(self.reader))
+
+    def test_wrong_key_size(self):
+        with self.assertRaises(ValueError):
+            SharedHashMap(self.writer.path, key_size=32)
+
+
+class TestReaderInitializer(unittest.TestCase):
+
+    def test_only_writable_maps_are_reopened(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'claims.db')
+        apsw.Connection(path).close()
+        writer = SharedHashMap(os.path.join(tmp, 'test.map'), writable=True)
+        self.addCleanup(writer.close)
+        unpickled = pickle.loads(pickle.dumps(writer))
+        self.addCleanup(unpickled.close)
+        reader.initializer(
+            logging.getLogger(__name__), path, 'regtest', 0.25, block_and_filter=(unpickled, writer, {}, {})
+        )
+        state = reader.ctx.get()
+        self.assertIs(unpickled, state.blocked_streams)
+        self.assertIsNot(writer, state.blocked_channels)
+        self.assertFalse(state.blocked_channels.writable)
+        reader.cleanup()
+        # only the view opened for the writable map is closed with the reader
+        self.assertIsNone(state.blocked_channels._table)
+        self.assertIsNotNone(unpickled._table)
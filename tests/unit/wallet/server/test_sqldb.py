@@ -2,16 +2,19 @@ import unittest
 import ecdsa
 import hashlib
 import logging
+from unittest.mock import patch
 from binascii import hexlify
 from typing import List, Tuple
 
 from lbry.wallet.constants import COIN, NULL_HASH32
 from lbry.schema.claim import Claim
-from lbry.schema.result import Censor
+from lbry.error import ResolveCensoredError
+from lbry.schema.result import Censor, Outputs
 from lbry.wallet.server.db import reader, writer
 from lbry.wallet.server.coin import LBCRegTest
 from lbry.wallet.server.db.trending import zscore
 from lbry.wallet.server.db.canonical import FindShortestID
+from lbry.wallet.server.db.claim_parser import ClaimParser
 from lbry.wallet.server.block_processor import Timer
 from lbry.wallet.transaction import Transaction, Input, Output
 
@@ -35,7 +38,7 @@ def search(**constraints) -> List:
 
 
 def censored_search(**constraints) -> Tuple[List, Censor]:
-    rows, _, _, _, censor = reader.search(constraints)
+    rows, _, _, _, censor, _, _ = reader.search(constraints)
     return rows, censor
 
 
@@ -239,6 +242,191 @@ class TestClaimtrie(TestSQLDB):
             accepted=[]
         )
 
+    def test_claim_changes_are_recorded(self):
+        advance = self.advance
+        self.sql.pop_claim_changes()
+        stream = self.get_stream('Claim A', 10*COIN)
+        advance(13, [stream])
+        changes = self.sql.pop_claim_changes()
+        self.assertEqual({stream[0].outputs[0].claim_hash}, changes.claim_hashes)
+        self.assertEqual({'foo'}, changes.names)
+        advance(14, [])
+        self.assertEqual((set(), set()), self.sql.pop_claim_changes()[:2])
+        late_stream = self.get_stream('Claim B', 20*COIN)
+        advance(1001, [late_stream])
+        self.sql.pop_claim_changes()
+        # activation of a claim changes it even without any transactions
+        advance(1031, [])
+        changes = self.sql.pop_claim_changes()
+        self.assertEqual({late_stream[0].outputs[0].claim_hash}, changes.claim_hashes)
+        self.assertEqual({'foo'}, changes.names)
+        advance(1032, [self.get_abandon(stream)])
+        changes = self.sql.pop_claim_changes()
+        self.assertIn(stream[0].outputs[0].claim_hash, changes.claim_hashes)
+        self.assertEqual({'foo'}, changes.names)
+
+    def test_resolve_dependencies(self):
+        advance = self.advance
+        tx_chan = self.get_channel('Channel', COIN, '@Chan')
+        chan = tx_chan[0].outputs[0]
+        tx_stream = self.get_stream('Stream', COIN, 'Foo', channel=chan)
+        advance(1, [tx_chan, tx_stream])
+        urls = ('lbry://@Chan/Foo', 'lbry://foo', 'lbry://missing', 'invalid#url#')
+        txo_rows, extra_txo_rows = reader.resolve(urls)
+        claim_hashes, names = reader.resolve_dependencies(urls, txo_rows, extra_txo_rows)
+        self.assertEqual({chan.claim_hash, tx_stream[0].outputs[0].claim_hash}, claim_hashes)
+        self.assertEqual({'@chan', 'foo', 'missing'}, names)
+
+    def test_search_and_resolve_rows_encode_like_protobuf(self):
+        advance = self.advance
+        tx_chan = self.get_channel('Channel', COIN, '@Chan')
+        chan = tx_chan[0].outputs[0]
+        tx_stream = self.get_stream('Stream', COIN, 'Foo', channel=chan)
+        stream = tx_stream[0].outputs[0]
+        tx_repost = self.get_repost(stream.claim_id, COIN, chan)
+        advance(1, [tx_chan, tx_stream, tx_repost])
+        txo_rows, extra_txo_rows, offset, total, censor, continuation, _ = reader.search({'order_by': ['height']})
+        self.assertEqual(3, len(txo_rows))
+        self.assertEqual(txo_rows[0]['claim_hash'], txo_rows[0].get('claim_hash'))
+        self.assertEqual(txo_rows[0]['claim_hash'], dict(zip(txo_rows[0].keys(), txo_rows[0]))['claim_hash'])
+        self.assertEqual(
+            Outputs.to_message(txo_rows, extra_txo_rows, offset, total, censor, continuation).SerializeToString(),
+            Outputs.to_bytes(txo_rows, extra_txo_rows, offset, total, censor, continuation)
+        )
+        txo_rows, extra_txo_rows = reader.resolve(['lbry://@Chan/Foo', 'lbry://missing', 'invalid#url#'])
+        self.assertEqual(
+            Outputs.to_message(txo_rows, extra_txo_rows).SerializeToString(),
+            Outputs.to_bytes(txo_rows, extra_txo_rows)
+        )
+
+    def test_claims_parsed_and_signatures_verified_by_workers(self):
+        self.sql.claim_parser = ClaimParser(self.sql.ledger, workers=2, chunk_size=1)
+        self.addCleanup(self.sql.claim_parser.shutdown)
+        tx_chan = self.get_channel('Channel', COIN, '@Chan')
+        chan = tx_chan[0].outputs[0]
+        tx_other = self.get_channel('Other', COIN, '@Other', key=b'b')
+        signed = [self.get_stream(f'Stream {i}', COIN, f'signed{i}', chan, tags=['watercolor']) for i in range(3)]
+        forged = self.get_stream('Forged', COIN, 'forged', tx_other[0].outputs[0])
+        forged[0].outputs[0].claim.signing_channel_hash = chan.claim_hash
+        forged[0].outputs[0].script.generate()
+        forged[0]._reset()
+        repost = self.get_repost(signed[0][0].outputs[0].claim_id, COIN, chan)
+        self.advance(1, [tx_chan, tx_other, *signed, forged, repost])
+
+        self.assertEqual(
+            [('signed0', 1, 1), ('signed1', 1, 0), ('signed2', 1, 0), ('forged', 0, 0), ('repost', 1, 0)],
+            [(r['short_url'].split('#')[0], r['signature_valid'], r['reposted'])
+             for r in search(claim_type='stream', order_by=['^tx_position']) + search(claim_type='repost')]
+        )
+        self.assertEqual(
+            [txo[0].outputs[0].claim_hash for txo in signed],
+            [r['claim_hash'] for r in search(any_tags=['watercolor'], claim_type='stream', order_by=['^tx_position'])]
+        )
+        (r_chan,) = search(claim_id=chan.claim_id)
+        self.assertEqual(4, r_chan['claims_in_channel'])
+        self.assertEqual(
+            [(chan.claim.channel.public_key_bytes, 'Stream 0')],
+            self.sql.execute(
+                "SELECT channel.public_key_bytes, stream.title FROM claim AS stream "
+                "JOIN claim AS channel ON (channel.claim_hash = stream.channel_hash) WHERE stream.normalized = 'signed0'"
+            ).fetchall()
+        )
+
+    def test_keyset_pagination(self):
+        for height in range(1, 5):
+            self.advance(height, [self.get_stream(f'Claim {height}{i}', COIN, f'claim{i}') for i in range(3)])
+
+        def page_through(constraints):
+            pages, continuation = [], b''
+            while True:
+                txo_rows, _, offset, total, _, continuation, _ = reader.search({
+                    **constraints, 'limit': 5, 'continuation': continuation.hex()
+                })
+                self.assertEqual(0, offset)
+                self.assertEqual(12, total)
+                pages.append([row['claim_hash'] for row in txo_rows])
+                if continuation is None:
+                    return pages
+
+        for order_by in (['height'], ['^height', 'name'], ['trending_group', 'trending_mixed'], ['^name']):
+            pages = page_through({'order_by': order_by})
+            self.assertEqual([5, 5, 2], [len(page) for page in pages])
+            by_offset = [
+                [row['claim_hash'] for row in reader.search({
+                    'order_by': order_by, 'limit': 5, 'offset': offset, 'continuation': ''
+                })[0]]
+                for offset in (0, 5, 10)
+            ]
+            self.assertEqual(by_offset, pages)
+
+        continuation = reader.search({'order_by': ['height'], 'limit': 5, 'continuation': ''})[5]
+        self.assertIsNotNone(continuation)
+        self.assertIsNone(reader.search({'order_by': ['height'], 'limit': 5})[5])
+        self.assertIsNone(reader.search({'order_by': ['height'], 'limit': 13, 'continuation': ''})[5])
+        with self.assertRaisesRegex(reader.InvalidContinuationError, 'continuation requires'):
+            reader.search({'order_by': ['duration'], 'limit': 5, 'continuation': ''})
+        with self.assertRaisesRegex(reader.InvalidContinuationError, 'different order_by'):
+            reader.search({'order_by': ['^height'], 'continuation': continuation.hex()})
+        with self.assertRaisesRegex(reader.InvalidContinuationError, 'invalid continuation'):
+            reader.search({'order_by': ['height'], 'continuation': 'beef'})
+        with self.assertRaisesRegex(reader.InvalidContinuationError, 'continuation requires'):
+            reader.search({'continuation': continuation.hex()})
+
+        sql, values = reader.claims_query('claim.claim_hash', **{
+            'order_by': ['release_time', 'claim_hash'],
+            **reader.keyset_constraints([('release_time', False), ('claim_hash', False)], [1, b'\xff' * 20])
+        })
+        # the leading bound lets sqlite seek into the (release_time, claim_hash) index
+        self.assertIn('claim.release_time <= :', sql)
+        self.assertIn('claim.claim_hash < :', sql)
+
+    def test_explain_search(self):
+        plan = reader.explain_search({'claim_id': 'beef', 'no_totals': True, 'limit': 5, 'offset': 10})
+        self.assertTrue(plan)
+        self.assertTrue(all(step.startswith(('SEARCH', 'SCAN', 'USE')) for step in plan), plan)
+        with_totals = reader.explain_search({'channel': '@foo', 'any_tags': ['a', 'b'], 'order_by': ['height']})
+        self.assertGreater(len(with_totals), len(plan))
+
+    def test_cached_and_estimated_totals(self):
+        def total(**constraints):
+            _, _, _, total, _, _, estimated = reader.search({'limit': 1, **constraints})
+            return total, estimated
+
+        self.advance(1, [
+            self.get_channel('Channel', COIN, '@chan'),
+            self.get_stream('Art 1', COIN, 'art1', tags=['watercolor']),
+            self.get_stream('Art 2', COIN, 'art2', tags=['watercolor', 'bebop']),
+            self.get_stream('Music', COIN, 'bebop', tags=['bebop']),
+        ])
+        self.assertEqual((2, False), total(any_tags=['watercolor']))
+        self.assertEqual((2, False), total(any_tags=['watercolor'], offset=1, order_by=['height']))
+        self.assertEqual(1, len(reader.ctx.get().totals))
+        # nothing to estimate from until the claims are counted
+        self.assertEqual((2, False), total(any_tags=['watercolor'], estimate_totals=True))
+        self.assertEqual(-1, self.sql.get_claim_cardinality_height())
+
+        self.advance(2, [self.get_stream('Art 3', COIN, 'art3', tags=['watercolor'])])
+        self.assertEqual((3, False), total(any_tags=['watercolor']))
+        self.sql.update_claim_cardinality(2)
+        self.assertEqual(2, self.sql.get_claim_cardinality_height())
+        # counted on a connection of its own, the way the block processor does it
+        counts = self.sql.count_claim_cardinality()
+        self.assertIn(('tag', 'watercolor', 3), counts)
+        self.sql.update_claim_cardinality(3, counts)
+        self.assertEqual(3, self.sql.get_claim_cardinality_height())
+        self.assertEqual((3, True), total(any_tags=['watercolor'], estimate_totals=True))
+        # 5 claims, 4 of them are streams and 2 are tagged bebop
+        self.assertEqual((2, True), total(claim_type='stream', not_tags=['bebop'], estimate_totals=True))
+        self.assertEqual((1, True), total(all_tags=['watercolor', 'bebop'], estimate_totals=True))
+        self.assertEqual((0, True), total(any_tags=['missing'], estimate_totals=True))
+        # the exact total is counted when asked for, or when constraints were not counted
+        self.assertEqual((3, False), total(any_tags=['watercolor']))
+        self.assertEqual((1, False), total(any_tags=['watercolor'], name='art1', estimate_totals=True))
+        self.assertTrue(Outputs.from_bytes(reader.search_to_bytes({
+            'any_tags': ['bebop'], 'estimate_totals': True
+        })).total_estimated)
+        self.assertFalse(Outputs.from_bytes(reader.search_to_bytes({'any_tags': ['bebop']})).total_estimated)
+
     def test_competing_claims_subsequent_blocks_height_wins(self):
         advance, state = self.advance, self.state
         advance(13, [self.get_stream('Claim A', 10*COIN)])
@@ -546,6 +734,19 @@ class TestTrending(TestSQLDB):
         self.assertEqual([4, 4, 2, 0, 1], [int(c['trending_group']) for c in results])
         self.assertEqual([53, 38, 2, 0, -6], [int(c['trending_mixed']) for c in results])
 
+    def test_trending_changes_are_attributed_to_claims(self):
+        trending = self.get_stream('Trending', COIN)
+        quiet = self.get_stream('Quiet', COIN, name='bar')
+        trending_claim, quiet_claim = self.advance(1, [trending, quiet])
+        self.advance(zscore.TRENDING_WINDOW, [self.get_support(trending, COIN)])
+        self.sql.pop_claim_changes()
+        # no claim changed in this block, the trending values of the supported claim did
+        self.advance(zscore.TRENDING_WINDOW * 2, [])
+        changes = self.sql.pop_claim_changes()
+        self.assertFalse(changes.bulk)
+        self.assertEqual({trending_claim.claim_hash}, changes.claim_hashes)
+        self.assertNotIn(quiet_claim.claim_hash, changes.claim_hashes)
+
     def test_edge(self):
         problematic = self.get_stream('Problem', COIN)
         self.advance(1, [problematic])
@@ -723,6 +924,55 @@ class TestContentBlocking(TestSQLDB):
         self.assertEqual(claim3.claim_hash, results[2]['claim_hash'])
         self.assertEqual(regular_channel.claim_hash, results[3]['claim_hash'])
 
+    def assertBatchedResolveMatches(self, urls):
+        expected = [reader.resolve_url(url) for url in urls]
+        for candidates in (reader.RESOLVE_BATCH_CANDIDATES, 1):
+            with patch.object(reader, 'RESOLVE_BATCH_CANDIDATES', candidates):
+                results = reader.resolve_urls(urls)
+            self.assertEqual(len(expected), len(results))
+            for url, expected_result, result in zip(urls, expected, results):
+                if isinstance(expected_result, Exception):
+                    self.assertEqual(
+                        (type(expected_result), expected_result.args), (type(result), result.args), url
+                    )
+                else:
+                    self.assertEqual(expected_result['claim_hash'], result['claim_hash'], url)
+
+    def test_batched_resolve(self):
+        tx0 = self.get_channel('Blocking Channel', COIN, '@block')
+        blocking_channel = tx0[0].outputs[0]
+        self.sql.blocking_channel_hashes.add(blocking_channel.claim_hash)
+        tx_chan1 = self.get_channel('Channel 1', 3*COIN, '@foo', key=b'c')
+        tx_chan2 = self.get_channel('Channel 2', 2*COIN, '@foo', key=b'd')
+        chan1, chan2 = tx_chan1[0].outputs[0], tx_chan2[0].outputs[0]
+        self.advance(1, [tx0, tx_chan1, tx_chan2])
+        streams = [
+            self.get_stream('Stream 1', 5*COIN, 'foo'),
+            self.get_stream('Stream 2', 4*COIN, 'foo'),
+            self.get_stream('Stream 3', 3*COIN, 'foo', channel=chan1),
+            self.get_stream('Stream 4', 2*COIN, 'foo', channel=chan1),
+            self.get_stream('Stream 5', 1*COIN, 'foo', channel=chan2),
+            self.get_stream('Stream 6', 1*COIN, 'bar', channel=chan1),
+        ]
+        self.advance(2, streams)
+        s1, s2, s3, s4, s5, s6 = (tx[0].outputs[0] for tx in streams)
+        urls = [
+            'foo', 'bar', 'missing', 'invalid#url#', f'foo#{s2.claim_id}', f'foo#{s3.claim_id[:3]}',
+            'foo$1', 'foo$2', 'foo$6', 'foo$7', '@foo', '@foo$2', f'@foo#{chan2.claim_id[:5]}',
+            '@foo/foo', '@foo/bar', '@foo$2/foo', f'@foo/foo#{s4.claim_id}', '@foo/foo$2', '@foo/foo$3',
+            f'@foo#{chan2.claim_id}/foo', '@foo/missing', '@missing/foo', '@missing', 'foo', '@foo',
+        ]
+        self.assertBatchedResolveMatches(urls)
+
+        # block the controlling stream, its channel and one of the streams in it
+        self.advance(3, [
+            self.get_repost(s1.claim_id, COIN, blocking_channel),
+            self.get_repost(s4.claim_id, COIN, blocking_channel),
+            self.get_repost(chan2.claim_id, COIN, blocking_channel),
+        ])
+        self.assertBatchedResolveMatches(urls + [f'foo#{s1.claim_id}', f'@foo/foo#{s4.claim_id[:2]}'])
+        self.assertIsInstance(reader.resolve_urls(['foo'])[0], ResolveCensoredError)
+
     def test_pagination(self):
         one, two, three, four, five, six, seven, filter_channel = self.advance(1, [
             self.get_stream('One', COIN),
@@ -0,0 +1,24 @@
+import hashlib
+import unittest
+from lbry.wallet.server.status import StatusHash, RESUMABLE
+
+
+@unittest.skipUnless(RESUMABLE, 'libcrypto sha256 is not available')
+class TestStatusHash(unittest.TestCase):
+
+    def test_resumed_hash_matches_hashlib(self):
+        entries = [b'%064x:%d:' % (i, i) for i in range(300)]
+        status_hash = StatusHash()
+        states = []
+        for entry in entries:
+            status_hash.update(entry)
+            states.append(status_hash.state())
+        self.assertEqual(hashlib.sha256(b''.join(entries)).hexdigest(), status_hash.hexdigest())
+        # finishing a hash does not change its state
+        self.assertEqual(states[-1], status_hash.state())
+        for i in (0, 1, 100, 299):
+            resumed = StatusHash(states[i])
+            resumed.update(b''.join(entries[i + 1:]) + b'mempool:0:')
+            self.assertEqual(hashlib.sha256(b''.join(entries) + b'mempool:0:').digest(), resumed.digest())
+        with self.assertRaises(ValueError):
+            StatusHash(b'bad state')
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from lbry.wallet.server import table
+from lbry.wallet.server.table import FixedWidthTable
+
+
+class TestFixedWidthTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'hashes')
+
+    def open(self, count=0):
+        t = FixedWidthTable(self.path, 4, count)
+        self.addCleanup(t.close)
+        return t
+
+    def test_list_semantics(self):
+        t = self.open()
+        records = [n.to_bytes(4, 'big') for n in range(100)]
+        t.extend(records)
+        self.assertEqual(len(t), 100)
+        self.assertEqual(t[5], records[5])
+        self.assertEqual(t[-1], records[-1])
+        self.assertListEqual(t[10:20], records[10:20])
+        self.assertListEqual(t[95:200], records[95:200])
+        self.assertListEqual(t[20:10], [])
+        self.assertListEqual(t[::10], records[::10])
+        self.assertEqual(t.join(10, 20), b''.join(records[10:20]))
+        with self.assertRaises(IndexError):
+            t[100]
+        with self.assertRaises(ValueError):
+            t.append(b'toolong')
+        self.assertEqual(t.pop(), records[-1])
+        self.assertEqual(len(t), 99)
+        t.append(b'last')
+        self.assertEqual(t[99], b'last')
+
+    def test_grows_and_reopens(self):
+        original = table.GROWTH_BYTES
+        table.GROWTH_BYTES = 64
+        self.addCleanup(setattr, table, 'GROWTH_BYTES', original)
+        t = self.open()
+        before = t[0:0]
+        t.extend(n.to_bytes(4, 'big') for n in range(1000))
+        self.assertListEqual(before, [])
+        self.assertEqual(t[999], (999).to_bytes(4, 'big'))
+        t.flush()
+        t.close()
+        # records past the count given on opening are leftovers of unflushed blocks
+        t = self.open(500)
+        self.assertEqual(len(t), 500)
+        self.assertEqual(t[-1], (499).to_bytes(4, 'big'))
+        t.append(b'next')
+        self.assertEqual(t[500], b'next')
+
+    def test_followed_by_readers(self):
+        original = table.GROWTH_BYTES
+        table.GROWTH_BYTES = 64
+        self.addCleanup(setattr, table, 'GROWTH_BYTES', original)
+        t = self.open()
+        t.extend(n.to_bytes(4, 'big') for n in range(10))
+        reader = FixedWidthTable(self.path, 4, 10, readonly=True)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader[-1], (9).to_bytes(4, 'big'))
+        # appends past the size of the file the reader mapped
+        t.extend(n.to_bytes(4, 'big') for n in range(10, 100))
+        self.assertEqual(len(reader), 10)
+        reader.follow(100)
+        self.assertListEqual(reader[90:], t[90:])
+        with self.assertRaises(ValueError):
+            reader.follow(10000)
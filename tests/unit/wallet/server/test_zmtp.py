@@ -0,0 +1,45 @@
+import time
+import asyncio
+from lbry.testcase import AsyncioTestCase
+from lbry.wallet.server.zmtp import ZMQPublisher, ZMQSubscriber
+
+
+class TestZMQPush(AsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.publisher = ZMQPublisher()
+        url = await self.publisher.start()
+        self.addCleanup(self.publisher.stop)
+        self.received = asyncio.Queue()
+        self.connections = []
+        self.subscriber = ZMQSubscriber(
+            url, (b'hashtx', b'rawblock'), lambda *message: self.received.put_nowait((time.perf_counter(), message)),
+            self.connections.append, retry_delay=0.1
+        )
+        task = asyncio.create_task(self.subscriber.run())
+        self.addCleanup(task.cancel)
+        await asyncio.wait_for(self.subscriber.connected.wait(), 5)
+        while len(next(iter(self.publisher.subscribers.values()), ())) < 2:
+            await asyncio.sleep(0.01)
+
+    async def test_messages_pushed_to_subscribed_topics(self):
+        self.assertEqual(self.connections, [True])
+        published = time.perf_counter()
+        self.publisher.publish(b'hashtx', b'\x01' * 32)
+        self.publisher.publish(b'hashblock', b'\x02' * 32)  # not subscribed
+        self.publisher.publish(b'rawblock', b'\x03' * 1000)
+        self.publisher.publish(b'hashtx', b'\x04' * 32)
+        messages = [await asyncio.wait_for(self.received.get(), 5) for _ in range(3)]
+        self.assertListEqual([message for _, message in messages], [
+            (b'hashtx', b'\x01' * 32, 0), (b'rawblock', b'\x03' * 1000, 0), (b'hashtx', b'\x04' * 32, 1)
+        ])
+        # pushed messages arrive well within the one second mempool polling interval
+        self.assertLess(messages[-1][0] - published, 0.5)
+
+    async def test_reconnects_after_publisher_restart(self):
+        for writer in list(self.publisher.subscribers):
+            writer.close()
+        while self.connections[-1]:
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(self.subscriber.connected.wait(), 5)
+        self.assertEqual(self.connections, [True, False, True])
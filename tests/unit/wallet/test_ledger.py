@@ -2,6 +2,7 @@ import os
 from binascii import hexlify
 
 from lbry.testcase import AsyncioTestCase
+from lbry.schema.result import Outputs
 from lbry.wallet import Wallet, Account, Transaction, Output, Input, Ledger, Database, Headers
 
 from tests.unit.wallet.test_transaction import get_transaction, get_output
@@ -148,6 +149,24 @@ class TestSynchronization(LedgerTestCase):
         )
 
 
+class TestClaimSearch(LedgerTestCase):
+
+    async def test_search_result_keeps_tuple_shape(self):
+        async def query():
+            return Outputs.to_base64([], [], 0, 3, continuation=b'\x01\x02', total_estimated=True)
+        result = await self.ledger._inflate_outputs(query(), [])
+        txos, blocked, offset, total = result
+        self.assertEqual(([], 0, 3), (txos, offset, total))
+        self.assertEqual('0102', result.continuation)
+        self.assertTrue(result.total_estimated)
+
+        async def query():
+            return Outputs.to_base64([], [], 0, 3)
+        result = await self.ledger._inflate_outputs(query(), [])
+        self.assertIsNone(result.continuation)
+        self.assertFalse(result.total_estimated)
+
+
 class MocHeaderNetwork(MockNetwork):
     def __init__(self, responses):
         super().__init__(None, None)